@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Measures memory taken by the objects of a large repo listing: `python3 benchmarks/memory.py [count]`. Prints JSON."""
+
+import gc
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+thisDir = Path(__file__).absolute().parent
+sys.path.insert(0, str(thisDir.parent))
+sys.path.insert(0, str(thisDir.parent / "tests"))
+
+from miniGHAPI.CompactInfo import CompactInfoPolicy
+from miniGHAPI.GitHubAPI import COMPACT_INFO_PROJECTIONS, GHAPI
+from mockServer import makeRepoInfo
+
+def measure(count: int, compact: bool) -> dict:
+	infos = [json.dumps(makeRepoInfo(i)) for i in range(count)]  # decoded within the measurement, like the answers are
+	gc.collect()
+	tracemalloc.start()
+	api = GHAPI("token", compactInfo=CompactInfoPolicy(COMPACT_INFO_PROJECTIONS) if compact else None)
+	org = api.org("someorg")
+	repos = [org._repoFromInfo(json.loads(el)) for el in infos]
+	gc.collect()
+	size, _ = tracemalloc.get_traced_memory()
+	objects = sum(1 for o in gc.get_objects() if o.__class__.__module__.startswith("miniGHAPI."))
+	for r in repos[:100]:
+		r.actions  # pylint:disable=pointless-statement
+	gc.collect()
+	sizeWithActions, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	api.close()
+	return {"compact": compact, "repos": count, "bytes": size, "bytesPerRepo": size / count, "libraryObjects": objects, "bytesPerActions": (sizeWithActions - size) / 100}
+
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+	results = [measure(count, False), measure(count, True)]
+	print(json.dumps({"results": results, "reduction": 1 - results[1]["bytes"] / results[0]["bytes"]}, indent="\t"))
+
+
+if __name__ == "__main__":
+	main()
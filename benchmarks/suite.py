@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Measures the throughput of the library against the local stand-in server from `tests/mockServer.py`: `python3 benchmarks/suite.py [--quick] [--only name ...] [--out results.json]`.
+Results are printed (or written) as JSON, so they can be compared between releases. The server runs within the same process, so the numbers include its overhead, which is the same for all the releases."""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import typing
+from pathlib import Path
+from time import perf_counter
+
+thisDir = Path(__file__).absolute().parent
+sys.path.insert(0, str(thisDir.parent))
+sys.path.insert(0, str(thisDir.parent / "tests"))
+
+import httpx
+
+from miniGHAPI.CompactInfo import CompactInfoPolicy
+from miniGHAPI.GitHubAPI import COMPACT_INFO_PROJECTIONS, GHAPI, Repository
+from miniGHAPI.Instrumentation import EndpointStats
+from miniGHAPI.JSONCodec import CODECS, getCodec
+from miniGHAPI.undocumented import PipelinesAPIRoot
+from mockServer import MockActionsServer, RepoListing
+
+REQUESTS_COUNT = 1000
+REPO_COUNTS = (1000, 10000, 50000)
+GRAPHQL_REQUESTS_COUNT = 300
+GRAPHQL_REPO_COUNT = 10000
+CODEC_PAGES = 200  # of 100 repos
+CODEC_REPO_COUNT = 10000
+UPLOADS = ((1024, 1000), (1024 * 1024, 50), (64 * 1024 * 1024, 1))  # file size, files count
+
+REPOS_QUERY = "query($login: String!, $cursor: String) {organization(login: $login) {repositories(first: 100, after: $cursor) {nodes {id databaseId name} pageInfo {endCursor hasNextPage}}}}"
+
+
+def timed(func: typing.Callable[[], typing.Any]) -> typing.Tuple[float, typing.Any]:
+	start = perf_counter()
+	res = func()
+	return perf_counter() - start, res
+
+
+def benchRequestOverhead(server: MockActionsServer, quick: bool) -> dict:
+	"""`req` of a root against a bare client doing the same requests, both over the loopback and over an in-memory transport (which leaves only the overhead of the library), and with an `EndpointStats` hook attached"""
+	count = REQUESTS_COUNT // 10 if quick else REQUESTS_COUNT
+	url = server.url + "/repos/someorg/repo1"
+
+	def loop(f):
+		for _ in range(count):
+			f()
+
+	res = {"requests": count}
+	with GHAPI("token", env=server.env()) as api:
+		api.req("repos/someorg/repo1", method="GET")  # warms the connection up
+		res["loopbackReq"], _ = timed(lambda: loop(lambda: api.req("repos/someorg/repo1", method="GET")))
+		res["loopbackBare"], _ = timed(lambda: loop(lambda: api.client.get(url).raise_for_status()))
+
+	body = json.dumps({"id": 1, "name": "repo1"}).encode("utf-8")
+	transport = httpx.MockTransport(lambda req: httpx.Response(200, content=body, headers={"Content-Type": "application/json"}))
+	with GHAPI("token", client=httpx.Client(transport=transport)) as api:
+		res["inMemoryReq"], _ = timed(lambda: loop(lambda: api.req("repos/someorg/repo1", method="GET")))
+		res["inMemoryBare"], _ = timed(lambda: loop(lambda: api.client.get("https://api.github.com/repos/someorg/repo1").raise_for_status()))
+		api.hooks.append(EndpointStats())
+		res["inMemoryReqObserved"], _ = timed(lambda: loop(lambda: api.req("repos/someorg/repo1", method="GET")))
+
+	res["loopbackOverheadPerRequest"] = (res["loopbackReq"] - res["loopbackBare"]) / count
+	res["inMemoryOverheadPerRequest"] = (res["inMemoryReq"] - res["inMemoryBare"]) / count
+	res["observationOverheadPerRequest"] = (res["inMemoryReqObserved"] - res["inMemoryReq"]) / count
+	return res
+
+
+def benchPagination(server: MockActionsServer, quick: bool) -> list:
+	res = []
+	for count in REPO_COUNTS[:1] if quick else REPO_COUNTS:
+		owner = "org" + str(count)
+		server.setRepos(owner, count)
+		for workers in (1, 4):
+			with GHAPI("token", env=server.env(), paginationWorkers=workers) as api:
+				elapsed, repos = timed(lambda: api.org(owner).getRepos())
+			assert len(repos) == count, (len(repos), count)
+			res.append({"repos": count, "paginationWorkers": workers, "seconds": elapsed, "reposPerSecond": count / elapsed})
+	return res
+
+
+def benchGraphQL(server: MockActionsServer, quick: bool) -> dict:
+	count = GRAPHQL_REQUESTS_COUNT // 10 if quick else GRAPHQL_REQUESTS_COUNT
+	repoCount = GRAPHQL_REPO_COUNT // 10 if quick else GRAPHQL_REPO_COUNT
+	server.setRepos("gql", repoCount)
+	res = {"requests": count, "repos": repoCount}
+	with GHAPI("token", env=server.env()) as api:
+		api.gqlReq("query {viewer {login}}")
+		elapsed, _ = timed(lambda: [api.gqlReq("query {viewer {login}}") for _ in range(count)])
+		res["roundTripSeconds"] = elapsed / count
+		for prefetch in (False, True):
+			elapsed, nodes = timed(lambda: list(api.gqlIter(REPOS_QUERY, ("organization", "repositories"), prefetch=prefetch, login="gql")))
+			assert len(nodes) == repoCount
+			res["connectionSeconds" + ("Prefetched" if prefetch else "")] = elapsed
+	return res
+
+
+def availableCodecs() -> typing.Iterator[typing.Tuple[str, "JSONCodec"]]:
+	for name in CODECS:
+		try:
+			yield name, getCodec(name)
+		except ImportError:
+			pass
+
+
+def benchJSONCodecs(server: MockActionsServer, quick: bool) -> dict:
+	"""Decoding of pages of `getRepos` (100 full repos each) into dicts and into the records of `COMPACT_INFO_PROJECTIONS`, and `getRepos` with `compactInfo` end-to-end, per codec"""
+	pages = CODEC_PAGES // 10 if quick else CODEC_PAGES
+	repoCount = CODEC_REPO_COUNT // 10 if quick else CODEC_REPO_COUNT
+	listing = RepoListing("someorg", pages * 100)
+	data = [listing.page(i + 1, 100) for i in range(pages)]
+	projection = CompactInfoPolicy(COMPACT_INFO_PROJECTIONS).projectionOf(Repository)
+	server.setRepos("codecs", repoCount)
+
+	res = {"pages": pages, "pageBytes": len(data[0]), "repos": repoCount}
+	for name, codec in availableCodecs():
+		r = res[name] = {}
+		r["loadsSeconds"], _ = timed(lambda: [codec.loads(d) for d in data])
+		r["loadRecordsSeconds"], _ = timed(lambda: [codec.loadRecords(d, projection) for d in data])
+		r["dumpsSeconds"], _ = timed(lambda: [codec.dumps({"query": REPOS_QUERY, "variables": {"login": "someorg", "cursor": str(i)}}) for i in range(pages * 100)])
+		with GHAPI("token", env=server.env(), compactInfo=CompactInfoPolicy(COMPACT_INFO_PROJECTIONS), jsonCodec=codec) as api:
+			r["getReposSeconds"], repos = timed(lambda: api.org("codecs").getRepos())
+		assert len(repos) == repoCount
+	return res
+
+
+def benchUpload(server: MockActionsServer, quick: bool) -> list:
+	res = []
+	for size, count in UPLOADS:
+		if quick:
+			count = max(1, count // 10)
+			size = min(size, 8 * 1024 * 1024)
+		payload = b"\x5a" * size
+		root = PipelinesAPIRoot("token", env=server.env())
+		try:
+			def upload():
+				with root.pipelines.getArtifactUploader("bench-" + str(size) + "-" + str(len(res))) as u:
+					for i in range(count):
+						u.put("f" + str(i), payload)
+
+			elapsed, _ = timed(upload)
+		finally:
+			root.close()
+		total = size * count
+		res.append({"fileSize": size, "files": count, "seconds": elapsed, "mibPerSecond": total / elapsed / 1024 / 1024, "filesPerSecond": count / elapsed})
+
+	with server.lock:
+		for c in server.containers:  # frees the memory
+			c.files.clear()
+	return res
+
+
+BENCHMARKS = {
+	"requestOverhead": benchRequestOverhead,
+	"pagination": benchPagination,
+	"graphql": benchGraphQL,
+	"jsonCodecs": benchJSONCodecs,
+	"upload": benchUpload,
+}
+
+
+def getRevision() -> typing.Optional[str]:
+	try:
+		return subprocess.run(["git", "describe", "--always", "--dirty", "--tags"], cwd=str(thisDir), capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def main():
+	p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	p.add_argument("--quick", action="store_true", help="Smaller sizes, for a smoke run")
+	p.add_argument("--only", nargs="+", choices=tuple(BENCHMARKS), default=tuple(BENCHMARKS))
+	p.add_argument("--out", type=Path, default=None, help="Write the JSON here instead of stdout")
+	args = p.parse_args()
+
+	results = {"meta": {"revision": getRevision(), "python": platform.python_version(), "implementation": platform.python_implementation(), "httpx": httpx.__version__, "platform": platform.platform(), "quick": args.quick}, "benchmarks": {}}
+	with MockActionsServer(logRequests=False) as server:
+		for name in args.only:
+			results["benchmarks"][name] = BENCHMARKS[name](server, args.quick)
+
+	text = json.dumps(results, indent="\t")
+	if args.out is not None:
+		args.out.write_text(text)
+	else:
+		print(text)
+
+
+if __name__ == "__main__":
+	main()
@@ -1,12 +1,25 @@
-__all__ = ("GHApiObj", "json")
+__all__ = ("GHApiObj", "json", "LazyChild")
 
 import typing
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from enum import Enum
+from itertools import takewhile
 from os import environ
-from urllib.parse import urlencode
-
-from .idConvert import dbIDAndType2NodeID, nodeID2DBIDAndType
-from .utils import httpx, iterateSlice, json
+from time import monotonic, perf_counter, sleep
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from .CompactInfo import CompactInfoPolicy
+from .Connections import iterConnection
+from .idConvert import SCOPE_TYPES, decodeNodeID, encodeNodeID, scopeOf
+from .IdentityMap import IdentityMap
+from .Instrumentation import RequestEvent
+from .JSONCodec import JSONCodec, defaultCodec
+from .RateLimit import RateLimitScheduler
+from .ResponseCache import CachedResponse
+from .Retry import RetryPolicy
+from .SingleFlight import SingleFlight
+from .utils import BODY_ARG, IS_HTTPX, createClient, iterateSlice, json, orderedParallelMap, responseJSON, responseRecords
 
 #gh api is not working this way
 #import certifi
@@ -19,6 +32,7 @@ from .utils import httpx, iterateSlice, json
 MAIN_DOMAIN = "github.com"
 GH_API_BASE = "https://api.github.com/"
 USERCONTENT_DOMAIN = "raw.githubusercontent.com"
+TRACE_SUPPORTED = IS_HTTPX  # `requests` has no trace extension
 
 
 class GHApiObj_:
@@ -31,6 +45,15 @@ class GHApiObj_:
 	def req(self, path: str = "/", obj: typing.Union[typing.Mapping[str, typing.Any], bytes] = None, method: typing.Optional[str] = "post", previews: typing.Tuple[str] = (), urlParams=None):
 		raise NotImplementedError()
 
+	def uri(self, path: str = "") -> str:
+		"""The absolute URI of `path` relative to the object"""
+		raise NotImplementedError()
+
+	def gqlIter(self, query: str, path: typing.Sequence[typing.Union[str, int]], cursor: typing.Optional[str] = None, prefetch: bool = True, onPage: typing.Optional[typing.Callable[[typing.Optional[dict]], None]] = None, nested: typing.Optional[dict] = None, **args) -> typing.Iterator[dict]:
+		"""Streams the nodes of a GraphQL connection at `path` within `data`, following the cursors. See `Connections.iterConnection`. Returns an async iterator for async roots."""
+		root = self.root
+		return root._iterConnection(self.gqlReq, query, path, args, cursor, prefetch, onPage, nested, root.rateLimiter)
+
 	@property
 	def root(self):
 		raise NotImplementedError()
@@ -39,11 +62,145 @@ class GHApiObj_:
 	def env(self) -> dict:
 		return self.root.env
 
+	def _json(self, res: "httpx.Response") -> typing.Any:
+		"""Decodes a response with the codec of the root"""
+		return responseJSON(res, self.root.jsonCodec)
+
 
 def iteratePaginationSlice(slc: slice):
 	return iterateSlice(slc, defaultStart=1)
 
 
+def paginationNeedsLastPage(slc: slice) -> bool:
+	"""Negative indices in a pagination slice are counted from the last page, like in python sequences, so they need the count of pages to be known."""
+	if slc.step is not None and slc.step < 0 and slc.start is None:
+		return True
+	return any(el is not None and el < 0 for el in (slc.start, slc.stop))
+
+
+def resolvePaginationSlice(slc: slice, lastPage: int) -> range:
+	def absolute(i: typing.Optional[int]) -> typing.Optional[int]:
+		if i is not None and i < 0:
+			return lastPage + 1 + i
+		return i
+
+	start = absolute(slc.start)
+	stop = absolute(slc.stop)
+	step = slc.step
+	if step is None:
+		step = -1 if start is not None and stop is not None and start > stop else 1
+
+	if step > 0:
+		start = 1 if start is None else max(start, 1)
+		stop = lastPage + 1 if stop is None else min(stop, lastPage + 1)
+	else:
+		start = lastPage if start is None else min(start, lastPage)
+		stop = 0 if stop is None else max(stop, 0)
+
+	return range(start, stop, step)
+
+
+def markResumePoint(ex: BaseException, resumePagination: typing.Union[slice, range]):
+	"""Lets a caller resume a paginated iteration interrupted by `ex` from the failed page, passing `ex.resumePagination` as `pagination`."""
+	if getattr(ex, "resumePagination", None) is None:
+		try:
+			ex.resumePagination = resumePagination
+		except AttributeError:
+			pass
+
+
+def getLastPage(res: "httpx.Response") -> typing.Optional[int]:
+	"""Returns the number of the last page from `Link` header, `None` if it is unknown."""
+	last = res.links.get("last")
+	if last is None:
+		if "next" not in res.links:
+			pageNo = parse_qs(urlparse(str(res.url)).query).get("page", ("1",))[0]
+			return int(pageNo)
+		return None
+
+	return int(parse_qs(urlparse(last["url"]).query)["page"][0])
+
+
+def _planFetch(pageNo: int, resumeStop: typing.Optional[int], resumeStep: typing.Optional[int]) -> typing.Generator[typing.Tuple[str, int], "httpx.Response", "httpx.Response"]:
+	try:
+		return (yield ("fetch", pageNo))
+	except Exception as ex:
+		markResumePoint(ex, slice(pageNo, resumeStop, resumeStep))
+		raise
+
+
+def planPages(pagination: slice, parallel: bool) -> typing.Generator[typing.Tuple[str, typing.Any], typing.Any, None]:
+	"""Plans fetching the pages of a paginated listing independently of IO, so that both sync and async roots share it. Yields the actions:
+	* `("head", pageNo)` and `("fetch", pageNo)`: the response to a HEAD or to the request of the page is sent back into it (an exception is thrown);
+	* `("yield", res)`: `res` is the next page for the consumer;
+	* `("parallel", (pages, resumeStop, resumeStep))`: the last action, `pages` are fetched concurrently and yielded in their order. A failed one is marked with `markResumePoint(ex, slice(pageNo, resumeStop, resumeStep))`.
+	Negative slices are served from the end without fetching the preceding pages if the count of pages is known from `last` link, otherwise all the pages are fetched sequentially to count them."""
+
+	resumeStop, resumeStep = pagination.stop, pagination.step
+	if paginationNeedsLastPage(pagination):
+		lastPage = getLastPage((yield ("head", 1)))
+		if lastPage is None:
+			fetched = []
+			try:
+				while True:
+					res = yield ("fetch", len(fetched) + 1)
+					fetched.append(res)
+					if "next" not in res.links:
+						break
+			except Exception as ex:
+				markResumePoint(ex, pagination)
+				raise
+
+			for pageNo in resolvePaginationSlice(pagination, len(fetched)):
+				yield ("yield", fetched[pageNo - 1])
+			return
+
+		pages = resolvePaginationSlice(pagination, lastPage)
+		resumeStop, resumeStep = pages.stop, pages.step
+	else:
+		pages = iteratePaginationSlice(pagination)
+		for pageNo in pages:
+			res = yield from _planFetch(pageNo, resumeStop, resumeStep)
+			yield ("yield", res)
+
+			if "next" not in res.links:
+				return
+
+			if parallel:
+				lastPage = getLastPage(res)
+				if lastPage is not None:
+					pages = takewhile(lastPage.__ge__, pages)
+					break
+		else:
+			return
+
+	yield ("parallel", (pages, resumeStop, resumeStep))
+
+
+class LazyChild:
+	"""A sub-resource object (like `actions` of a repo) constructed by `factory(parent)` on the first access and stored into the slot named as the attribute prefixed with `_`"""
+
+	__slots__ = ("factory", "slot")
+
+	def __init__(self, factory: typing.Callable[[typing.Any], "GHApiObj"]):
+		self.factory = factory
+		self.slot = None
+
+	def __set_name__(self, owner: type, name: str):
+		self.slot = "_" + name
+
+	def __get__(self, obj, cls=None):
+		if obj is None:
+			return self
+
+		try:
+			return getattr(obj, self.slot)
+		except AttributeError:
+			res = self.factory(obj)
+			setattr(obj, self.slot, res)
+			return res
+
+
 GH_CT_PREFIX = "application/vnd.github"
 
 
@@ -64,7 +221,7 @@ class ContentType(Enum):
 CT = ContentType
 
 class GHAPIBase(GHApiObj_):
-	__slots__ = ("hdrz", "GH_API_BASE", "env", "timeout")
+	__slots__ = ("hdrz", "GH_API_BASE", "env", "timeout", "client", "_ownsClient", "paginationWorkers", "responseCache", "rateLimiter", "retryPolicy", "identityMap", "compactInfo", "singleFlight", "hooks", "jsonCodec")
 
 	def _getAPIRoot(self):
 		if self.env is not None:
@@ -81,12 +238,53 @@ class GHAPIBase(GHApiObj_):
 	def getDefaultAuthToken(self) -> str:
 		return self.env["ACTIONS"]["RUNTIME_TOKEN"]
 
+	@property
+	def event(self) -> "GHEvent":
+		"""The event triggered the workflow, shared by all the roots with the same env"""
+		from .GHActionsEnv import getGHEvent
+
+		return getGHEvent(self.env, self.jsonCodec)
+
 	def getAuth(self, token: str) -> str:
 		if token:
 			return "Bearer " + token
 
-	def __init__(self, token: str, userAgent: str = None, env: dict = None, timeout: float = 5):
+	def __init__(self, token: str, userAgent: str = None, env: dict = None, timeout: typing.Optional[float] = None, client: typing.Optional["httpx.Client"] = None, http2: bool = False, maxConnections: typing.Optional[int] = 100, maxKeepAlive: typing.Optional[int] = 20, paginationWorkers: int = 1, responseCache: typing.Optional["MemoryResponseCache"] = None, rateLimiter: typing.Optional[RateLimitScheduler] = None, retryPolicy: typing.Optional[RetryPolicy] = None, identityMap: typing.Optional[IdentityMap] = None, compactInfo: typing.Optional[CompactInfoPolicy] = None, singleFlight: typing.Optional[SingleFlight] = None, hooks: typing.Optional[typing.Iterable[typing.Callable[[RequestEvent], None]]] = None, jsonCodec: typing.Optional[JSONCodec] = None):
+		"""`client` allows to share a connection pool between several API roots. If it is not given, an own pooled keep-alive client is created and is closed by `close`.
+		`timeout` (in seconds) of each network operation of the own client, see `utils.createClient`. There is none by default: uploads of big chunks and cache commits may take long.
+		`paginationWorkers` is the count of pages of a paginated listing fetched concurrently once the count of pages is known from the first one.
+		`responseCache` is an opt-in cache (see `ResponseCache` module) of GET responses, they are revalidated with conditional requests.
+		`rateLimiter` tracks the rate limit budgets and paces the requests, if it is not given, the one from `_createRateLimiter` is used.
+		`retryPolicy` determines which transient failures are retried, the default one retries idempotent requests.
+		`identityMap` makes all the ways to get the same repo, user, org or issue return the same object and determines for how long their `info` is fresh. If it is not given, the one from `_createIdentityMap` is used.
+		`compactInfo` is an opt-in policy (see `CompactInfo` module) keeping only the projected fields of `info` of the objects, i. e. `CompactInfoPolicy(GitHubAPI.COMPACT_INFO_PROJECTIONS)`.
+		`singleFlight` makes concurrent identical GET and HEAD requests share a single round trip (and the response), if it is not given, the one from `_createSingleFlight` is used.
+		`hooks` are called with a `RequestEvent` for each transmission, see `Instrumentation` module. They can also be appended to `hooks` later.
+		`jsonCodec` encodes the bodies and decodes the responses (see `JSONCodec` module), the fastest one available by default."""
 		self.timeout = timeout
+		self.paginationWorkers = paginationWorkers
+		self.responseCache = responseCache
+		if rateLimiter is None:
+			rateLimiter = self._createRateLimiter()
+		self.rateLimiter = rateLimiter
+		if retryPolicy is None:
+			retryPolicy = RetryPolicy()
+		self.retryPolicy = retryPolicy
+		if identityMap is None:
+			identityMap = self._createIdentityMap()
+		self.identityMap = identityMap
+		self.compactInfo = compactInfo
+		if singleFlight is None:
+			singleFlight = self._createSingleFlight()
+		self.singleFlight = singleFlight
+		self.hooks = list(hooks) if hooks else []
+		if jsonCodec is None:
+			jsonCodec = defaultCodec()
+		self.jsonCodec = jsonCodec
+		self._ownsClient = client is None
+		if client is None:
+			client = self._createClient(http2=http2, maxConnections=maxConnections, maxKeepAlive=maxKeepAlive, timeout=timeout)
+		self.client = client
 		self.env = env
 		if token is None:
 			token = self.getDefaultAuthToken()
@@ -101,6 +299,35 @@ class GHAPIBase(GHApiObj_):
 
 		self.GH_API_BASE = self._getAPIRoot()
 
+	def _createClient(self, **kwargs):
+		return createClient(**kwargs)
+
+	def _createRateLimiter(self) -> typing.Optional[RateLimitScheduler]:
+		return RateLimitScheduler()
+
+	def _createSingleFlight(self) -> typing.Optional[SingleFlight]:
+		return SingleFlight()
+
+	def _createIdentityMap(self) -> typing.Optional[IdentityMap]:
+		return IdentityMap()
+
+	def _intern(self, cls: type, key: tuple, factory: typing.Callable[[], "GHApiObj"], dbID: typing.Optional[int] = None, info: typing.Optional[dict] = None) -> "GHApiObj":
+		"""Returns the object of `cls` registered under `key` in the identity map, constructing it with `factory` if there is none"""
+		identityMap = self.identityMap
+		if identityMap is None:
+			return factory()
+		return identityMap.get(cls, key, factory, dbID, info)
+
+	def close(self):
+		if self._ownsClient:
+			self.client.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args, **kwargs):
+		self.close()
+
 	@property
 	def root(self):
 		return self
@@ -109,6 +336,9 @@ class GHAPIBase(GHApiObj_):
 	def prefix(self) -> str:
 		return self.GH_API_BASE
 
+	def uri(self, path: str = "") -> str:
+		return self.prefix + path
+
 	def _genHeadersWithPreviews(self, previews: typing.Tuple[str] = ()) -> dict:
 		hdrz = type(self.hdrz)(self.hdrz)
 		if previews:
@@ -137,33 +367,171 @@ class GHAPIBase(GHApiObj_):
 		endpointBase += "?"
 		return fetchAndParsePage(1)
 
-	@classmethod
-	def _makeReqPaginated(cls, method, uri, data: typing.Optional[bytes], hdrz, urlParams, pagination: slice):
-		if urlParams is None:
-			urlParams = {}
-
-		urlParams["per_page"] = 100
-		for pageNo in iteratePaginationSlice(pagination):
-			urlParams["page"] = pageNo
-			print("Request:", method, uri, data, hdrz, urlParams)
-			res = httpx.request(method, uri, data=data, headers=hdrz, params=urlParams, timeout=None)
-			res.raise_for_status()
-			yield res
+	def _cacheLookup(self, method: str, uri: str, hdrz: dict, urlParams: typing.Optional[dict]) -> typing.Tuple[typing.Optional[str], typing.Optional[CachedResponse], dict]:
+		"""Returns the cache key, the cached response and the headers with the conditional ones added"""
+		if self.responseCache is None or method != "GET":
+			return None, None, hdrz
 
-			if "next" not in res.links:
-				break
+		key = self.responseCache.makeKey(method, uri, urlParams, hdrz)
+		cached = self.responseCache.get(key)
+		if cached is not None:
+			hdrz = dict(hdrz)
+			hdrz.update(cached.conditionalHeaders())
+		return key, cached, hdrz
 
-	@classmethod
-	def _makeReqMaybePaginated(cls, method, uri, data: typing.Optional[bytes], hdrz, urlParams, pagination: typing.Optional[slice] = None):
-		if not isinstance(pagination, (range, slice)):
-			print("Request:", method, uri, data, hdrz, urlParams)
-			res = httpx.request(method, uri, data=data, headers=hdrz, params=urlParams, timeout=None)
+	def _cacheProcess(self, key: typing.Optional[str], cached: typing.Optional[CachedResponse], res: "httpx.Response") -> "httpx.Response":
+		if key is None:
 			res.raise_for_status()
 			return res
+
+		if cached is not None and res.status_code == 304:
+			return cached.toResponse(res)
+
+		res.raise_for_status()
+		if res.status_code == 200:
+			entry = CachedResponse.fromResponse(res)
+			if entry is not None:
+				self.responseCache.put(key, entry)
+		return res
+
+	def _sendPlan(self, method: str, uri: str, hdrz: dict, urlParams: typing.Optional[dict], mutating: bool = False) -> typing.Generator[typing.Tuple[str, typing.Any], typing.Any, "httpx.Response"]:
+		"""Implements caching, rate limiting and retries independently of IO, so that both sync and async transports share it.
+		Yields `("sleep", seconds)` and `("send", headers)` actions. A response (or an exception) of a transmission is sent (thrown) back into it. Returns the final response."""
+
+		key, cached, hdrz = self._cacheLookup(method, uri, hdrz, urlParams)
+		limiter = self.rateLimiter
+		retryPolicy = self.retryPolicy
+		resource = limiter.resourceOf(uri) if limiter is not None else None
+		attempt = 0
+		limitAttempt = 0
+		while True:
+			if limiter is not None:
+				delay = limiter.reserveSlot(method, resource, mutating=mutating)
+				if delay > 0:
+					yield ("sleep", delay)
+
+			try:
+				res = yield ("send", hdrz)
+			except Exception as ex:
+				if retryPolicy is None or not retryPolicy.shouldRetryError(method, ex, attempt, hdrz):
+					raise
+				yield ("sleep", retryPolicy.delay(attempt))
+				attempt += 1
+				continue
+
+			if limiter is not None:
+				limiter.update(res, resource)
+				if limiter.retryDelay(res, resource, limitAttempt) is not None:
+					limitAttempt += 1
+					continue  # `reserveSlot` makes it wait
+
+			if retryPolicy is not None and retryPolicy.shouldRetryResponse(method, res, attempt, hdrz):
+				yield ("sleep", retryPolicy.delay(attempt, res))
+				attempt += 1
+				continue
+
+			return self._cacheProcess(key, cached, res)
+
+	def _send(self, method: str, uri: str, data: typing.Optional[bytes], hdrz: dict, urlParams: typing.Optional[dict]) -> "httpx.Response":
+		singleFlight = self.singleFlight
+		if singleFlight is None:
+			return self._sendAlone(method, uri, data, hdrz, urlParams)
+		return singleFlight.do(singleFlight.makeKey(method, uri, hdrz, urlParams), lambda: self._sendAlone(method, uri, data, hdrz, urlParams))
+
+	def _sendAlone(self, method: str, uri: str, data: typing.Optional[bytes], hdrz: dict, urlParams: typing.Optional[dict]) -> "httpx.Response":
+		limiter = self.rateLimiter
+		mutating = limiter is not None and limiter.isMutating(method, uri, data)
+		plan = self._sendPlan(method, uri, hdrz, urlParams, mutating)
+		lock = limiter.mutationLock if mutating else nullcontext()
+		attempt = 0
+		with lock:
+			try:
+				action, arg = next(plan)
+				while True:
+					if action == "sleep":
+						sleep(arg)
+						action, arg = next(plan)
+					else:
+						try:
+							if self.hooks:
+								res = self._transmitObserved(method, uri, data, arg, urlParams, attempt)
+							else:
+								res = self._transmit(method, uri, data, arg, urlParams)
+						except Exception as ex:  # pylint:disable=broad-except
+							attempt += 1
+							action, arg = plan.throw(ex)
+						else:
+							attempt += 1
+							action, arg = plan.send(res)
+			except StopIteration as ex:
+				return ex.value
+
+	def _emit(self, e: RequestEvent):
+		for h in self.hooks:
+			h(e)
+
+	def _transmitObserved(self, method: str, uri: str, data: typing.Optional[bytes], hdrz: dict, urlParams: typing.Optional[dict], attempt: int) -> "httpx.Response":
+		e = RequestEvent(method, uri, len(data) if data else 0, attempt)
+		started = perf_counter()
+		try:
+			res = self._transmit(method, uri, data, hdrz, urlParams, {"trace": e.trace} if TRACE_SUPPORTED else None)
+		except Exception as ex:
+			e.finish(started, error=ex)
+			self._emit(e)
+			raise
+		e.finish(started, res)
+		self._emit(e)
+		return res
+
+	def _transmit(self, method: str, uri: str, data: typing.Optional[bytes], hdrz: dict, urlParams: typing.Optional[dict], extensions: typing.Optional[dict] = None) -> "httpx.Response":
+		kwargs = {BODY_ARG: data}
+		if extensions is not None:
+			kwargs["extensions"] = extensions
+		return self.client.request(method, uri, headers=hdrz, params=urlParams, **kwargs)
+
+	def _makeReqPaginated(self, method, uri, data: typing.Optional[bytes], hdrz, urlParams, pagination: slice):
+		"""Pages are yielded in the order of `pagination`, see `planPages`"""
+		urlParams = dict(urlParams or (), per_page=100)
+		plan = planPages(pagination, self.paginationWorkers > 1)
+		try:
+			action, arg = next(plan)
+			while True:
+				if action == "yield":
+					yield arg
+					action, arg = next(plan)
+				elif action == "parallel":
+					pages, resumeStop, resumeStep = arg
+
+					def fetch(pageNo: int) -> "httpx.Response":
+						try:
+							return self._send(method, uri, data, hdrz, dict(urlParams, page=pageNo))
+						except Exception as ex:
+							markResumePoint(ex, slice(pageNo, resumeStop, resumeStep))
+							raise
+
+					with ThreadPoolExecutor(max_workers=self.paginationWorkers) as executor:
+						yield from orderedParallelMap(executor, fetch, pages, self.paginationWorkers)
+					return
+				else:
+					try:
+						if action == "head":
+							res = self._send("HEAD", uri, None, hdrz, dict(urlParams, page=arg))
+						else:
+							res = self._send(method, uri, data, hdrz, dict(urlParams, page=arg))
+					except Exception as ex:  # pylint:disable=broad-except
+						action, arg = plan.throw(ex)
+					else:
+						action, arg = plan.send(res)
+		except StopIteration:
+			return
+
+	def _makeReqMaybePaginated(self, method, uri, data: typing.Optional[bytes], hdrz, urlParams, pagination: typing.Optional[slice] = None):
+		if not isinstance(pagination, (range, slice)):
+			return self._send(method, uri, data, hdrz, urlParams)
 		else:
-			return cls._makeReqPaginated(method, uri, data, hdrz, urlParams, pagination)
+			return self._makeReqPaginated(method, uri, data, hdrz, urlParams, pagination)
 
-	def req(self, path: str = "/", obj: typing.Union[typing.Mapping[str, typing.Any], bytes] = None, method: typing.Optional[str] = None, previews: typing.Tuple[str] = (), urlParams=None, contentType: typing.Union[str, CT] = None, contentRange: range = None, accept: typing.Union[str, CT] = None, pagination: typing.Optional[slice] = None) -> httpx.Response:
+	def req(self, path: str = "/", obj: typing.Union[typing.Mapping[str, typing.Any], bytes] = None, method: typing.Optional[str] = None, previews: typing.Tuple[str] = (), urlParams=None, contentType: typing.Union[str, CT] = None, contentRange: range = None, accept: typing.Union[str, CT] = None, pagination: typing.Optional[slice] = None, headers: typing.Optional[typing.Mapping[str, str]] = None) -> "httpx.Response":
 		if path[-1:] == "/":
 			path = path[:-1]
 
@@ -189,6 +557,9 @@ class GHAPIBase(GHApiObj_):
 		if accept is not None:
 			hdrz["Accept"] = accept
 
+		if headers:
+			hdrz.update(headers)
+
 		if obj is not None:
 			if isinstance(obj, str):
 				data = obj.encode("utf-8")
@@ -210,16 +581,30 @@ class GHAPIBase(GHApiObj_):
 					urlParams.update(obj)
 					data = None
 				else:
-					data = json.dumps(obj)
+					data = self.jsonCodec.dumps(obj)
 
 		res = self._makeReqMaybePaginated(method, self.prefix + path, data=data if obj is not None else None, hdrz=hdrz, urlParams=urlParams, pagination=pagination)
 		return res
 
+	def _gqlData(self, query: str, args: dict) -> bytes:
+		return self.jsonCodec.dumps({"query": query, "variables": args})
+
+	def _gqlDecode(self, res: "httpx.Response") -> typing.Union[list, dict]:
+		return responseJSON(res, self.jsonCodec)
+
+	def _decodeListing(self, res: "httpx.Response", cls: type) -> list:
+		"""Decodes a page of a listing of `cls` objects. If `compactInfo` has a projection for `cls`, the elements are decoded straight into its records."""
+		policy = self.compactInfo
+		projection = policy.projectionOf(cls) if policy is not None else None
+		if projection is None:
+			return responseJSON(res, self.jsonCodec)
+		return responseRecords(res, self.jsonCodec, projection)
+
+	_iterConnection = staticmethod(iterConnection)
+
 	def gqlReq(self, query: str, previews: typing.Tuple[str] = (), **args: dict) -> typing.Union[list, dict]:
-		data = json.dumps({"query": query, "variables": args})
-		res = httpx.request("POST", self.GH_API_BASE + "graphql", data=data, headers=self._genHeadersWithPreviews(previews), timeout=None)
-		res.raise_for_status()
-		return json.loads(res.data.decode("utf-8"))
+		res = self._send("POST", self.GH_API_BASE + "graphql", self._gqlData(query, args), self._genHeadersWithPreviews(previews), None)
+		return self._gqlDecode(res)
 
 
 class UndocumentedAPIRoot(GHAPIBase):
@@ -250,6 +635,9 @@ class UndocumentedAPIRoot(GHAPIBase):
 	def getDefaultAccept(self):
 		return "application/json;" + self.__class__.API_VERSION_ARG_NAME_VALUE_PAIR
 
+	def _createRateLimiter(self) -> None:
+		return None  # undocumented APIs don't report rate limits, and serializing mutations would serialize uploads
+
 	@classmethod
 	def getACTIONS_RUNTIME_URL(cls, someId: str):
 		return "https://" + cls.SUBDOMAIN + "." + cls.ACTIONS_USER_CONTENT_DOMAIN + "/" + someId + "/"
@@ -261,28 +649,49 @@ class UndocumentedAPIRoot(GHAPIBase):
 
 		return self.__class__.getACTIONS_RUNTIME_URL(self.someId) + APIS_POSTFIX
 
-	def __init__(self, token: str, userAgent: str = None, env: dict = None, someId: str = None):
+	def __init__(self, token: str, userAgent: str = None, env: dict = None, someId: str = None, **kwargs):
 		self.someId = someId
-		super().__init__(token, userAgent, env)
+		super().__init__(token, userAgent, env, **kwargs)
 
 
 class GHApiObj(GHApiObj_):  # pylint:disable=abstract-method
-	__slots__ = ("parent", "_dbID", "info")
+	__slots__ = ("parent", "_dbID", "info", "_infoAt", "__weakref__")
 
 	INFOABLE = False  # Determines if info dict can be fetched from the object by a generic URI
 
 	def __init__(self, parent: typing.Union["GHApiObj", GHAPIBase], dbID: typing.Optional[int] = None, info: typing.Optional[dict] = None):
 		self.parent = parent
 		self._dbID = dbID
-		self.info = info
+		if info is not None:
+			self.info = self._compactInfo(info)
+			self._infoAt = monotonic()
+		else:
+			self.info = None
+			self._infoAt = None
+
+	def _compactInfo(self, info: typing.Mapping[str, typing.Any]) -> typing.Mapping[str, typing.Any]:
+		policy = self.root.compactInfo
+		if policy is None:
+			return info
+		return policy.compact(self.__class__, info)
+
+	def _setInfo(self, res: dict) -> typing.Mapping[str, typing.Any]:
+		self.dbID = res["id"]
+		self.info = self._compactInfo(res)
+		self._infoAt = monotonic()
+		return self.info
+
+	def _infoIsStale(self) -> bool:
+		"""`info` is refetched if it is missing or older than the TTL of the type in the identity map of the root"""
+		identityMap = self.root.identityMap
+		if identityMap is None:
+			return self.info is None
+		return not identityMap.isFresh(self)
 
 	def getInfo(self, fresh: bool = False, accept: str = CT.json):
 		if self.__class__.INFOABLE:
-			if self.info is None or fresh:
-				res = self.req("", None, method="GET", accept=accept).json()
-				self._dbID = res["id"]
-				self.info = res
-				return res
+			if fresh or self._infoIsStale():
+				return self._setInfo(self._json(self.req("", None, method="GET", accept=accept)))
 			else:
 				return self.info
 		else:
@@ -291,28 +700,56 @@ class GHApiObj(GHApiObj_):  # pylint:disable=abstract-method
 	@property
 	def dbID(self):
 		if not self._dbID:
-			self._dbID = self._getDBID()
+			self.dbID = self._getDBID()
 		return self._dbID
 
 	@dbID.setter
 	def dbID(self, v: int):
-		self._dbID = v
+		if v != self._dbID:
+			self._dbID = v
+			identityMap = self.root.identityMap
+			if identityMap is not None and v is not None:
+				identityMap.registerDBID(self)
+
+	def _nodeIDScope(self) -> typing.Optional["GHApiObj"]:
+		"""The ancestor (the repo or the owner) the node ID of the object is scoped to"""
+		scope = scopeOf(self.__class__.__name__)
+		if scope is None:
+			return None
+
+		types = SCOPE_TYPES[scope]
+		el = self.parent
+		while isinstance(el, GHApiObj):
+			if el.__class__.__name__ in types:
+				return el
+			el = el.parent
+		raise ValueError(self.__class__.__name__ + " is not within a " + scope)
 
 	@property
-	def nodeID(self):
-		return dbIDAndType2NodeID(self.dbID, self.__class__.__name__)
+	def nodeID(self) -> str:
+		"""Computed offline from `dbID` (and `dbID` of the repo or the owner for the objects scoped to them)"""
+		scope = self._nodeIDScope()
+		return encodeNodeID(self.__class__.__name__, self.dbID, scope.dbID if scope is not None else None)
 
 	@nodeID.setter
-	def nodeID(self, v: int):
-		iD, cName = nodeID2DBIDAndType(self.dbID)
+	def nodeID(self, v: str):
+		cName, iD, scopeID = decodeNodeID(v)
 		if self.__class__.__name__ != cName:
 			raise ValueError("Node ID from another type", cName)
-		self._dbID = iD
+		self.dbID = iD
+		if scopeID is not None:
+			scope = self._nodeIDScope()
+			if scope._dbID is None:
+				scope.dbID = scopeID
 
 	def _getDBID(self):
 		self.getInfo()  # updates self._dbID as a side effect
 		return self._dbID
 
+	def _gqlLocator(self) -> typing.List[typing.Tuple[str, typing.Mapping[str, typing.Union[str, int]]]]:
+		"""The chain of GraphQL fields with their arguments selecting the object from the query root, used by `Batch.resolveBatch`"""
+		raise NotImplementedError
+
 	@property
 	def root(self):
 		el = self
@@ -325,8 +762,11 @@ class GHApiObj(GHApiObj_):  # pylint:disable=abstract-method
 	def env(self) -> dict:
 		return self.root.env
 
-	def req(self, path: str = "/", obj=None, method: str = "POST", previews: typing.Tuple[str] = (), urlParams=None, contentType: str = None, contentRange: range = None, accept: str = None, pagination: typing.Optional[slice] = None) -> httpx.Response:
-		return self.parent.req(self.prefix + path, obj, method=method, previews=previews, urlParams=urlParams, contentType=contentType, contentRange=contentRange, accept=accept, pagination=pagination)
+	def uri(self, path: str = "") -> str:
+		return self.parent.uri(self.prefix + path)
+
+	def req(self, path: str = "/", obj=None, method: str = "POST", previews: typing.Tuple[str] = (), urlParams=None, contentType: str = None, contentRange: range = None, accept: str = None, pagination: typing.Optional[slice] = None, headers: typing.Optional[typing.Mapping[str, str]] = None) -> "httpx.Response":
+		return self.parent.req(self.prefix + path, obj, method=method, previews=previews, urlParams=urlParams, contentType=contentType, contentRange=contentRange, accept=accept, pagination=pagination, headers=headers)
 
 	def gqlReq(self, query: str, previews: typing.Tuple[str] = (), **args: dict) -> typing.Union[list, dict]:
 		return self.parent.gqlReq(query, previews=previews, **args)
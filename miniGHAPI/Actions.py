@@ -1,25 +1,35 @@
 import typing
+from pathlib import PurePath
+from zipfile import ZipInfo
 
-from .APICore import GHApiObj
+from .APICore import GHApiObj, LazyChild
+from .Download import DEFAULT_DOWNLOAD_CHUNK_SIZE, ProgressCallback, downloadTo, iterDownload, iterZipMembers
 
 
 class Artifact(GHApiObj):
 	__slots__ = ("id",)
 
+	INFOABLE = True
+
 	def __init__(self, parent, iD: int):
-		super().__init__(parent)
+		super().__init__(parent, dbID=iD)
 		self.id = iD
 
 	@property
 	def prefix(self) -> str:
 		return str(self.id) + "/"
 
-	def info(self) -> str:
-		return self.req().json()
-
 	def download(self, archiveFormat: str) -> str:
 		return self.req(archiveFormat)
 
+	def downloadTo(self, dst: typing.Union[PurePath, str, typing.BinaryIO], archiveFormat: str = "zip", chunkSize: int = DEFAULT_DOWNLOAD_CHUNK_SIZE, progress: typing.Optional[ProgressCallback] = None) -> int:
+		"""Streams the archive into a path or a binary file object, resuming it if the connection drops. Returns its size."""
+		return downloadTo(self.root, self.uri(archiveFormat), dst, chunkSize, progress)
+
+	def iterMembers(self, chunkSize: int = DEFAULT_DOWNLOAD_CHUNK_SIZE, progress: typing.Optional[ProgressCallback] = None) -> typing.Iterator[typing.Tuple[ZipInfo, typing.BinaryIO]]:
+		"""Yields the files of the artifact while the archive is being downloaded, see `Download.iterZipMembers`"""
+		return iterZipMembers(iterDownload(self.root, self.uri("zip"), chunkSize, progress))
+
 	def delete(self) -> str:
 		return self.req(method="DELETE")
 
@@ -32,7 +42,7 @@ class Artifacts(GHApiObj):
 		return "artifacts/"
 
 	def __iter__(self):
-		return self.req().json()["artifacts"]
+		return self._json(self.req())["artifacts"]
 
 	def __getitem__(self, iD: int) -> Artifact:
 		return Artifact(self, iD)
@@ -41,22 +51,21 @@ class Artifacts(GHApiObj):
 class WorkflowRun(GHApiObj):
 	__slots__ = ("id",)
 
+	INFOABLE = True
+
 	def __init__(self, parent, iD: int):
-		super().__init__(parent)
+		super().__init__(parent, dbID=iD)
 		self.id = iD
 
 	@property
 	def prefix(self) -> str:
 		return str(self.id) + "/"
 
-	def info(self):
-		return self.req().json()
-
 	def rerun(self):
 		return self.req("rerun")
 
 	def artifacts(self):
-		return self.req("artifacts").json()["artifacts"]
+		return self._json(self.req("artifacts"))["artifacts"]
 
 	def cancel(self):
 		return self.req("cancel")
@@ -64,8 +73,16 @@ class WorkflowRun(GHApiObj):
 	def logs(self, method="GET"):
 		return self.req("logs", method=method)
 
+	def downloadLogsTo(self, dst: typing.Union[PurePath, str, typing.BinaryIO], chunkSize: int = DEFAULT_DOWNLOAD_CHUNK_SIZE, progress: typing.Optional[ProgressCallback] = None) -> int:
+		"""Streams the zip of the logs into a path or a binary file object, resuming it if the connection drops. Returns its size."""
+		return downloadTo(self.root, self.uri("logs"), dst, chunkSize, progress)
+
+	def iterLogs(self, chunkSize: int = DEFAULT_DOWNLOAD_CHUNK_SIZE, progress: typing.Optional[ProgressCallback] = None) -> typing.Iterator[typing.Tuple[ZipInfo, typing.BinaryIO]]:
+		"""Yields the log files of the jobs while the archive is being downloaded, see `Download.iterZipMembers`"""
+		return iterZipMembers(iterDownload(self.root, self.uri("logs"), chunkSize, progress))
+
 	def timing(self):
-		return self.req("timing").json()
+		return self._json(self.req("timing"))
 
 
 Run = WorkflowRun
@@ -80,7 +97,7 @@ class Runs(GHApiObj):
 
 	def get(self, **kwargs: dict):
 		"""https://developer.github.com/v3/actions/workflow-runs/#list-workflow-runs-for-a-repository"""
-		return self.req(obj=kwargs, method="GET").json()["workflow_runs"]
+		return self._json(self.req(obj=kwargs, method="GET"))["workflow_runs"]
 
 	def __getitem__(self, iD: int):
 		return Run(self, iD)
@@ -94,13 +111,13 @@ class Secrets(GHApiObj):
 		return "secrets/"
 
 	def publicKey(self):
-		return self.req("public-key").json()
+		return self._json(self.req("public-key"))
 
 	def __iter__(self):
-		return self.req().json()["secrets"]
+		return self._json(self.req())["secrets"]
 
 	def getInfo(self, key: str):
-		return self.req(key).json()
+		return self._json(self.req(key))
 
 	def put(self, key: str, encrypted: str, keyId: str):
 		return self.req(key, {"encrypted_value": encrypted, "key_id": keyId}, method="put")
@@ -109,28 +126,27 @@ class Secrets(GHApiObj):
 		return self.req(key, method="DELETE")
 
 	def repos(self, key: str):
-		return self.req(key + "/repositories").json()["repositories"]
+		return self._json(self.req(key + "/repositories"))["repositories"]
 
 	def setRepos(self, key: str, repos: typing.List[int]):
-		return self.req(key + "/repositories", {"selected_repository_ids": repos}, method="put").json()["repositories"]
+		return self._json(self.req(key + "/repositories", {"selected_repository_ids": repos}, method="put"))["repositories"]
 
 
 class Workflow(GHApiObj):
 	__slots__ = ("id",)
 
+	INFOABLE = True
+
 	def __init__(self, parent, iD: int):
-		super().__init__(parent)
+		super().__init__(parent, dbID=iD)
 		self.id = iD
 
 	@property
 	def prefix(self) -> str:
 		return str(self.id) + "/"
 
-	def info(self):
-		return self.req().json()
-
 	def timing(self):
-		return self.req("timing").json()
+		return self._json(self.req("timing"))
 
 
 class Workflows(GHApiObj):
@@ -145,14 +161,12 @@ class Workflows(GHApiObj):
 
 
 class Actions(GHApiObj):
-	__slots__ = ("runs", "artifacts", "secrets", "workflows")
-
-	def __init__(self, parent):
-		super().__init__(parent)
-		self.artifacts = Artifacts(self)
-		self.runs = Runs(self)
-		self.secrets = Secrets(self)
-		self.workflows = Workflows(self)
+	__slots__ = ("_runs", "_artifacts", "_secrets", "_workflows")
+
+	artifacts = LazyChild(Artifacts)
+	runs = LazyChild(Runs)
+	secrets = LazyChild(Secrets)
+	workflows = LazyChild(Workflows)
 
 	@property
 	def prefix(self) -> str:
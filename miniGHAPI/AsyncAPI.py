@@ -0,0 +1,279 @@
+"""asyncio twins of the API roots. The object tree (`Repository`, `Organization`, `Actions`, ...) is shared with the synchronous API: `req` and `gqlReq` of any object reached from an async root return awaitables (or async iterators for paginated requests). Methods post-processing responses have awaitable counterparts in this module."""
+
+__all__ = ("AsyncGHAPI", "AsyncPipelinesAPIRoot", "AsyncArtifactsUploader", "getInfo", "iterPages", "iterRepos", "getRepos", "iterOrgs", "getOrgs", "iterMembers", "getMembers")
+
+import asyncio
+import typing
+from collections import deque
+from contextlib import nullcontext
+from pathlib import PurePath
+from time import perf_counter
+
+from .APICore import CT, TRACE_SUPPORTED, GHApiObj, markResumePoint, planPages
+from .Connections import aiterConnection
+from .Instrumentation import RequestEvent
+from .GitHubAPI import GHAPI, Organization, RepoOwner, Repository, User
+from .undocumented import PipelinesAPIRoot
+from .utils import BODY_ARG, createAsyncClient
+
+
+class AsyncRootMixin:
+	"""Must be mixed before a `GHAPIBase` subclass. The resulting class must have `semaphore` slot."""
+
+	__slots__ = ()
+
+	def __init__(self, *args, maxConcurrency: int = 10, **kwargs):
+		self.semaphore = asyncio.Semaphore(maxConcurrency)
+		super().__init__(*args, **kwargs)
+
+	def _createClient(self, **kwargs):
+		return createAsyncClient(**kwargs)
+
+	async def aclose(self):
+		if self._ownsClient:
+			await self.client.aclose()
+
+	def close(self):
+		raise TypeError("Use `aclose`")
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *args, **kwargs):
+		await self.aclose()
+
+	async def _send(self, method: str, uri: str, data: typing.Optional[bytes], hdrz: dict, urlParams: typing.Optional[dict]) -> "httpx.Response":
+		singleFlight = self.singleFlight
+		if singleFlight is None:
+			return await self._sendAlone(method, uri, data, hdrz, urlParams)
+		return await singleFlight.ado(singleFlight.makeKey(method, uri, hdrz, urlParams), lambda: self._sendAlone(method, uri, data, hdrz, urlParams))
+
+	async def _sendAlone(self, method: str, uri: str, data: typing.Optional[bytes], hdrz: dict, urlParams: typing.Optional[dict]) -> "httpx.Response":
+		limiter = self.rateLimiter
+		mutating = limiter is not None and limiter.isMutating(method, uri, data)
+		plan = self._sendPlan(method, uri, hdrz, urlParams, mutating)
+		if mutating:
+			if limiter.asyncMutationLock is None:
+				limiter.asyncMutationLock = asyncio.Lock()
+			lock = limiter.asyncMutationLock
+		else:
+			lock = nullcontext()
+
+		attempt = 0
+		async with lock:
+			try:
+				action, arg = next(plan)
+				while True:
+					if action == "sleep":
+						await asyncio.sleep(arg)
+						action, arg = next(plan)
+					else:
+						try:
+							if self.hooks:
+								res = await self._transmitObserved(method, uri, data, arg, urlParams, attempt)
+							else:
+								res = await self._transmit(method, uri, data, arg, urlParams)
+						except Exception as ex:  # pylint:disable=broad-except
+							attempt += 1
+							action, arg = plan.throw(ex)
+						else:
+							attempt += 1
+							action, arg = plan.send(res)
+			except StopIteration as ex:
+				return ex.value
+
+	async def _transmitObserved(self, method: str, uri: str, data: typing.Optional[bytes], hdrz: dict, urlParams: typing.Optional[dict], attempt: int) -> "httpx.Response":
+		e = RequestEvent(method, uri, len(data) if data else 0, attempt)
+		started = perf_counter()
+		try:
+			res = await self._transmit(method, uri, data, hdrz, urlParams, {"trace": e.atrace} if TRACE_SUPPORTED else None)
+		except Exception as ex:
+			e.finish(started, error=ex)
+			self._emit(e)
+			raise
+		e.finish(started, res)
+		self._emit(e)
+		return res
+
+	async def _transmit(self, method: str, uri: str, data: typing.Optional[bytes], hdrz: dict, urlParams: typing.Optional[dict], extensions: typing.Optional[dict] = None) -> "httpx.Response":
+		async with self.semaphore:
+			kwargs = {BODY_ARG: data}
+			if extensions is not None:
+				kwargs["extensions"] = extensions
+			return await self.client.request(method, uri, headers=hdrz, params=urlParams, **kwargs)
+
+	async def _makeReqPaginated(self, method, uri, data: typing.Optional[bytes], hdrz, urlParams, pagination: slice):
+		"""Pages are yielded in the order of `pagination`, see `planPages`"""
+		urlParams = dict(urlParams or (), per_page=100)
+		plan = planPages(pagination, self.paginationWorkers > 1)
+		try:
+			action, arg = next(plan)
+			while True:
+				if action == "yield":
+					yield arg
+					action, arg = next(plan)
+				elif action == "parallel":
+					pages, resumeStop, resumeStep = arg
+
+					async def fetch(pageNo: int) -> "httpx.Response":
+						try:
+							return await self._send(method, uri, data, hdrz, dict(urlParams, page=pageNo))
+						except Exception as ex:
+							markResumePoint(ex, slice(pageNo, resumeStop, resumeStep))
+							raise
+
+					pending = deque()
+					try:
+						for pageNo in pages:
+							pending.append(asyncio.ensure_future(fetch(pageNo)))
+							if len(pending) >= self.paginationWorkers:
+								yield await pending.popleft()
+
+						while pending:
+							yield await pending.popleft()
+					finally:
+						for t in pending:
+							t.cancel()
+					return
+				else:
+					try:
+						if action == "head":
+							res = await self._send("HEAD", uri, None, hdrz, dict(urlParams, page=arg))
+						else:
+							res = await self._send(method, uri, data, hdrz, dict(urlParams, page=arg))
+					except Exception as ex:  # pylint:disable=broad-except
+						action, arg = plan.throw(ex)
+					else:
+						action, arg = plan.send(res)
+		except StopIteration:
+			return
+
+	_iterConnection = staticmethod(aiterConnection)
+
+	async def gqlReq(self, query: str, previews: typing.Tuple[str] = (), **args: dict) -> typing.Union[list, dict]:
+		res = await self._send("POST", self.GH_API_BASE + "graphql", self._gqlData(query, args), self._genHeadersWithPreviews(previews), None)
+		return self._gqlDecode(res)
+
+
+class AsyncGHAPI(AsyncRootMixin, GHAPI):
+	__slots__ = ("semaphore",)
+
+
+class AsyncPipelinesAPIRoot(AsyncRootMixin, PipelinesAPIRoot):
+	__slots__ = ("semaphore",)
+
+
+async def getInfo(obj: GHApiObj, fresh: bool = False, accept: str = CT.json) -> dict:
+	if not obj.__class__.INFOABLE:
+		raise NotImplementedError
+
+	if fresh or obj._infoIsStale():
+		res = await obj.req("", None, method="GET", accept=accept)
+		return obj._setInfo(obj._json(res))
+
+	return obj.info
+
+
+async def iterPages(obj: GHApiObj, path: str, query: typing.Optional[dict] = None, pagination: slice = slice(None, None), cls: typing.Optional[type] = None) -> typing.AsyncIterator[typing.Any]:
+	"""Yields decoded pages of a paginated listing. If the listing is of `cls` objects, the pages are decoded as by `_decodeListing`."""
+
+	root = obj.root
+	async for res in obj.req(path, query, method="GET", pagination=pagination):
+		if cls is None:
+			yield root._json(res)
+		else:
+			yield root._decodeListing(res, cls)
+
+
+async def iterRepos(owner: RepoOwner, populate: bool = True) -> typing.AsyncIterator["Repository"]:
+	repos = {} if populate else None
+	async for page in iterPages(owner, "repos", cls=Repository):
+		for el in page:
+			repo = owner._repoFromInfo(el)
+			if populate:
+				repos[el["name"]] = repo
+			yield repo
+
+	if populate:
+		owner.repos = repos
+
+
+async def getRepos(owner: RepoOwner, fresh: bool = False) -> dict:
+	if owner.repos is None or fresh:
+		async for _ in iterRepos(owner):
+			pass
+
+	return owner.repos
+
+
+async def iterOrgs(user: User, populate: bool = True) -> typing.AsyncIterator[Organization]:
+	orgs = [] if populate else None
+	async for page in iterPages(user, "orgs", cls=Organization):
+		for el in page:
+			org = user._orgFromInfo(el)
+			if populate:
+				orgs.append(org)
+			yield org
+
+	if populate:
+		user.orgs = orgs
+
+
+async def getOrgs(user: User, fresh: bool = False) -> list:
+	if user.orgs is None or fresh:
+		async for _ in iterOrgs(user):
+			pass
+
+	return user.orgs
+
+
+async def iterMembers(org: Organization, populate: bool = True) -> typing.AsyncIterator[User]:
+	members = [] if populate else None
+	async for page in iterPages(org, "members", cls=User):
+		for el in page:
+			member = org._memberFromInfo(el)
+			if populate:
+				members.append(member)
+			yield member
+
+	if populate:
+		org.members = members
+
+
+async def getMembers(org: Organization, fresh: bool = False) -> list:
+	if org.members is None or fresh:
+		async for _ in iterMembers(org):
+			pass
+
+	return org.members
+
+
+class AsyncArtifactsUploader:
+	"""Async counterpart of `ArtifactsUploader`. Files put with `put` are uploaded concurrently (bounded by the root semaphore), the artifact is patched on exit."""
+
+	__slots__ = ("parent", "container", "name")
+
+	def __init__(self, parent, name: str):
+		self.parent = parent
+		self.name = name
+		self.container = None
+
+	async def __aenter__(self):
+		if self.container is None:
+			artifacts = self.parent.workflows.artifacts
+			res = await artifacts.req(path="", obj=artifacts._containerReqObj(self.name), method="post")
+			self.container = artifacts._containerFromResponse(artifacts._json(res), self.name)
+			self.name = None
+
+		return self
+
+	async def put(self, fileName: PurePath, fileContents: bytes) -> dict:
+		res = await self.container.file(fileName)._put(None, fileContents)
+		return self.container._json(res)
+
+	async def putMany(self, files: typing.Mapping[PurePath, bytes]) -> typing.List[dict]:
+		return await asyncio.gather(*(self.put(k, v) for k, v in files.items()))
+
+	async def __aexit__(self, excType, *args, **kwargs):
+		if excType is None:
+			await self.parent.workflows.artifacts.req("", obj={}, method="PATCH", urlParams={"artifactName": self.container.name})
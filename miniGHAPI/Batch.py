@@ -0,0 +1,85 @@
+"""Resolution of database IDs, node IDs and info fields of many objects with few GraphQL requests. Each object is located by an aliased field of a single query, the queries are split to stay within the limits."""
+
+__all__ = ("resolveBatch", "buildBatchQuery")
+
+import typing
+
+from .utils import json
+
+BASE_FIELDS = ("id", "databaseId")
+DEFAULT_MAX_ALIASES = 100
+DEFAULT_MAX_NODES = 500  # objects selected within a query, including the ones on the way to the resolved ones
+
+Locator = typing.Sequence[typing.Tuple[str, typing.Mapping[str, typing.Union[str, int]]]]
+
+
+def _literal(v: typing.Union[str, int, bool]) -> str:
+	if isinstance(v, bool):
+		return "true" if v else "false"
+	if isinstance(v, int):
+		return str(v)
+	return json.dumps(str(v))  # JSON escapes are valid in GraphQL strings
+
+
+def _selection(locator: Locator, fields: typing.Sequence[str]) -> str:
+	res = " ".join(fields)
+	for name, args in reversed(locator):
+		res = name + "(" + ", ".join(k + ": " + _literal(v) for k, v in args.items()) + ") {" + res + "}"
+	return res
+
+
+def buildBatchQuery(locators: typing.Sequence[Locator], fields: typing.Sequence[str]) -> str:
+	"""The object located by `locators[i]` is selected under the alias `a<i>`"""
+	return "query {" + " ".join("a" + str(i) + ": " + _selection(l, fields) for i, l in enumerate(locators)) + "}"
+
+
+def _extract(data: dict, alias: str, locator: Locator) -> typing.Optional[dict]:
+	res = data.get(alias)
+	for name, _ in locator[1:]:
+		if res is None:
+			break
+		res = res.get(name)
+	return res
+
+
+def _splitBatches(objs: typing.Sequence["GHApiObj"], maxAliases: int, maxNodes: int) -> typing.Iterator[typing.List[typing.Tuple["GHApiObj", Locator]]]:
+	batch = []
+	nodes = 0
+	for o in objs:
+		locator = o._gqlLocator()
+		if batch and (len(batch) >= maxAliases or nodes + len(locator) > maxNodes):
+			yield batch
+			batch = []
+			nodes = 0
+		batch.append((o, locator))
+		nodes += len(locator)
+
+	if batch:
+		yield batch
+
+
+def resolveBatch(objs: typing.Iterable["GHApiObj"], fields: typing.Sequence[str] = (), maxAliases: int = DEFAULT_MAX_ALIASES, maxNodes: int = DEFAULT_MAX_NODES) -> typing.List[typing.Optional[dict]]:
+	"""Fetches `id` (the node ID), `databaseId` and `fields` (GraphQL names) of each object, populating their `dbID`s. Objects must implement `_gqlLocator` and belong to the same root.
+	Returns the results in the order of `objs`, `None` for the objects not found."""
+
+	objs = list(objs)
+	if not objs:
+		return []
+
+	root = objs[0].root
+	fields = list(dict.fromkeys(BASE_FIELDS + tuple(fields)))
+	res = []
+	for batch in _splitBatches(objs, maxAliases, maxNodes):
+		answer = root.gqlReq(buildBatchQuery([l for _, l in batch], fields))
+		data = answer.get("data")
+		errors = answer.get("errors")
+		if data is None or (errors and any(not e.get("path") for e in errors)):
+			raise ValueError("GraphQL errors", errors)  # errors of located objects (i. e. NOT_FOUND) have paths, the rest ones fail the whole query
+
+		for i, (o, locator) in enumerate(batch):
+			r = _extract(data, "a" + str(i), locator)
+			if r is not None and r.get("databaseId") is not None:
+				o.dbID = r["databaseId"]
+			res.append(r)
+
+	return res
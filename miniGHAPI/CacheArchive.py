@@ -0,0 +1,158 @@
+"""Streaming creation and extraction of cache archives in the format of `actions/cache`: a tar of the paths relative to the workspace, compressed with zstd (if `zstandard` is installed) or gzip."""
+
+__all__ = ("getCacheVersion", "getDefaultCompression", "getAvailableCompressions", "ChunkWriter", "ChunkReader", "writeCacheArchive", "extractCacheArchive")
+
+import gzip
+import io
+import os
+import tarfile
+import typing
+from hashlib import sha256
+from pathlib import Path
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+VERSION_SALT = "1.0"
+
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd-without-long"  # long-distance matching is a feature of the zstd CLI not exposed the same way by the bindings, toolkit has a separate method for archives made without it
+
+ARCHIVE_NAMES = {
+	COMPRESSION_GZIP: "cache.tgz",
+	COMPRESSION_ZSTD: "cache.tzst",
+}
+
+
+def getDefaultCompression() -> str:
+	return COMPRESSION_ZSTD if zstandard is not None else COMPRESSION_GZIP
+
+
+def getAvailableCompressions() -> typing.Tuple[str, ...]:
+	"""In the order of preference"""
+	if zstandard is not None:
+		return (COMPRESSION_ZSTD, COMPRESSION_GZIP)
+	return (COMPRESSION_GZIP,)
+
+
+def getCacheVersion(paths: typing.Iterable[str], compression: str) -> str:
+	"""Computes the version the same way toolkit does, so the caches are interchangeable with `actions/cache`."""
+	components = list(paths)
+	components.append(compression)
+	components.append(VERSION_SALT)
+	return sha256("|".join(components).encode("utf-8")).hexdigest()
+
+
+class ChunkWriter:
+	"""A write-only file-like object cutting the stream into `chunkSize` chunks passed to `onChunk(offset, chunk)` as they are filled."""
+
+	__slots__ = ("chunkSize", "onChunk", "buffer", "offset", "closed")
+
+	def __init__(self, chunkSize: int, onChunk: typing.Callable[[int, bytes], None]):
+		self.chunkSize = chunkSize
+		self.onChunk = onChunk
+		self.buffer = bytearray()
+		self.offset = 0
+		self.closed = False
+
+	def writable(self) -> bool:
+		return True
+
+	def write(self, data: bytes) -> int:
+		self.buffer += data
+		while len(self.buffer) >= self.chunkSize:
+			self._emit(bytes(self.buffer[: self.chunkSize]))
+			del self.buffer[: self.chunkSize]
+		return len(data)
+
+	def _emit(self, chunk: bytes):
+		self.onChunk(self.offset, chunk)
+		self.offset += len(chunk)
+
+	def flush(self):
+		pass
+
+	def close(self):
+		if not self.closed:
+			if self.buffer:
+				self._emit(bytes(self.buffer))
+				self.buffer = bytearray()
+			self.closed = True
+
+	def tell(self) -> int:
+		return self.offset + len(self.buffer)
+
+	@property
+	def size(self) -> int:
+		return self.tell()
+
+
+class ChunkReader(io.RawIOBase):
+	"""A read-only file-like object over an iterable of chunks, the counterpart of `ChunkWriter`. Only the current chunk is kept."""
+
+	__slots__ = ("chunks", "current")
+
+	def __init__(self, chunks: typing.Iterable[bytes]):
+		super().__init__()
+		self.chunks = iter(chunks)
+		self.current = memoryview(b"")
+
+	def readable(self) -> bool:
+		return True
+
+	def readinto(self, b) -> int:
+		while not self.current:
+			chunk = next(self.chunks, None)
+			if chunk is None:
+				return 0
+			self.current = memoryview(chunk)
+
+		n = min(len(b), len(self.current))
+		b[:n] = self.current[:n]
+		self.current = self.current[n:]
+		return n
+
+
+def _openCompressor(dst: typing.BinaryIO, compression: str) -> typing.BinaryIO:
+	if compression == COMPRESSION_GZIP:
+		return gzip.GzipFile(fileobj=dst, mode="wb", mtime=0)
+	if compression == COMPRESSION_ZSTD:
+		if zstandard is None:
+			raise ImportError("`zstandard` is needed for zstd compression")
+		return zstandard.ZstdCompressor(threads=-1).stream_writer(dst, closefd=False)
+	raise ValueError("Unsupported compression", compression)
+
+
+def writeCacheArchive(dst: typing.BinaryIO, paths: typing.Iterable[Path], workspace: Path, compression: str):
+	"""Writes the compressed tar into `dst` in streaming fashion, without an intermediate file. Member names are relative to `workspace` like in the archives made by toolkit."""
+	workspace = Path(workspace)
+	compressor = _openCompressor(dst, compression)
+	try:
+		with tarfile.open(fileobj=compressor, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+			for p in paths:
+				p = workspace / p
+				tar.add(str(p), arcname=os.path.relpath(p, workspace))
+	finally:
+		compressor.close()
+
+
+def extractCacheArchive(src: typing.BinaryIO, workspace: Path, compression: str):
+	"""Decompresses and extracts the archive as it is read from `src`, nothing is buffered besides the decompressor state."""
+	if compression == COMPRESSION_GZIP:
+		mode = "r|gz"
+	elif compression == COMPRESSION_ZSTD:
+		if zstandard is None:
+			raise ImportError("`zstandard` is needed for zstd compression")
+		src = zstandard.ZstdDecompressor().stream_reader(src, closefd=False)
+		mode = "r|"
+	else:
+		raise ValueError("Unsupported compression", compression)
+
+	with tarfile.open(fileobj=src, mode=mode) as tar:
+		if hasattr(tarfile, "fully_trusted_filter"):
+			# paths outside of the workspace (i. e. `~/.cache`) are stored as relative ones with `..`, like `tar -P` of toolkit does, so the filters confining to the destination cannot be used. Caches are only written by workflows of the same repo.
+			tar.extractall(str(workspace), filter="fully_trusted")
+		else:
+			tar.extractall(str(workspace))
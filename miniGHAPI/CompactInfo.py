@@ -0,0 +1,115 @@
+"""Compact storage of `info` of objects of large listings. REST answers carry dozens of fields (mostly `*_url` ones), which are never read. A projection keeps only the listed fields in a slotted read-only mapping.
+A projection is a sequence of field names, a nested object is projected by a `(name, projection)` pair, i. e. `("id", "name", ("owner", ("login", "id")))`."""
+
+__all__ = ("InfoRecord", "recordType", "project", "CompactInfoPolicy")
+
+import typing
+from collections.abc import Mapping
+from threading import Lock
+
+Projection = typing.Sequence[typing.Union[str, typing.Tuple[str, "Projection"]]]
+
+
+class InfoRecord(Mapping):
+	"""A read-only mapping of the projected fields. The fields absent in the source are absent in the record."""
+
+	__slots__ = ()
+
+	FIELDS = ()
+	NESTED = {}  # field name -> record type
+
+	@classmethod
+	def fromMapping(cls, info: typing.Mapping[str, typing.Any]) -> "InfoRecord":
+		res = cls.__new__(cls)
+		nestedTypes = cls.NESTED
+		for k in cls.FIELDS:
+			if k in info:
+				v = info[k]
+				nested = nestedTypes.get(k)
+				if nested is not None and v is not None:
+					v = nested.fromMapping(v)
+				setattr(res, "_" + k, v)
+		return res
+
+	def __getitem__(self, k: str) -> typing.Any:
+		if k not in self.__class__.NESTED and k not in self.__class__.FIELDS:
+			raise KeyError(k)
+		try:
+			return getattr(self, "_" + k)
+		except AttributeError:
+			raise KeyError(k) from None
+
+	def __iter__(self) -> typing.Iterator[str]:
+		for k in self.__class__.FIELDS:
+			if hasattr(self, "_" + k):
+				yield k
+
+	def __len__(self) -> int:
+		return sum(1 for _ in self)
+
+	def toDict(self) -> dict:
+		return {k: (v.toDict() if isinstance(v, InfoRecord) else v) for k, v in self.items()}
+
+	def __repr__(self):
+		return self.__class__.__name__ + "(" + repr(self.toDict()) + ")"
+
+
+_recordTypes = {}
+_recordTypesLock = Lock()
+
+
+def _normalize(projection: Projection) -> tuple:
+	return tuple(el if isinstance(el, str) else (el[0], _normalize(el[1])) for el in projection)
+
+
+def recordType(projection: Projection) -> typing.Type[InfoRecord]:
+	"""Record classes are shared by equal projections"""
+	projection = _normalize(projection)
+	res = _recordTypes.get(projection)
+	if res is not None:
+		return res
+
+	nested = {el[0]: recordType(el[1]) for el in projection if not isinstance(el, str)}
+	with _recordTypesLock:
+		res = _recordTypes.get(projection)
+		if res is None:
+			fields = tuple(el if isinstance(el, str) else el[0] for el in projection)
+			res = type("InfoRecord_" + str(len(_recordTypes)), (InfoRecord,), {"__slots__": tuple("_" + f for f in fields), "FIELDS": fields, "NESTED": nested})  # slots are prefixed, since field names may coincide with the names of `Mapping` methods
+			_recordTypes[projection] = res
+	return res
+
+
+def project(info: typing.Mapping[str, typing.Any], projection: Projection) -> InfoRecord:
+	return recordType(projection).fromMapping(info)
+
+
+class CompactInfoPolicy:
+	"""Maps object types to the projections of their `info` (subclasses inherit them). `info` of the types without a projection is kept as is."""
+
+	__slots__ = ("projections", "resolved")
+
+	def __init__(self, projections: typing.Mapping[type, Projection]):
+		self.projections = {k: _normalize(v) for k, v in projections.items()}
+		self.resolved = {}
+
+	def projectionOf(self, cls: type) -> typing.Optional[tuple]:
+		try:
+			return self.resolved[cls]
+		except KeyError:
+			pass
+
+		res = None
+		for c in cls.__mro__:
+			if c in self.projections:
+				res = self.projections[c]
+				break
+		self.resolved[cls] = res
+		return res
+
+	def compact(self, cls: type, info: typing.Mapping[str, typing.Any]) -> typing.Mapping[str, typing.Any]:
+		if isinstance(info, InfoRecord):  # already compacted, i. e. decoded into a record by `JSONCodec.loadRecords`
+			return info
+		projection = self.projectionOf(cls)
+		if projection is None:
+			return info
+		return project(info, projection)
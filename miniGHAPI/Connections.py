@@ -0,0 +1,156 @@
+"""Iteration over GraphQL connections by cursors.
+A query must declare `$cursor: String` variable, pass it as `after` of the connection and select `pageInfo {endCursor hasNextPage}` and either `nodes` or `edges {node}` of it. `rateLimit` is added to the query automatically.
+"""
+
+__all__ = ("iterConnection", "aiterConnection", "withRateLimit")
+
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+RATE_LIMIT_SELECTION = "rateLimit {cost limit remaining used resetAt}"
+
+Path = typing.Sequence[typing.Union[str, int]]
+Nested = typing.Mapping[typing.Tuple[str, ...], typing.Tuple[str, Path]]
+PageCallback = typing.Callable[[typing.Optional[dict]], None]
+
+
+def withRateLimit(query: str) -> str:
+	if "rateLimit" in query:
+		return query
+
+	q = query.rstrip()
+	if not q.endswith("}"):
+		raise ValueError("Not a GraphQL query", query)
+	return q[:-1] + " " + RATE_LIMIT_SELECTION + "}"
+
+
+def _dig(data: typing.Any, path: Path) -> typing.Any:
+	for k in path:
+		if data is None:
+			break
+		data = data[k]
+	return data
+
+
+def _parsePage(answer: dict, path: Path) -> typing.Tuple[typing.Optional[dict], typing.Optional[dict]]:
+	"""Returns the connection and the rate limit info"""
+	if answer.get("errors"):
+		raise ValueError("GraphQL errors", answer["errors"])
+
+	data = answer["data"]
+	return _dig(data, path), data.get("rateLimit")
+
+
+def _nodesOf(connection: dict) -> list:
+	nodes = connection.get("nodes")
+	if nodes is None:
+		nodes = [e["node"] for e in connection["edges"]]
+	return nodes
+
+
+def _extendConnection(connection: dict, nodes: list):
+	if "nodes" in connection:
+		connection["nodes"].extend(nodes)
+	else:
+		connection["edges"].extend({"node": n} for n in nodes)
+	connection["pageInfo"]["hasNextPage"] = False
+
+
+def _incompleteNested(node: dict, nested: typing.Optional[Nested]) -> typing.Iterator[typing.Tuple[dict, str, Path]]:
+	if nested:
+		for subPath, (subQuery, subConnectionPath) in nested.items():
+			connection = _dig(node, subPath)
+			if connection is not None and connection["pageInfo"]["hasNextPage"]:
+				yield connection, subQuery, subConnectionPath
+
+
+def iterConnection(gqlReq: typing.Callable[..., dict], query: str, path: Path, variables: typing.Optional[dict] = None, cursor: typing.Optional[str] = None, prefetch: bool = True, onPage: typing.Optional[PageCallback] = None, nested: typing.Optional[Nested] = None, rateLimiter: typing.Optional["RateLimitScheduler"] = None) -> typing.Iterator[dict]:
+	"""Yields the nodes of the connection at `path` within `data`, page by page. If `prefetch` is set, the next page is requested while the current one is being processed.
+	`onPage` is called with `rateLimit` (`cost`, `limit`, `remaining`, `used`, `resetAt`) of each page, the graphql budget of `rateLimiter` is updated from it.
+	`nested` maps paths of inner connections within a node to the queries fetching their remaining pages. Such a query gets the `id` of the node as `$id` (and `$cursor`), and its connection path, i. e. `{("issues",): ("query($id: ID!, $cursor: String) {node(id: $id) {... on Repository {issues(first: 100, after: $cursor) {nodes {title} pageInfo {endCursor hasNextPage}}}}}", ("node", "issues"))}`. Nodes are yielded with the inner connections complete."""
+
+	query = withRateLimit(query)
+	variables = dict(variables) if variables else {}
+
+	def fetch(cursor: typing.Optional[str]) -> typing.Tuple[typing.Optional[dict], typing.Optional[dict]]:
+		connection, rateLimit = _parsePage(gqlReq(query, **dict(variables, cursor=cursor)), path)
+		if rateLimit is not None and rateLimiter is not None:
+			rateLimiter.updateGraphQL(rateLimit)
+		return connection, rateLimit
+
+	executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+	nextPage = None
+	try:
+		connection, rateLimit = fetch(cursor)
+		while True:
+			if onPage is not None:
+				onPage(rateLimit)
+			if connection is None:
+				return
+
+			pageInfo = connection["pageInfo"]
+			if pageInfo["hasNextPage"] and executor is not None:
+				nextPage = executor.submit(fetch, pageInfo["endCursor"])
+
+			for node in _nodesOf(connection):
+				for subConnection, subQuery, subPath in _incompleteNested(node, nested):
+					_extendConnection(subConnection, list(iterConnection(gqlReq, subQuery, subPath, {"id": node["id"]}, subConnection["pageInfo"]["endCursor"], False, onPage, None, rateLimiter)))
+				yield node
+
+			if not pageInfo["hasNextPage"]:
+				return
+
+			if nextPage is not None:
+				connection, rateLimit = nextPage.result()
+				nextPage = None
+			else:
+				connection, rateLimit = fetch(pageInfo["endCursor"])
+	finally:
+		if nextPage is not None:
+			nextPage.cancel()
+		if executor is not None:
+			executor.shutdown(wait=False)
+
+
+async def aiterConnection(gqlReq: typing.Callable[..., typing.Awaitable[dict]], query: str, path: Path, variables: typing.Optional[dict] = None, cursor: typing.Optional[str] = None, prefetch: bool = True, onPage: typing.Optional[PageCallback] = None, nested: typing.Optional[Nested] = None, rateLimiter: typing.Optional["RateLimitScheduler"] = None) -> typing.AsyncIterator[dict]:
+	"""asyncio counterpart of `iterConnection`"""
+	import asyncio  # already imported by the running loop, not importing it for the sync API
+
+	query = withRateLimit(query)
+	variables = dict(variables) if variables else {}
+
+	async def fetch(cursor: typing.Optional[str]) -> typing.Tuple[typing.Optional[dict], typing.Optional[dict]]:
+		connection, rateLimit = _parsePage(await gqlReq(query, **dict(variables, cursor=cursor)), path)
+		if rateLimit is not None and rateLimiter is not None:
+			rateLimiter.updateGraphQL(rateLimit)
+		return connection, rateLimit
+
+	nextPage = None
+	try:
+		connection, rateLimit = await fetch(cursor)
+		while True:
+			if onPage is not None:
+				onPage(rateLimit)
+			if connection is None:
+				return
+
+			pageInfo = connection["pageInfo"]
+			if pageInfo["hasNextPage"] and prefetch:
+				nextPage = asyncio.ensure_future(fetch(pageInfo["endCursor"]))
+
+			for node in _nodesOf(connection):
+				for subConnection, subQuery, subPath in _incompleteNested(node, nested):
+					_extendConnection(subConnection, [n async for n in aiterConnection(gqlReq, subQuery, subPath, {"id": node["id"]}, subConnection["pageInfo"]["endCursor"], False, onPage, None, rateLimiter)])
+				yield node
+
+			if not pageInfo["hasNextPage"]:
+				return
+
+			if nextPage is not None:
+				connection, rateLimit = await nextPage
+				nextPage = None
+			else:
+				connection, rateLimit = await fetch(pageInfo["endCursor"])
+	finally:
+		if nextPage is not None:
+			nextPage.cancel()
@@ -0,0 +1,248 @@
+"""Streaming downloads of large bodies (artifacts, logs), which are never read into memory as a whole. Interrupted transfers are resumed with `Range` requests."""
+
+__all__ = ("iterDownload", "downloadTo", "iterZipMembers", "ProgressCallback", "DEFAULT_DOWNLOAD_CHUNK_SIZE")
+
+import struct
+import typing
+import zlib
+from pathlib import PurePath
+from tempfile import SpooledTemporaryFile
+from time import sleep
+from zipfile import ZIP_DEFLATED, ZIP_STORED, BadZipFile, ZipFile, ZipInfo
+
+from .CacheArchive import ChunkReader
+from . import utils
+from .utils import streamRequest
+
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+ZIP_SPOOL_MAX_MEMORY = 64 * 1024 * 1024
+INFLATE_BLOCK_SIZE = 1024 * 1024
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+ZIP64_EXTRA_ID = 1
+ZIP64_MARKER = 0xFFFFFFFF
+
+FLAG_ENCRYPTED = 0x1
+FLAG_DATA_DESCRIPTOR = 0x8
+FLAG_UTF8 = 0x800
+
+ProgressCallback = typing.Callable[[int, typing.Optional[int]], None]
+
+
+def _totalSize(res: "httpx.Response") -> typing.Optional[int]:
+	contentRange = res.headers.get("Content-Range")
+	if contentRange is not None:
+		total = contentRange.rsplit("/", 1)[1]
+		return int(total) if total != "*" else None
+
+	contentLength = res.headers.get("Content-Length")
+	return int(contentLength) if contentLength is not None else None
+
+
+def iterDownload(root, url: str, chunkSize: int = DEFAULT_DOWNLOAD_CHUNK_SIZE, progress: typing.Optional[ProgressCallback] = None) -> typing.Iterator[bytes]:
+	"""Yields the body of `url` (following redirects to a storage) in chunks. `progress` is called with the count of bytes received and the total size (`None` if unknown).
+	If the connection drops, the download is resumed from the byte it has stopped at according to the `retryPolicy` of the root. The original URL is requested again, since the URLs GitHub redirects to expire quickly."""
+
+	hdrz = root._genHeadersWithPreviews()
+	hdrz.pop("Content-Type", None)
+	retryPolicy = root.retryPolicy
+	received = 0
+	total = None
+	attempt = 0
+
+	while True:
+		if received:
+			hdrz["Range"] = "bytes=" + str(received) + "-"
+
+		try:
+			with streamRequest(root.client, url, hdrz, chunkSize) as (res, chunks):
+				skip = received if res.status_code != 206 else 0  # the server has ignored the range
+				if total is None:
+					total = _totalSize(res)
+
+				for chunk in chunks:
+					if skip:
+						if len(chunk) <= skip:
+							skip -= len(chunk)
+							continue
+						chunk = chunk[skip:]
+						skip = 0
+
+					received += len(chunk)
+					attempt = 0
+					yield chunk
+					if progress is not None:
+						progress(received, total)
+			return
+		except utils.STREAM_INTERRUPTED_ERRORS:
+			if retryPolicy is None or attempt >= retryPolicy.maxRetries:
+				raise
+			sleep(retryPolicy.delay(attempt))
+		except utils.HTTPStatusError as ex:
+			if retryPolicy is None or not retryPolicy.shouldRetryResponse("GET", ex.response, attempt):
+				raise
+			sleep(retryPolicy.delay(attempt, ex.response))
+		attempt += 1
+
+
+def downloadTo(root, url: str, dst: typing.Union[PurePath, str, typing.BinaryIO], chunkSize: int = DEFAULT_DOWNLOAD_CHUNK_SIZE, progress: typing.Optional[ProgressCallback] = None) -> int:
+	"""Writes the body of `url` into a path or a binary file object chunk by chunk. Returns the count of bytes written."""
+	if isinstance(dst, (str, PurePath)):
+		with open(dst, "wb") as f:
+			return downloadTo(root, url, f, chunkSize, progress)
+
+	size = 0
+	for chunk in iterDownload(root, url, chunkSize, progress):
+		dst.write(chunk)
+		size += len(chunk)
+	return size
+
+
+class _ChunkStream:
+	"""Reads a stream of chunks by arbitrary pieces, allowing to return the overread bytes back"""
+
+	__slots__ = ("chunks", "buffer", "position")
+
+	def __init__(self, chunks: typing.Iterable[bytes]):
+		self.chunks = iter(chunks)
+		self.buffer = bytearray()
+		self.position = 0  # count of bytes consumed from the beginning of the stream
+
+	def _fill(self, n: int) -> bool:
+		while len(self.buffer) < n:
+			chunk = next(self.chunks, None)
+			if chunk is None:
+				return False
+			self.buffer += chunk
+		return True
+
+	def peek(self, n: int) -> bytes:
+		self._fill(n)
+		return bytes(self.buffer[:n])
+
+	def readSome(self, n: int) -> bytes:
+		"""At most `n` bytes, an empty result means the end of the stream"""
+		self._fill(1)
+		res = bytes(self.buffer[:n])
+		del self.buffer[:n]
+		self.position += len(res)
+		return res
+
+	def readExactly(self, n: int) -> bytes:
+		if not self._fill(n):
+			raise BadZipFile("Truncated archive")
+		return self.readSome(n)
+
+	def unread(self, data: bytes):
+		self.buffer[:0] = data
+		self.position -= len(data)
+
+	def rest(self) -> typing.Iterator[bytes]:
+		if self.buffer:
+			yield bytes(self.buffer)
+			self.buffer = bytearray()
+		yield from self.chunks
+
+
+def _parseDosDateTime(date: int, time: int) -> typing.Tuple[int, int, int, int, int, int]:
+	return ((date >> 9) + 1980, (date >> 5) & 0xF, date & 0x1F, time >> 11, (time >> 5) & 0x3F, (time & 0x1F) * 2)
+
+
+def _parseZip64Extra(extra: bytes, size: int, compressedSize: int) -> typing.Tuple[int, int, bool]:
+	i = 0
+	while i + 4 <= len(extra):
+		tp, ln = struct.unpack_from("<HH", extra, i)
+		if tp == ZIP64_EXTRA_ID:
+			fields = extra[i + 4 : i + 4 + ln]
+			j = 0
+			if size == ZIP64_MARKER:
+				(size,) = struct.unpack_from("<Q", fields, j)
+				j += 8
+			if compressedSize == ZIP64_MARKER:
+				(compressedSize,) = struct.unpack_from("<Q", fields, j)
+			return size, compressedSize, True
+		i += 4 + ln
+	return size, compressedSize, False
+
+
+def _memberData(stream: _ChunkStream, info: ZipInfo, zip64: bool) -> typing.Iterator[bytes]:
+	crc = 0
+	if info.compress_type == ZIP_STORED:
+		left = info.compress_size
+		while left:
+			data = stream.readSome(min(left, INFLATE_BLOCK_SIZE))
+			if not data:
+				raise BadZipFile("Truncated archive")
+			left -= len(data)
+			crc = zlib.crc32(data, crc)
+			yield data
+	else:
+		d = zlib.decompressobj(-zlib.MAX_WBITS)  # deflate streams are self-terminating, so the size is not needed
+		while not d.eof:
+			data = stream.readSome(INFLATE_BLOCK_SIZE)
+			if not data:
+				raise BadZipFile("Truncated archive")
+			while data and not d.eof:
+				out = d.decompress(data, INFLATE_BLOCK_SIZE)
+				data = d.unconsumed_tail
+				if out:
+					crc = zlib.crc32(out, crc)
+					yield out
+		stream.unread(d.unused_data)
+
+	expectedCRC = info.CRC
+	if info.flag_bits & FLAG_DATA_DESCRIPTOR:
+		sig = stream.readExactly(4)
+		crcBytes = stream.readExactly(4) if sig == DATA_DESCRIPTOR_SIGNATURE else sig
+		(expectedCRC,) = struct.unpack("<I", crcBytes)
+		stream.readExactly(16 if zip64 else 8)
+
+	if crc != expectedCRC:
+		raise BadZipFile("Bad CRC-32 for file " + repr(info.filename))
+
+
+def _iterSpooledMembers(stream: _ChunkStream, maxMemory: int) -> typing.Iterator[typing.Tuple[ZipInfo, typing.BinaryIO]]:
+	"""The rest of the archive is spooled and read using its central directory. `zipfile` treats the skipped part as if it was a prefix of a self-extracting archive, offsets of the members already yielded become negative."""
+	with SpooledTemporaryFile(maxMemory) as spool:
+		for chunk in stream.rest():
+			spool.write(chunk)
+
+		with ZipFile(spool) as zf:
+			for info in zf.infolist():
+				if info.header_offset < 0:
+					continue
+				with zf.open(info) as f:
+					yield info, f
+
+
+def iterZipMembers(chunks: typing.Iterable[bytes], spoolMaxMemory: int = ZIP_SPOOL_MAX_MEMORY) -> typing.Iterator[typing.Tuple[ZipInfo, typing.BinaryIO]]:
+	"""Yields members of a zip archive while it is being downloaded, using the local headers. Each file object is only valid till the next member is requested, the unread rest of a member is skipped.
+	Members which sizes are known only from the central directory at the end of the archive (stored ones with data descriptors), as well as the ones compressed with methods other than deflate, cannot be streamed: the rest of the archive is spooled (into memory up to `spoolMaxMemory`, to disk beyond) once such a member is met."""
+
+	stream = _ChunkStream(chunks)
+	while stream.peek(4) == LOCAL_HEADER_SIGNATURE:
+		header = stream.readExactly(LOCAL_HEADER.size)
+		_, _, flags, method, time, date, crc, compressedSize, size, nameLen, extraLen = LOCAL_HEADER.unpack(header)
+		name = stream.readExactly(nameLen)
+		extra = stream.readExactly(extraLen)
+
+		if flags & FLAG_ENCRYPTED or method not in (ZIP_STORED, ZIP_DEFLATED) or (method == ZIP_STORED and flags & FLAG_DATA_DESCRIPTOR):
+			stream.unread(header + name + extra)
+			yield from _iterSpooledMembers(stream, spoolMaxMemory)
+			return
+
+		size, compressedSize, zip64 = _parseZip64Extra(extra, size, compressedSize)
+		info = ZipInfo(name.decode("utf-8" if flags & FLAG_UTF8 else "cp437"), _parseDosDateTime(date, time))
+		info.compress_type = method
+		info.flag_bits = flags
+		info.CRC = crc
+		info.compress_size = compressedSize
+		info.file_size = size
+		info.extra = extra
+
+		data = _memberData(stream, info, zip64)
+		yield info, ChunkReader(data)
+		for _ in data:
+			pass
@@ -1,39 +1,167 @@
+"""The environment of GitHub Actions: the env vars grouped by their prefixes and the payload of the event triggered the workflow. Both are read lazily and are memoized."""
+
 import typing
-from collections import defaultdict
+from collections.abc import MutableMapping
 from os import environ
 from pathlib import Path
+from threading import Lock
+
+from .JSONCodec import JSONCodec, defaultCodec, walkPath
 
 ctors = {"WORKSPACE": Path, "WORKFLOW": Path, "HOME": Path}
+PREFIXES = ("GITHUB", "ACTIONS", "INPUT")
+TOP_LEVEL = ("HOME",)
 
 
-def postprocessEnviron(e: dict) -> dict:
-	for k in tuple(e):
-		if k in ctors:
-			ctor = ctors[k]
-		elif k.endswith("_PATH"):
-			ctor = Path
-		else:
-			continue
-		e[k] = ctor(e[k])
-
-
-def filterEnviron() -> dict:
-	pfxes = ("GITHUB", "ACTIONS", "INPUT")
-	res = defaultdict(dict)
-	for pfx in pfxes:
-		pfx_ = pfx + "_"
-		l = len(pfx_)
-		res[pfx] = {k[l:]: v for k, v in environ.items() if k[:l] == pfx_}
-	for k in ("HOME",):
-		res[k] = environ[k]
-	return res
+def _convert(k: str, v: str) -> typing.Any:
+	ctor = ctors.get(k)
+	if ctor is None and k.endswith("_PATH"):
+		ctor = Path
+	return ctor(v) if ctor is not None else v
+
+
+def _checkNotFrozen(obj: MutableMapping):
+	if obj.frozen:
+		raise TypeError("The env is shared, so it is read-only. Modify its `copy()`.")
+
+
+class GHEnvSection(MutableMapping):
+	"""The env vars with a prefix, i. e. `GITHUB_`, without it. A var is read and converted (paths into `Path`s) on the first access. The names are listed by scanning the environ once, on the first iteration.
+	Unless `frozen`, it can be modified like a dict, the first modification reads all the vars, so they are not mixed with the ones set in the environ later. The environ itself is not modified."""
+
+	__slots__ = ("prefix", "values", "names", "complete", "frozen")
+
+	def __init__(self, prefix: str, frozen: bool = False):
+		self.prefix = prefix + "_"
+		self.values = {}
+		self.names = None
+		self.complete = False
+		self.frozen = frozen
+
+	def __getitem__(self, k: str) -> typing.Any:
+		try:
+			return self.values[k]
+		except KeyError:
+			if self.complete:
+				raise
+		res = self.values[k] = _convert(k, environ[self.prefix + k])
+		return res
+
+	def _names(self) -> typing.Tuple[str, ...]:
+		if self.names is None:
+			l = len(self.prefix)
+			self.names = tuple(k[l:] for k in environ if k[:l] == self.prefix)
+		return self.names
+
+	def _complete(self):
+		_checkNotFrozen(self)
+		if not self.complete:
+			for k in self._names():
+				self[k]
+			self.complete = True
+			self.names = None
+
+	def __setitem__(self, k: str, v: typing.Any):
+		self._complete()
+		self.values[k] = v
+
+	def __delitem__(self, k: str):
+		self._complete()
+		del self.values[k]
+
+	def copy(self) -> "GHEnvSection":
+		"""A modifiable copy, the values already read are kept"""
+		res = self.__class__(self.prefix[:-1])
+		res.values = dict(self.values)
+		res.names = self.names
+		res.complete = self.complete
+		return res
+
+	def __iter__(self) -> typing.Iterator[str]:
+		if self.complete:
+			return iter(self.values)
+		return iter(self._names())
+
+	def __len__(self) -> int:
+		if self.complete:
+			return len(self.values)
+		return len(self._names())
+
+	def __repr__(self):
+		return self.__class__.__name__ + "(" + repr(self.prefix) + ")"
+
+
+class GHEnv(MutableMapping):
+	"""The env vars grouped by the prefixes (`env["GITHUB"]["WORKSPACE"]`) and the top-level ones (`env["HOME"]`), nothing is read before it is accessed. Modifiable like `GHEnvSection` unless `frozen` (with its sections)."""
+
+	__slots__ = ("sections", "complete", "frozen")
+
+	def __init__(self, frozen: bool = False):
+		self.sections = {pfx: GHEnvSection(pfx, frozen) for pfx in PREFIXES}
+		self.complete = False
+		self.frozen = frozen
+
+	def __getitem__(self, k: str) -> typing.Any:
+		try:
+			return self.sections[k]
+		except KeyError:
+			if self.complete or k not in TOP_LEVEL:
+				raise
+		return environ[k]
+
+	def _complete(self):
+		_checkNotFrozen(self)
+		if not self.complete:
+			for k in TOP_LEVEL:
+				if k in environ:
+					self.sections[k] = environ[k]
+			self.complete = True
+
+	def __setitem__(self, k: str, v: typing.Any):
+		self._complete()
+		self.sections[k] = v
 
+	def __delitem__(self, k: str):
+		self._complete()
+		del self.sections[k]
 
-def getGHEnv() -> dict:
-	r = filterEnviron()
-	for d in r.values():
-		postprocessEnviron(d)
-	return r
+	def __iter__(self) -> typing.Iterator[str]:
+		if self.complete:
+			yield from self.sections
+			return
+		yield from PREFIXES
+		for k in TOP_LEVEL:
+			if k in environ:
+				yield k
+
+	def __len__(self) -> int:
+		return sum(1 for _ in self)
+
+	def copy(self) -> "GHEnv":
+		"""A modifiable copy, the values already read are kept"""
+		res = self.__class__()
+		res.sections = {k: (v.copy() if isinstance(v, MutableMapping) else v) for k, v in self.sections.items()}
+		res.complete = self.complete
+		return res
+
+	def __repr__(self):
+		return self.__class__.__name__ + "()"
+
+
+_ghEnv = None
+_events = {}
+_eventsLock = Lock()
+
+
+def getGHEnv(fresh: bool = False) -> GHEnv:
+	"""The env of the current process, shared by the callers (including the API roots), so it is `frozen`: a component needing to override some vars must modify its `copy()`. `fresh` drops the memoized values, including the events."""
+	global _ghEnv
+	if _ghEnv is None or fresh:
+		_ghEnv = GHEnv(frozen=True)
+		if fresh:
+			with _eventsLock:
+				_events.clear()
+	return _ghEnv
 
 
 def getRepo(env: dict) -> typing.Tuple[str, str]:
@@ -41,10 +169,87 @@ def getRepo(env: dict) -> typing.Tuple[str, str]:
 	return owner, name
 
 
-def getEvent(env: dict) -> dict:
-	from .utils import json
+EventPath = typing.Union[str, typing.Sequence[typing.Union[str, int]]]
+
+
+def _splitPath(path: EventPath) -> typing.Tuple[typing.Union[str, int], ...]:
+	if isinstance(path, str):
+		path = path.split(".")
+	return tuple(int(el) if isinstance(el, str) and el.isdigit() else el for el in path)
+
+
+_MISSING = object()
+
+
+class GHEvent:
+	"""The payload of the event triggered the workflow. The file is read once. `get` extracts a value by a path (`"pull_request.head.sha"`, numbers are indices in arrays) and memoizes it. Until the whole `payload` is needed, the codecs able to (`msgspec`) decode only the values on the path, skipping the rest of the document without materializing it."""
+
+	__slots__ = ("path", "codec", "lock", "_data", "_payload", "extracted")
+
+	def __init__(self, path: Path, codec: typing.Optional[JSONCodec] = None):
+		if codec is None:
+			codec = defaultCodec()
+		self.path = Path(path)
+		self.codec = codec
+		self.lock = Lock()
+		self._data = None
+		self._payload = None
+		self.extracted = {}
+
+	def _read(self) -> bytes:
+		if self._data is None:
+			self._data = self.path.read_bytes()
+		return self._data
+
+	@property
+	def payload(self) -> dict:
+		"""The whole document. It is shared, so it must not be mutated."""
+		with self.lock:
+			if self._payload is None:
+				self._payload = self.codec.loads(self._read())
+				self._data = None
+			return self._payload
+
+	def get(self, path: EventPath, default: typing.Any = None) -> typing.Any:
+		path = _splitPath(path)
+		with self.lock:
+			payload = self._payload
+			if payload is None:
+				try:
+					return self.extracted[path]
+				except KeyError:
+					pass
+				res = self.extracted[path] = self.codec.loadPath(self._read(), path, _MISSING)
+			else:
+				res = walkPath(payload, path, _MISSING)
+		return default if res is _MISSING else res
+
+	def __getitem__(self, path: EventPath) -> typing.Any:
+		res = self.get(path, _MISSING)
+		if res is _MISSING:
+			raise KeyError(path)
+		return res
+
+	def __repr__(self):
+		return self.__class__.__name__ + "(" + repr(str(self.path)) + ")"
+
+
+def getGHEvent(env: typing.Mapping[str, typing.Any], codec: typing.Optional[JSONCodec] = None) -> GHEvent:
+	"""The accessor of the event of `env`. It is shared by all the callers (including the API roots) with the same `GITHUB_EVENT_PATH` and codec."""
+	if codec is None:
+		codec = defaultCodec()
+	path = str(env["GITHUB"]["EVENT_PATH"])
+	key = (path, codec)
+	with _eventsLock:
+		res = _events.get(key)
+		if res is None:
+			res = _events[key] = GHEvent(path, codec)
+	return res
+
 
-	return json.loads(env["GITHUB"]["EVENT_PATH"].read_text())
+def getEvent(env: typing.Mapping[str, typing.Any], codec: typing.Optional[JSONCodec] = None) -> dict:
+	"""The whole payload of the event, parsed once, see `getGHEvent`. It must not be mutated."""
+	return getGHEvent(env, codec).payload
 
 
 def getShittyIdFromACTIONS_RUNTIME_URL():
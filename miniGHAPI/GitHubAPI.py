@@ -1,10 +1,11 @@
 import base64
 import typing
+from datetime import datetime, timezone
 from pathlib import PurePosixPath
 
 from .Actions import Actions
-from .APICore import MAIN_DOMAIN, USERCONTENT_DOMAIN, CT, GHAPIBase, GHApiObj
-from .utils import httpx
+from .APICore import MAIN_DOMAIN, USERCONTENT_DOMAIN, CT, GHAPIBase, GHApiObj, LazyChild
+from .Batch import DEFAULT_MAX_ALIASES, resolveBatch
 
 
 class BlocksMixin:
@@ -20,17 +21,49 @@ class BlocksMixin:
 		return self.req("blocks/" + user, None, method="DELETE")
 
 
+def _timestamp(t: typing.Union[str, datetime]) -> str:
+	"""GitHub expects ISO 8601 timestamps, naive `datetime`s are treated as UTC"""
+	if isinstance(t, datetime):
+		if t.tzinfo is not None:
+			t = t.astimezone(timezone.utc).replace(tzinfo=None)
+		t = t.replace(microsecond=0).isoformat() + "Z"
+	return t
+
+
+def _listingQuery(since: typing.Optional[typing.Union[str, datetime]], sort: typing.Optional[str], direction: typing.Optional[str]) -> dict:
+	q = {}
+	if since is not None:
+		q["since"] = _timestamp(since)
+	if sort is not None:
+		q["sort"] = sort
+	if direction is not None:
+		q["direction"] = direction
+	return q
+
+
+def _getRepo(root: GHAPIBase, owner: str, repo: str, dbID: typing.Optional[int] = None, info: typing.Optional[dict] = None) -> "Repository":
+	return root._intern(Repo, (owner, repo), lambda: Repo(root, owner, repo, dbID=dbID, info=info), dbID, info)
+
+
+def _getOwner(root: GHAPIBase, cls: typing.Type["RepoOwner"], name: str, dbID: typing.Optional[int] = None, info: typing.Optional[dict] = None, mergeInfo: bool = True) -> "RepoOwner":
+	return root._intern(cls, (name,), lambda: cls(root, name, dbID=dbID, info=info), dbID, info if mergeInfo else None)
+
+
 class GHAPI(GHAPIBase, BlocksMixin):
 	__slots__ = ()
 
 	def repo(self, owner: str, repo: str):
-		return Repo(self, owner, repo)
+		return _getRepo(self, owner, repo)
 
 	def org(self, owner: str):
-		return Org(self, owner)
+		return _getOwner(self, Org, owner)
 
 	def user(self, owner: str):
-		return User(self, owner)
+		return _getOwner(self, User, owner)
+
+	def resolve(self, objs: typing.Iterable[GHApiObj], fields: typing.Sequence[str] = (), batchSize: int = DEFAULT_MAX_ALIASES) -> typing.List[typing.Optional[dict]]:
+		"""Resolves node IDs, database IDs and GraphQL `fields` of repos, issues, users and orgs with one GraphQL query per `batchSize` objects. See `Batch.resolveBatch`."""
+		return resolveBatch(objs, fields, maxAliases=batchSize)
 
 
 class RepoOwner(GHApiObj):
@@ -43,81 +76,120 @@ class RepoOwner(GHApiObj):
 		self.name = name
 		self.repos = None
 
+	def _repoFromInfo(self, el: dict) -> "Repository":
+		return _getRepo(self.root, el["owner"]["login"], el["name"], dbID=el["id"], info=el)
+
+	def iterRepos(self, populate: bool = True) -> typing.Iterator["Repository"]:
+		"""Yields repos as the pages arrive. Closing the iterator early stops requesting further pages. `repos` is populated only if `populate` is set and the iterator is exhausted."""
+		repos = {} if populate else None
+		for resReq in self.req("repos", None, method="GET", pagination=slice(None, None)):
+			for el in self.root._decodeListing(resReq, Repository):
+				repo = self._repoFromInfo(el)
+				if populate:
+					repos[el["name"]] = repo
+				yield repo
+
+		if populate:
+			self.repos = repos
+
 	def getRepos(self, fresh: bool = False):
 		if self.repos is None or fresh:
-			repos = {}
-			for resReq in self.req("repos", None, method="GET", pagination=slice(None, None)):
-				res = resReq.json()
-				for el in res:
-					repoName = el["name"]
-					repos[repoName] = Repo(self.parent, owner=el["owner"]["login"], repo=repoName, dbID=el["id"], info=el)
-			self.repos = repos
-			return repos
-		else:
-			return self.repos
+			for _ in self.iterRepos():
+				pass
+		return self.repos
 
 	def repo(self, repoName: str, dbID: int = None, info: typing.Optional[dict] = None):
 		"""Only sugar. Doesn't populate `repos` prop, as the name can be arbitrary"""
 
 		if self.repos is not None:
-			repo = self.repos.get(name, None)
+			repo = self.repos.get(repoName, None)
 		else:
 			repo = None
 
 		if repo is None:
-			repo = Repo(self.parent, self.name, repo=repoName, dbID=dbID, info=info)
+			repo = _getRepo(self.root, self.name, repoName, dbID=dbID, info=info)
 
 		return repo
 
 
 class User(RepoOwner, BlocksMixin):
-	__slots__ = ("orgs", "keys")
+	__slots__ = ("orgs", "_keys")
+
+	keys = LazyChild(lambda self: Keys(self))
 
 	def __init__(self, parent, name: str, dbID: typing.Optional[int] = None, info: typing.Optional[dict] = None):
 		super().__init__(parent, name, dbID=dbID, info=info)
 		self.orgs = None
-		self.keys = Keys(self)
+
+	def _orgFromInfo(self, el: dict) -> "Organization":
+		return _getOwner(self.root, Org, el["login"], dbID=el["id"], info=el)
+
+	def iterOrgs(self, populate: bool = True) -> typing.Iterator["Organization"]:
+		"""Yields orgs as the pages arrive, see `iterRepos`"""
+		orgs = [] if populate else None
+		for req in self.req("orgs", None, method="GET", pagination=slice(None, None)):
+			for el in self.root._decodeListing(req, Organization):
+				org = self._orgFromInfo(el)
+				if populate:
+					orgs.append(org)
+				yield org
+
+		if populate:
+			self.orgs = orgs
 
 	def getOrgs(self, fresh: bool = False):
 		if self.orgs is None or fresh:
-			orgs = []
-			for req in self.req("orgs", None, method="GET", pagination=slice(None, None)):
-				for el in req.json():
-					orgs.append(Org(self.parent, name=el["login"], dbID=el["id"], info=el))
-			self.orgs = orgs
-			return orgs
-		else:
-			return self.orgs
+			for _ in self.iterOrgs():
+				pass
+		return self.orgs
 
 	@property
 	def prefix(self) -> str:
 		return "users/" + str(self.name) + "/"
 
+	def _gqlLocator(self):
+		return [("user", {"login": self.name})]
+
 
 class Organization(RepoOwner, BlocksMixin):
-	__slots__ = ("actions", "members")
+	__slots__ = ("_actions", "members")
+
+	actions = LazyChild(Actions)
 
 	def __init__(self, parent, name: str, dbID: typing.Optional[int] = None, info: typing.Optional[dict] = None):
 		super().__init__(parent, name, dbID=dbID, info=info)
-		self.actions = Actions(self)
 		self.members = None
 
+	def _memberFromInfo(self, el: dict) -> User:
+		# el['type']
+		return _getOwner(self.root, User, el["login"], dbID=el["id"])
+
+	def iterMembers(self, populate: bool = True) -> typing.Iterator[User]:
+		"""Yields members as the pages arrive, see `iterRepos`"""
+		members = [] if populate else None
+		for req in self.req("members", None, method="GET", pagination=slice(None, None)):
+			for el in self.root._decodeListing(req, User):
+				member = self._memberFromInfo(el)
+				if populate:
+					members.append(member)
+				yield member
+
+		if populate:
+			self.members = members
+
 	def getMembers(self, fresh: bool = False):
 		if self.members is None or fresh:
-			members = []
-			for req in self.req("members", None, method="GET", pagination=slice(None, None)):
-				for el in req.json():
-					# el['type']
-					members.append(User(self.parent, name=el["login"], dbID=el["id"]))
-			self.members = members
-			return members
-		else:
-			return self.members
+			for _ in self.iterMembers():
+				pass
+		return self.members
 
 	@property
 	def prefix(self) -> str:
 		return "orgs/" + str(self.name) + "/"
 
+	def _gqlLocator(self):
+		return [("organization", {"login": self.name})]
+
 	def __repr__(self):
 		return self.__class__.__name__ + "<" + repr(self.name) + ", " + repr(self._dbID) + ">"
 
@@ -154,7 +226,7 @@ class Pages(GHApiObj):
 		url is the URL to an archive. I guess it can be pipeline-uploaded archive.
 		"""
 
-		return self.req("deployment", {"artifact_url": url, "pages_build_version": version, "oidc_token": oidcToken, "environment": environment}, method="POST").json()
+		return self._json(self.req("deployment", {"artifact_url": url, "pages_build_version": version, "oidc_token": oidcToken, "environment": environment}, method="POST"))
 
 
 def _readmeFallbackProcessor(resp):
@@ -190,18 +262,23 @@ GET_README_PROCESSORS = {
 
 
 class Repository(GHApiObj):
-	__slots__ = ("owner", "repo", "actions")
+	__slots__ = ("owner", "repo", "_actions")
 
 	INFOABLE = True
 
+	actions = LazyChild(Actions)
+
 	def __init__(self, parent, owner: str, repo: str, dbID: int = None, info: typing.Optional[dict] = None):
 		super().__init__(parent, dbID=dbID, info=info)
 		self.owner = owner
 		self.repo = repo
-		self.actions = Actions(self)
+
+	def _gqlLocator(self):
+		return [("repository", {"owner": self.owner, "name": self.repo})]
 
 	def _getDBID(self):
-		return int(self.gqlReq("query($owner: String!, $repo: String!) {repository(name: $repo, owner: $owner) {databaseId}}", {"owner": parent.owner, "repo": parent.repo, "no": self.no})["data"]["repository"]["databaseId"])
+		resolveBatch((self,))
+		return self._dbID
 
 	def ownerObj(self, cls: typing.Union[typing.Type[Org], typing.Type[User]] = User) -> RepoOwner:
 		"""Gets an owner object. If the repo metadata dict is populated, the restricted owner data is populated from it.
@@ -216,36 +293,57 @@ class Repository(GHApiObj):
 			dbID = o["id"]
 			login = o["login"]
 		else:
+			o = None
 			dbID = None
 			login = self.owner
 
-		return cls(self.parent, login, dbID, info=self.info["owner"])
+		return _getOwner(self.root, cls, login, dbID, info=o, mergeInfo=False)  # the restricted data must not replace the full info of an already known owner
 
 	@property
 	def prefix(self) -> str:
 		return "repos/" + self.owner + "/" + self.repo + "/"
 
 	def issue(self, no: int):
-		return Issue(self, no)
+		return self.root._intern(Issue, (self.owner, self.repo, no), lambda: Issue(self, no))
 
 	def expell(self, user: str):
 		self.req("collaborators/" + user, None, method="DELETE")
 
-	def getIssues(self, labels: typing.Optional[str] = None, state: typing.Optional[str] = None):
-		q = {}
+	def iterIssues(self, labels: typing.Optional[str] = None, state: typing.Optional[str] = None, since: typing.Optional[typing.Union[str, datetime]] = None, sort: typing.Optional[str] = None, direction: typing.Optional[str] = None, pagination: slice = slice(None, None)) -> typing.Iterator[dict]:
+		"""Yields issues (pull requests are issues too) as the pages arrive, see `iterRepos`. `since` limits them to the ones updated at or after it, `sort` is `created`, `updated` or `comments`, `direction` is `asc` or `desc`."""
+		q = _listingQuery(since, sort, direction)
 		if labels is not None:
 			if not isinstance(labels, str):
 				labels = ",".join(labels)
 			q["labels"] = labels
 		if state is not None:
 			q["state"] = state
-		return self.req("issues", q, method="GET").json()
+		for res in self.req("issues", q, method="GET", pagination=pagination):
+			yield from self._json(res)
+
+	def getIssues(self, labels: typing.Optional[str] = None, state: typing.Optional[str] = None, since: typing.Optional[typing.Union[str, datetime]] = None, sort: typing.Optional[str] = None, direction: typing.Optional[str] = None, pagination: slice = slice(None, None)) -> typing.List[dict]:
+		"""All the pages, see `iterIssues`. `pagination=slice(1, 2)` gets only the first one."""
+		return list(self.iterIssues(labels, state, since, sort, direction, pagination))
+
+	def iterIssueComments(self, since: typing.Optional[typing.Union[str, datetime]] = None, sort: typing.Optional[str] = None, direction: typing.Optional[str] = None) -> typing.Iterator[dict]:
+		"""Yields the comments of all the issues of the repo, see `iterIssues`. `sort` is `created` or `updated`."""
+		for res in self.req("issues/comments", _listingQuery(since, sort, direction), method="GET", pagination=slice(None, None)):
+			yield from self._json(res)
+
+	def iterIssueEvents(self) -> typing.Iterator[dict]:
+		"""Yields the events of all the issues of the repo, the newest first. Closing the iterator early stops requesting further pages."""
+		for res in self.req("issues/events", None, method="GET", pagination=slice(None, None)):
+			yield from self._json(res)
+
+	def iterLabels(self) -> typing.Iterator[dict]:
+		for res in self.req("labels", None, method="GET", pagination=slice(None, None)):
+			yield from self._json(res)
 
 	def sendChecksRun(self, obj):
-		return self.req("check-runs", obj).json()
+		return self._json(self.req("check-runs", obj))
 
 	def patchChecksRun(self, iD, obj):
-		return self.req("check-runs/" + str(iD), obj, method="PATCH").json()
+		return self._json(self.req("check-runs/" + str(iD), obj, method="PATCH"))
 
 	def dispatch(self, payload=None):
 		if payload is None:
@@ -284,6 +382,8 @@ ISSUE_COMMENT_SUPPORTED_ACCEPTS = {CT.json, CT.text, CT.html, CT.full}
 class Issue(GHApiObj):
 	__slots__ = ("no",)
 
+	INFOABLE = True
+
 	def __init__(self, parent, no: int, dbID: str = None, info: typing.Optional[dict] = None):
 		super().__init__(parent, dbID)
 		self.no = no
@@ -297,8 +397,13 @@ class Issue(GHApiObj):
 	def prefix(self) -> str:
 		return "issues/" + str(self.no) + "/"
 
+	def _gqlLocator(self):
+		return self.parent._gqlLocator() + [("issue", {"number": self.no})]
+
 	def _getDBID(self):
-		return int(self.gqlReq("query($owner: String!, $repo: String!, $no: Int!) {repository(name: $repo, owner: $owner) {issue(number: $no) {databaseId}}}", {"owner": parent.owner, "repo": parent.repo, "no": self.no})["data"]["repository"]["issue"]["databaseId"])
+		if resolveBatch((self,))[0] is None:
+			raise LookupError("No such issue (GraphQL doesn't locate pull requests as issues)", self.no)
+		return self._dbID
 
 	def leaveAComment(self, body: str):
 		self.req("comments", {"body": str(body)})
@@ -326,23 +431,38 @@ class Issue(GHApiObj):
 		self.req("lock", None, method="DELETE")
 
 	def move(self, repo):
-		return self.gqlReq("mutation ($ii: ID!, $ri: ID!) {transferIssue(input: {issueId: $ii, repositoryId: $ri}) {issue{id}}}", {"ii": self.nodeID, "ri": repo.nodeID})
+		return self.gqlReq("mutation ($ii: ID!, $ri: ID!) {transferIssue(input: {issueId: $ii, repositoryId: $ri}) {issue{id}}}", ii=self.nodeID, ri=repo.nodeID)
 
 	def react(self, reaction: str):
 		self.req("reactions", {"content": reaction}, method="PUT")
 
-	def getEvents(self):
-		return self.req("events", previews=("starfox",)).json()
+	def iterComments(self, since: typing.Optional[typing.Union[str, datetime]] = None) -> typing.Iterator[dict]:
+		"""Yields the comments as the pages arrive, the oldest first. `since` limits them to the ones updated at or after it."""
+		for res in self.req("comments", _listingQuery(since, None, None), method="GET", pagination=slice(None, None)):
+			yield from self._json(res)
+
+	def getComments(self, since: typing.Optional[typing.Union[str, datetime]] = None) -> typing.List[dict]:
+		return list(self.iterComments(since))
+
+	def iterEvents(self) -> typing.Iterator[dict]:
+		"""Yields the events as the pages arrive, the oldest first"""
+		for res in self.req("events", None, method="GET", previews=("starfox",), pagination=slice(None, None)):
+			yield from self._json(res)
+
+	def getEvents(self) -> typing.List[dict]:
+		return list(self.iterEvents())
 
 
 class SSHKeys(GHApiObj):
 	__slots__ = ()
 
-	def getSigning(self):
-		res = []
+	def iterSigning(self) -> typing.Iterator[dict]:
+		"""Yields keys as the pages arrive. Closing the iterator early stops requesting further pages."""
 		for req in self.parent.req("ssh_signing_keys", None, method="GET", pagination=slice(None, None)):
-			res.extend(req.json())
-		return res
+			yield from self._json(req)
+
+	def getSigning(self):
+		return list(self.iterSigning())
 
 	@property
 	def unlimitedAuthKeysURI(self) -> str:
@@ -352,11 +472,11 @@ class SSHKeys(GHApiObj):
 		if full:
 			res = []
 			for req in self.parent.req("keys", None, method="GET", pagination=slice(None, None)):
-				res.extend(req.json())
+				res.extend(self._json(req))
 			return res
 		else:
 			res = []
-			for l in httpx.get(self.unlimitedAuthKeysURI).text.splitlines():
+			for l in self.root.client.get(self.unlimitedAuthKeysURI).text.splitlines():
 				splitted = l.rsplit(" ")
 				if len(splitted) > 2:
 					res.append(
@@ -371,21 +491,28 @@ class SSHKeys(GHApiObj):
 
 
 class Keys(GHApiObj):
-	__slots__ = ("ssh",)
+	__slots__ = ("_ssh",)
+
+	ssh = LazyChild(lambda self: SSHKeys(self.parent))
 
 	@property
 	def unlimitedGPGKeysURI(self) -> str:
 		return "https://" + MAIN_DOMAIN + "/" + self.parent.name + ".gpg"
 
-	def getGPGViaAPI(self):
-		res = []
+	def iterGPGViaAPI(self) -> typing.Iterator[dict]:
+		"""Yields keys as the pages arrive. Closing the iterator early stops requesting further pages."""
 		for req in self.parent.req("gpg_keys", None, method="GET", pagination=slice(None, None)):
-			res.extend(req.json())
-		return res
+			yield from self._json(req)
+
+	def getGPGViaAPI(self):
+		return list(self.iterGPGViaAPI())
 
 	def getGPGAsText(self):
-		return httpx.get(self.unlimitedGPGKeysURI).text
+		return self.root.client.get(self.unlimitedGPGKeysURI).text
+
 
-	def __init__(self, parent):
-		super().__init__(parent)
-		self.ssh = SSHKeys(self.parent)
+COMPACT_INFO_PROJECTIONS = {
+	Repository: ("id", "node_id", "name", "full_name", ("owner", ("login", "id", "node_id", "type")), "private", "fork", "archived", "disabled", "visibility", "default_branch", "description", "language", "topics", "stargazers_count", "forks_count", "open_issues_count", "size", "created_at", "updated_at", "pushed_at"),
+	RepoOwner: ("id", "node_id", "login", "type", "name", "site_admin"),
+	Issue: ("id", "node_id", "number", "title", "state", ("user", ("login", "id")), "labels", "comments", "created_at", "updated_at", "closed_at"),
+}
@@ -0,0 +1,73 @@
+"""Per-root registry making every path to the same GitHub object (by name or by database ID) return the same instance, so its `info` and `dbID` are fetched once. Objects are held weakly, so the registry never keeps them alive."""
+
+__all__ = ("IdentityMap",)
+
+import typing
+from threading import RLock
+from time import monotonic
+from weakref import WeakValueDictionary
+
+Key = typing.Tuple[typing.Union[str, int], ...]
+
+
+def _normalizeKey(key: Key) -> Key:
+	return tuple(el.lower() if isinstance(el, str) else el for el in key)  # logins and repo names are case-insensitive
+
+
+class IdentityMap:
+	"""`ttls` maps object types to the count of seconds their `info` stays fresh for (subclasses inherit it), `defaultTTL` is for the rest ones. `None` means `info` never gets stale and is refetched only on `fresh=True`."""
+
+	__slots__ = ("objects", "byDBID", "ttls", "defaultTTL", "lock")
+
+	def __init__(self, ttls: typing.Optional[typing.Mapping[type, typing.Optional[float]]] = None, defaultTTL: typing.Optional[float] = None):
+		self.objects = WeakValueDictionary()
+		self.byDBID = WeakValueDictionary()
+		self.ttls = dict(ttls) if ttls else {}
+		self.defaultTTL = defaultTTL
+		self.lock = RLock()  # merging `info` registers `dbID`
+
+	def get(self, cls: type, key: Key, factory: typing.Callable[[], "GHApiObj"], dbID: typing.Optional[int] = None, info: typing.Optional[dict] = None) -> "GHApiObj":
+		"""Returns the registered object of `cls` with the natural `key` (or `dbID`), creating it with `factory` if there is none. `dbID` and `info` known at the call site are merged into the registered object."""
+		key = (cls,) + _normalizeKey(key)
+		with self.lock:
+			obj = self.objects.get(key)
+			if obj is None and dbID is not None:
+				obj = self.byDBID.get((cls, dbID))
+			if obj is None:
+				obj = factory()
+			else:
+				if dbID is not None and obj._dbID is None:
+					obj._dbID = dbID
+				if info is not None:
+					obj._setInfo(info)
+
+			self.objects[key] = obj
+			if obj._dbID is not None:
+				self.byDBID[(cls, obj._dbID)] = obj
+			return obj
+
+	def registerDBID(self, obj: "GHApiObj"):
+		"""Makes an object found by its `dbID`, which has become known after it was registered"""
+		with self.lock:
+			self.byDBID.setdefault((obj.__class__, obj._dbID), obj)
+
+	def ttl(self, cls: type) -> typing.Optional[float]:
+		for c in cls.__mro__:
+			if c in self.ttls:
+				return self.ttls[c]
+		return self.defaultTTL
+
+	def isFresh(self, obj: "GHApiObj", now: typing.Optional[float] = None) -> bool:
+		if obj.info is None:
+			return False
+
+		ttl = self.ttl(obj.__class__)
+		if ttl is None or obj._infoAt is None:
+			return True
+
+		if now is None:
+			now = monotonic()
+		return now - obj._infoAt < ttl
+
+	def __len__(self) -> int:
+		return len(self.objects)
@@ -0,0 +1,229 @@
+"""Observation of the requests made by API roots. Hooks are callables appended to `hooks` of a root, each gets a `RequestEvent` per a transmission (so a retried request produces several events). If a root has no hooks, requests are not observed at all."""
+
+__all__ = ("RequestEvent", "urlTemplate", "EndpointStats", "LoggingHook", "printSummaryAtExit")
+
+import atexit
+import re
+import sys
+import typing
+from collections import Counter
+from math import frexp
+from threading import Lock
+from time import perf_counter, time
+from urllib.parse import urlsplit
+
+RATE_LIMIT_HEADERS_PREFIX = "x-ratelimit-"
+RATE_LIMIT_FIELDS = ("limit", "remaining", "used", "reset", "resource")
+
+ID_SEGMENT_RX = re.compile("^\\d+$")
+SHA_SEGMENT_RX = re.compile("^[0-9a-f]{40}$")
+TOKEN_SEGMENT_RX = re.compile("^[0-9A-Za-z]{32,}$")
+OWNER_PREFIXES = {"repos": ("{owner}", "{repo}"), "users": ("{owner}",), "orgs": ("{owner}",)}
+
+Hook = typing.Callable[["RequestEvent"], None]
+
+
+def urlTemplate(url: str) -> str:
+	"""Replaces the parts of the path which vary between objects with placeholders, so that the requests to the same endpoint can be aggregated. The query is dropped."""
+	u = urlsplit(url)
+	segments = u.path.split("/")
+	res = []
+	i = 0
+	while i < len(segments):
+		s = segments[i]
+		res.append(s)
+		i += 1
+		names = OWNER_PREFIXES.get(s)
+		if names is not None:
+			for name in names:
+				if i < len(segments) and segments[i]:
+					res.append(name)
+					i += 1
+			continue
+		if ID_SEGMENT_RX.match(s):
+			res[-1] = "{id}"
+		elif SHA_SEGMENT_RX.match(s):
+			res[-1] = "{sha}"
+		elif TOKEN_SEGMENT_RX.match(s):
+			res[-1] = "{token}"
+	return u.netloc + "/".join(res)
+
+
+class RequestEvent:
+	"""A single transmission. Timings are in seconds. `connect` (including TLS), `ttfb` (from the beginning of sending to the first byte of the answer) and `body` (receiving the answer body) are known only with `httpx`, `connect` only for a new connection."""
+
+	__slots__ = ("method", "url", "started", "latency", "connect", "ttfb", "body", "status", "bytesOut", "bytesIn", "attempt", "rateLimit", "error", "_marks")
+
+	def __init__(self, method: str, url: str, bytesOut: int, attempt: int):
+		self.method = method
+		self.url = url
+		self.bytesOut = bytesOut
+		self.attempt = attempt  # 0 for the first try, retries have the greater ones
+		self.started = time()
+		self.latency = None
+		self.connect = None
+		self.ttfb = None
+		self.body = None
+		self.status = None
+		self.bytesIn = None
+		self.rateLimit = None
+		self.error = None
+		self._marks = {}
+
+	@property
+	def template(self) -> str:
+		return urlTemplate(self.url)
+
+	def trace(self, name: str, info: dict):
+		"""`httpx` trace extension"""
+		self._marks[name] = perf_counter()
+
+	async def atrace(self, name: str, info: dict):
+		self._marks[name] = perf_counter()
+
+	def _span(self, start: str, stop: str) -> typing.Optional[float]:
+		a = self._marks.get(start)
+		b = self._marks.get(stop)
+		if a is None or b is None:
+			return None
+		return b - a
+
+	def _phase(self, suffix: str) -> typing.Optional[str]:
+		for proto in ("http11.", "http2."):
+			name = proto + suffix
+			if name in self._marks:
+				return name
+		return None
+
+	def finish(self, started: float, res: typing.Optional["httpx.Response"] = None, error: typing.Optional[BaseException] = None):
+		self.latency = perf_counter() - started
+		self.error = error
+		marks = self._marks
+		connect = self._span("connection.connect_tcp.started", "connection.connect_tcp.complete")
+		if connect is not None:
+			connect += self._span("connection.start_tls.started", "connection.start_tls.complete") or 0.0
+		self.connect = connect
+
+		sendStarted = self._phase("send_request_headers.started")
+		headersReceived = self._phase("receive_response_headers.complete")
+		if sendStarted is not None and headersReceived is not None:
+			self.ttfb = marks[headersReceived] - marks[sendStarted]
+		bodyStarted = self._phase("receive_response_body.started")
+		bodyReceived = self._phase("receive_response_body.complete")
+		if bodyStarted is not None and bodyReceived is not None:
+			self.body = marks[bodyReceived] - marks[bodyStarted]
+		self._marks = None
+
+		if res is not None:
+			self.status = res.status_code
+			self.bytesIn = len(res.content)
+			hdrz = res.headers
+			if RATE_LIMIT_HEADERS_PREFIX + "limit" in hdrz:
+				self.rateLimit = {k: hdrz.get(RATE_LIMIT_HEADERS_PREFIX + k) for k in RATE_LIMIT_FIELDS}
+
+	def __repr__(self):
+		return self.__class__.__name__ + "<" + " ".join((self.method, self.url, str(self.status if self.error is None else repr(self.error)), format(self.latency or 0.0, ".3f") + "s")) + ">"
+
+
+def _bucket(seconds: float) -> int:
+	"""Upper bound of a power-of-2 bucket in milliseconds"""
+	ms = seconds * 1000
+	if ms <= 1:
+		return 1
+	m, e = frexp(ms)
+	return 1 << (e if m != 0.5 else e - 1)
+
+
+class _Endpoint:
+	__slots__ = ("count", "errors", "retries", "statuses", "bytesIn", "bytesOut", "latency", "histogram")
+
+	def __init__(self):
+		self.count = 0
+		self.errors = 0
+		self.retries = 0
+		self.statuses = Counter()
+		self.bytesIn = 0
+		self.bytesOut = 0
+		self.latency = 0.0
+		self.histogram = Counter()
+
+	def add(self, e: RequestEvent):
+		self.count += 1
+		if e.error is not None:
+			self.errors += 1
+		if e.attempt:
+			self.retries += 1
+		if e.status is not None:
+			self.statuses[e.status] += 1
+		self.bytesIn += e.bytesIn or 0
+		self.bytesOut += e.bytesOut
+		self.latency += e.latency
+		self.histogram[_bucket(e.latency)] += 1
+
+	def toDict(self) -> dict:
+		return {"count": self.count, "errors": self.errors, "retries": self.retries, "statuses": dict(self.statuses), "bytesIn": self.bytesIn, "bytesOut": self.bytesOut, "meanLatency": self.latency / self.count, "latencyHistogramMs": dict(sorted(self.histogram.items()))}
+
+
+class EndpointStats:
+	"""A hook aggregating the events per method and URL template: counts, statuses, bytes, retries and histograms of latencies (power-of-2 buckets of milliseconds). Thread-safe."""
+
+	__slots__ = ("endpoints", "lock", "lastRateLimit")
+
+	def __init__(self):
+		self.endpoints = {}
+		self.lock = Lock()
+		self.lastRateLimit = None
+
+	def __call__(self, e: RequestEvent):
+		key = (e.method, e.template)
+		with self.lock:
+			ep = self.endpoints.get(key)
+			if ep is None:
+				ep = self.endpoints[key] = _Endpoint()
+			ep.add(e)
+			if e.rateLimit is not None:
+				self.lastRateLimit = e.rateLimit
+
+	def summary(self) -> dict:
+		with self.lock:
+			return {k[0] + " " + k[1]: v.toDict() for k, v in sorted(self.endpoints.items(), key=lambda kv: -kv[1].latency)}
+
+	def format(self) -> str:
+		lines = []
+		for name, s in self.summary().items():
+			lines.append(name + ": " + str(s["count"]) + " requests, " + str(s["errors"]) + " errors, " + str(s["retries"]) + " retries, mean " + format(s["meanLatency"] * 1000, ".1f") + " ms, " + str(s["bytesOut"]) + " B out, " + str(s["bytesIn"]) + " B in, statuses " + repr(s["statuses"]))
+		if self.lastRateLimit is not None:
+			lines.append("rate limit: " + repr(self.lastRateLimit))
+		return "\n".join(lines)
+
+
+def printSummaryAtExit(stats: EndpointStats, file: typing.TextIO = None):
+	"""Prints `stats` (if anything was requested) when the process exits"""
+
+	def printSummary():
+		if stats.endpoints:
+			print(stats.format(), file=file if file is not None else sys.stderr)
+
+	atexit.register(printSummary)
+	return printSummary
+
+
+class LoggingHook:
+	"""Logs each request. Unlike dumping requests, it doesn't leak headers (and tokens in them) and bodies."""
+
+	__slots__ = ("logger", "level")
+
+	def __init__(self, logger: typing.Optional["logging.Logger"] = None, level: typing.Optional[int] = None):
+		"""`level` is `DEBUG` by default"""
+		import logging
+
+		if logger is None:
+			logger = logging.getLogger("miniGHAPI")
+		if level is None:
+			level = logging.DEBUG
+		self.logger = logger
+		self.level = level
+
+	def __call__(self, e: RequestEvent):
+		if self.logger.isEnabledFor(self.level):
+			self.logger.log(self.level, "%s %s -> %s in %.3f s (attempt %d, %d B out, %s B in)", e.method, e.url, e.status if e.error is None else repr(e.error), e.latency, e.attempt, e.bytesOut, e.bytesIn)
@@ -0,0 +1,279 @@
+"""A local SQLite mirror of the issues of a repo: issues (including pull requests), their comments, labels and events. Each sync fetches only what has changed since the previous one: the newest `updated_at` (the newest event ID for events) fetched by the previous sync serves as the watermark, so a run of a bot costs a few requests instead of a request per issue. The bot then queries the mirror locally.
+Deletions of comments are not visible through the incremental listings, `refreshIssue` resyncs a single issue completely."""
+
+__all__ = ("IssueMirror", "SyncStats")
+
+import sqlite3
+import typing
+from itertools import islice
+from pathlib import Path
+from threading import Lock
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+	repo TEXT NOT NULL,
+	number INTEGER NOT NULL,
+	id INTEGER NOT NULL,
+	title TEXT,
+	state TEXT,
+	user TEXT,
+	is_pull INTEGER NOT NULL,
+	created_at TEXT,
+	updated_at TEXT NOT NULL,
+	closed_at TEXT,
+	raw TEXT NOT NULL,
+	PRIMARY KEY (repo, number)
+);
+CREATE INDEX IF NOT EXISTS issues_updated ON issues (repo, updated_at);
+CREATE TABLE IF NOT EXISTS issue_labels (
+	repo TEXT NOT NULL,
+	number INTEGER NOT NULL,
+	name TEXT NOT NULL,
+	PRIMARY KEY (repo, number, name)
+);
+CREATE INDEX IF NOT EXISTS issue_labels_name ON issue_labels (repo, name);
+CREATE TABLE IF NOT EXISTS labels (
+	repo TEXT NOT NULL,
+	name TEXT NOT NULL,
+	raw TEXT NOT NULL,
+	PRIMARY KEY (repo, name)
+);
+CREATE TABLE IF NOT EXISTS comments (
+	repo TEXT NOT NULL,
+	id INTEGER NOT NULL,
+	number INTEGER NOT NULL,
+	user TEXT,
+	created_at TEXT,
+	updated_at TEXT NOT NULL,
+	raw TEXT NOT NULL,
+	PRIMARY KEY (repo, id)
+);
+CREATE INDEX IF NOT EXISTS comments_issue ON comments (repo, number);
+CREATE INDEX IF NOT EXISTS comments_updated ON comments (repo, updated_at);
+CREATE TABLE IF NOT EXISTS events (
+	repo TEXT NOT NULL,
+	id INTEGER NOT NULL,
+	number INTEGER,
+	event TEXT,
+	actor TEXT,
+	created_at TEXT,
+	raw TEXT NOT NULL,
+	PRIMARY KEY (repo, id)
+);
+CREATE INDEX IF NOT EXISTS events_issue ON events (repo, number);
+CREATE TABLE IF NOT EXISTS sync_state (
+	repo TEXT NOT NULL,
+	kind TEXT NOT NULL,
+	watermark,
+	PRIMARY KEY (repo, kind)
+);
+"""
+
+BATCH_SIZE = 100  # a page, each batch is committed with the watermark it advances, so an interrupted sync resumes from it
+
+
+def _login(obj: typing.Optional[dict]) -> typing.Optional[str]:
+	return obj["login"] if obj else None
+
+
+def _issueNumberFromURL(url: str) -> int:
+	return int(url.rsplit("/", 1)[1])
+
+
+def _batches(it: typing.Iterable[typing.Any], size: int = BATCH_SIZE) -> typing.Iterator[list]:
+	it = iter(it)
+	while True:
+		batch = list(islice(it, size))
+		if not batch:
+			return
+		yield batch
+
+
+class SyncStats:
+	"""Counts of the objects (re)stored by a sync"""
+
+	__slots__ = ("labels", "issues", "comments", "events")
+
+	def __init__(self):
+		self.labels = 0
+		self.issues = 0
+		self.comments = 0
+		self.events = 0
+
+	def __repr__(self):
+		return self.__class__.__name__ + "(" + ", ".join(k + "=" + str(getattr(self, k)) for k in self.__class__.__slots__) + ")"
+
+
+class IssueMirror:
+	"""Mirrors the issues of `repo` (a `GitHubAPI.Repository`) into the SQLite DB at `path` (in memory by default). A DB can hold mirrors of several repos. Thread-safe, the raw JSON of the objects is stored in `raw` columns and can be queried with the JSON functions of SQLite through `db`."""
+
+	__slots__ = ("repo", "key", "db", "lock")
+
+	def __init__(self, repo: "Repository", path: typing.Union[str, Path] = ":memory:"):
+		self.repo = repo
+		self.key = repo.owner + "/" + repo.repo
+		self.db = sqlite3.connect(str(path), check_same_thread=False)
+		self.db.executescript(SCHEMA)
+		self.lock = Lock()
+
+	@property
+	def codec(self) -> "JSONCodec":
+		return self.repo.root.jsonCodec
+
+	def _dumps(self, obj: dict) -> str:
+		return self.codec.dumps(obj).decode("utf-8")
+
+	def _decodeRows(self, query: str, *args) -> typing.List[dict]:
+		with self.lock:
+			rows = self.db.execute(query, (self.key,) + args).fetchall()
+		loads = self.codec.loads
+		return [loads(r[0]) for r in rows]
+
+	def _watermark(self, kind: str) -> typing.Any:
+		"""Watermarks are advanced only by the incremental syncs, not by `refreshIssue`: the objects it stores may be newer than the ones not yet synced."""
+		with self.lock:
+			res = self.db.execute("SELECT watermark FROM sync_state WHERE repo = ? AND kind = ?", (self.key, kind)).fetchone()
+		return res[0] if res else None
+
+	def _setWatermark(self, kind: str, v: typing.Any):
+		"""Must be called within the transaction storing the objects"""
+		self.db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)", (self.key, kind, v))
+
+	@property
+	def issuesWatermark(self) -> typing.Optional[str]:
+		return self._watermark("issues")
+
+	@property
+	def commentsWatermark(self) -> typing.Optional[str]:
+		return self._watermark("comments")
+
+	@property
+	def eventsWatermark(self) -> typing.Optional[int]:
+		return self._watermark("events")
+
+	def _putIssues(self, issues: typing.Iterable[dict]):
+		for el in issues:
+			no = el["number"]
+			self.db.execute("INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (self.key, no, el["id"], el.get("title"), el.get("state"), _login(el.get("user")), "pull_request" in el, el.get("created_at"), el["updated_at"], el.get("closed_at"), self._dumps(el)))
+			self.db.execute("DELETE FROM issue_labels WHERE repo = ? AND number = ?", (self.key, no))
+			self.db.executemany("INSERT OR IGNORE INTO issue_labels VALUES (?, ?, ?)", ((self.key, no, (l["name"] if isinstance(l, dict) else l)) for l in el.get("labels", ())))
+
+	def _putComments(self, comments: typing.Iterable[dict], number: typing.Optional[int] = None):
+		self.db.executemany("INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?, ?, ?, ?)", ((self.key, el["id"], (number if number is not None else _issueNumberFromURL(el["issue_url"])), _login(el.get("user")), el.get("created_at"), el["updated_at"], self._dumps(el)) for el in comments))
+
+	def _putEvents(self, events: typing.Iterable[dict], number: typing.Optional[int] = None):
+		self.db.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", ((self.key, el["id"], (number if number is not None else (el.get("issue") or {}).get("number")), el.get("event"), _login(el.get("actor")), el.get("created_at"), self._dumps(el)) for el in events))
+
+	def syncLabels(self) -> int:
+		"""Labels are few, so they are refetched completely"""
+		labels = list(self.repo.iterLabels())
+		with self.lock, self.db:
+			self.db.execute("DELETE FROM labels WHERE repo = ?", (self.key,))
+			self.db.executemany("INSERT OR REPLACE INTO labels VALUES (?, ?, ?)", ((self.key, el["name"], self._dumps(el)) for el in labels))
+		return len(labels)
+
+	def syncIssues(self) -> int:
+		"""Fetches the issues updated since the watermark in the ascending order of `updated_at`. `since` is inclusive, so the issues at the watermark are refetched, which is harmless."""
+		count = 0
+		for batch in _batches(self.repo.iterIssues(state="all", since=self.issuesWatermark, sort="updated", direction="asc")):
+			with self.lock, self.db:
+				self._putIssues(batch)
+				self._setWatermark("issues", batch[-1]["updated_at"])
+			count += len(batch)
+		return count
+
+	def syncComments(self) -> int:
+		"""The same as `syncIssues` for the comments of all the issues"""
+		count = 0
+		for batch in _batches(self.repo.iterIssueComments(since=self.commentsWatermark, sort="updated", direction="asc")):
+			with self.lock, self.db:
+				self._putComments(batch)
+				self._setWatermark("comments", batch[-1]["updated_at"])
+			count += len(batch)
+		return count
+
+	def syncEvents(self) -> int:
+		"""Events are listed the newest first without `since`, so the pages are fetched until the already stored events. They are stored at once, an interrupted sync must not move the watermark over the events not yet fetched."""
+		watermark = self.eventsWatermark
+		events = []
+		for el in self.repo.iterIssueEvents():
+			if watermark is not None and el["id"] <= watermark:
+				break
+			events.append(el)
+		if events:
+			with self.lock, self.db:
+				self._putEvents(events)
+				self._setWatermark("events", events[0]["id"])
+		return len(events)
+
+	def sync(self, labels: bool = True, events: bool = True) -> SyncStats:
+		"""Fetches the changes since the previous sync. With nothing changed it costs a request per kind of objects."""
+		res = SyncStats()
+		if labels:
+			res.labels = self.syncLabels()
+		res.issues = self.syncIssues()
+		res.comments = self.syncComments()
+		if events:
+			res.events = self.syncEvents()
+		return res
+
+	def refreshIssue(self, number: int) -> SyncStats:
+		"""Refetches an issue with all its comments and events, dropping the stored ones deleted on the server"""
+		issue = self.repo.issue(number)
+		info = issue._json(issue.req("", None, method="GET"))  # not `getInfo`, the info of it may be compacted by the root
+		comments = issue.getComments()
+		events = issue.getEvents()
+		with self.lock, self.db:
+			self._putIssues((info,))
+			self.db.execute("DELETE FROM comments WHERE repo = ? AND number = ?", (self.key, number))
+			self._putComments(comments, number)
+			self._putEvents(events, number)
+
+		res = SyncStats()
+		res.issues = 1
+		res.comments = len(comments)
+		res.events = len(events)
+		return res
+
+	def issue(self, number: int) -> typing.Optional[dict]:
+		res = self._decodeRows("SELECT raw FROM issues WHERE repo = ? AND number = ?", number)
+		return res[0] if res else None
+
+	def issues(self, state: typing.Optional[str] = None, label: typing.Optional[str] = None, pulls: typing.Optional[bool] = False, since: typing.Optional[str] = None) -> typing.List[dict]:
+		"""The stored issues in the ascending order of the numbers. `state` is `open` or `closed`, `pulls` selects only the pull requests if set and both if `None`, `since` is an ISO 8601 timestamp compared to `updated_at`."""
+		query = "SELECT raw FROM issues WHERE repo = ?"
+		args = ()
+		if state is not None:
+			query += " AND state = ?"
+			args += (state,)
+		if pulls is not None:
+			query += " AND is_pull = ?"
+			args += (bool(pulls),)
+		if since is not None:
+			query += " AND updated_at >= ?"
+			args += (since,)
+		if label is not None:
+			query += " AND number IN (SELECT number FROM issue_labels WHERE repo = issues.repo AND name = ?)"
+			args += (label,)
+		return self._decodeRows(query + " ORDER BY number", *args)
+
+	def comments(self, number: int) -> typing.List[dict]:
+		return self._decodeRows("SELECT raw FROM comments WHERE repo = ? AND number = ? ORDER BY created_at, id", number)
+
+	def events(self, number: int) -> typing.List[dict]:
+		return self._decodeRows("SELECT raw FROM events WHERE repo = ? AND number = ? ORDER BY id", number)
+
+	def labels(self) -> typing.List[dict]:
+		return self._decodeRows("SELECT raw FROM labels WHERE repo = ? ORDER BY name")
+
+	def close(self):
+		self.db.close()
+
+	def __enter__(self) -> "IssueMirror":
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def __repr__(self):
+		return self.__class__.__name__ + "<" + repr(self.key) + ">"
@@ -0,0 +1,226 @@
+"""Encoding and decoding of JSON bodies. Bodies are decoded straight from the bytes of responses and encoded straight into bytes. By default the fastest library available is used: `msgspec`, `orjson`, `ujson` or `json` of the standard library.
+Pages of listings can be decoded into records of `CompactInfo` projections. `msgspec` materializes only the projected fields, skipping the rest of the document, the other codecs project the decoded dicts."""
+
+__all__ = ("JSONCodec", "StdlibJSONCodec", "UJSONCodec", "ORJSONCodec", "MsgspecJSONCodec", "CODECS", "getCodec", "defaultCodec", "walkPath")
+
+import json
+import typing
+from threading import Lock
+
+from .CompactInfo import InfoRecord, Projection, _normalize, recordType
+
+# the libraries are imported by the constructors of the codecs using them
+orjson = None
+msgspec = None
+ujson = None
+
+JSONInput = typing.Union[bytes, bytearray, memoryview, str]
+JSONPath = typing.Sequence[typing.Union[str, int]]
+
+
+def walkPath(doc: typing.Any, path: JSONPath, default: typing.Any = None) -> typing.Any:
+	"""The value at `path` (keys of objects and indices in arrays) within a decoded document, `default` if there is none"""
+	for el in path:
+		try:
+			doc = doc[el]
+		except (KeyError, IndexError, TypeError):
+			return default
+	return doc
+
+
+class JSONCodec:
+	__slots__ = ()
+
+	NAME = None
+
+	def loads(self, data: JSONInput) -> typing.Any:
+		raise NotImplementedError
+
+	def dumps(self, obj: typing.Any) -> bytes:
+		raise NotImplementedError
+
+	def loadRecords(self, data: JSONInput, projection: Projection) -> typing.List[InfoRecord]:
+		"""Decodes an array of objects into records of `projection`"""
+		cls = recordType(projection)
+		return [cls.fromMapping(el) for el in self.loads(data)]
+
+	def loadPath(self, data: JSONInput, path: JSONPath, default: typing.Any = None) -> typing.Any:
+		"""Decodes only the value at `path`, see `walkPath`"""
+		return walkPath(self.loads(data), path, default)
+
+	def __repr__(self):
+		return self.__class__.__name__ + "()"
+
+
+class StdlibJSONCodec(JSONCodec):
+	__slots__ = ()
+
+	NAME = "json"
+
+	def loads(self, data: JSONInput) -> typing.Any:
+		if isinstance(data, memoryview):
+			data = bytes(data)
+		return json.loads(data)
+
+	def dumps(self, obj: typing.Any) -> bytes:
+		return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class UJSONCodec(JSONCodec):
+	__slots__ = ()
+
+	NAME = "ujson"
+
+	def __init__(self):
+		global ujson
+		import ujson
+
+	def loads(self, data: JSONInput) -> typing.Any:
+		if isinstance(data, (bytearray, memoryview)):
+			data = bytes(data)
+		return ujson.loads(data)
+
+	def dumps(self, obj: typing.Any) -> bytes:
+		return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode("utf-8")
+
+
+class ORJSONCodec(JSONCodec):
+	__slots__ = ()
+
+	NAME = "orjson"
+
+	def __init__(self):
+		global orjson
+		import orjson
+
+	def loads(self, data: JSONInput) -> typing.Any:
+		return orjson.loads(data)
+
+	def dumps(self, obj: typing.Any) -> bytes:
+		return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+class MsgspecJSONCodec(JSONCodec):
+	"""Decodes listings into `msgspec.Struct`s having only the projected fields, then moves them into the records"""
+
+	__slots__ = ("recordDecoders", "pathDecoders", "lock")
+
+	NAME = "msgspec"
+
+	def __init__(self):
+		global msgspec
+		import msgspec
+		import msgspec.json
+
+		self.recordDecoders = {}
+		self.pathDecoders = {}
+		self.lock = Lock()
+
+	def loads(self, data: JSONInput) -> typing.Any:
+		return msgspec.json.decode(data)
+
+	def dumps(self, obj: typing.Any) -> bytes:
+		return msgspec.json.encode(obj)
+
+	@classmethod
+	def _structOf(cls, projection: tuple) -> type:
+		fields = []
+		for el in projection:
+			if isinstance(el, str):
+				fields.append((el, typing.Any, msgspec.UNSET))
+			else:
+				fields.append((el[0], typing.Union[cls._structOf(el[1]), None, msgspec.UnsetType], msgspec.UNSET))
+		return msgspec.defstruct("Projected", fields)
+
+	def _decoderOf(self, projection: tuple) -> typing.Tuple["msgspec.json.Decoder", typing.Callable[["msgspec.Struct"], InfoRecord]]:
+		with self.lock:
+			res = self.recordDecoders.get(projection)
+			if res is None:
+				res = self.recordDecoders[projection] = (msgspec.json.Decoder(typing.List[self._structOf(projection)]), _structConverter(recordType(projection)))
+		return res
+
+	def loadRecords(self, data: JSONInput, projection: Projection) -> typing.List[InfoRecord]:
+		decoder, convert = self._decoderOf(_normalize(projection))
+		return [convert(el) for el in decoder.decode(data)]
+
+	@classmethod
+	def _pathType(cls, path: tuple) -> typing.Any:
+		"""Objects on the path are decoded into structs with the only field `v` (renamed to the key), arrays into lists"""
+		if not path:
+			return typing.Any
+		inner = cls._pathType(path[1:])
+		if isinstance(path[0], int):
+			return typing.List[inner]
+		return msgspec.defstruct("OnPath", [("v", typing.Union[inner, None] if inner is not typing.Any else typing.Any, msgspec.UNSET)], rename={"v": path[0]})
+
+	def loadPath(self, data: JSONInput, path: JSONPath, default: typing.Any = None) -> typing.Any:
+		path = tuple(path)
+		with self.lock:
+			decoder = self.pathDecoders.get(path)
+			if decoder is None:
+				decoder = self.pathDecoders[path] = msgspec.json.Decoder(self._pathType(path))
+		try:
+			doc = decoder.decode(data)
+		except msgspec.ValidationError:  # a value on the path is of another type, i. e. a string instead of an object
+			return super().loadPath(data, path, default)
+
+		last = len(path) - 1
+		for i, el in enumerate(path):
+			if isinstance(el, int):
+				if el >= len(doc) or el < -len(doc):
+					return default
+				doc = doc[el]
+			else:
+				doc = doc.v
+				if doc is msgspec.UNSET:
+					return default
+			if doc is None and i != last:
+				return default
+		return doc
+
+
+def _structConverter(cls: typing.Type[InfoRecord]) -> typing.Callable[["msgspec.Struct"], InfoRecord]:
+	fields = tuple((k, "_" + k, _structConverter(cls.NESTED[k]) if k in cls.NESTED else None) for k in cls.FIELDS)
+	unset = msgspec.UNSET
+
+	def convert(s: "msgspec.Struct") -> InfoRecord:
+		res = cls.__new__(cls)
+		for k, slot, nested in fields:
+			v = getattr(s, k)
+			if v is not unset:
+				if nested is not None and v is not None:
+					v = nested(v)
+				setattr(res, slot, v)
+		return res
+
+	return convert
+
+
+CODECS = {c.NAME: c for c in (MsgspecJSONCodec, ORJSONCodec, UJSONCodec, StdlibJSONCodec)}  # in the order of preference, `msgspec` is as fast as `orjson` for dicts and is faster for records
+
+
+def getCodec(name: typing.Optional[str] = None) -> JSONCodec:
+	"""Creates a codec by the name of the library, or the fastest available one if `name` is `None`. Raises `ImportError` if the library is not installed."""
+	if name is not None:
+		try:
+			cls = CODECS[name]
+		except KeyError:
+			raise ImportError("Unknown JSON library `" + name + "`") from None
+		return cls()
+
+	for cls in CODECS.values():
+		try:
+			return cls()
+		except ImportError:
+			pass
+
+
+_defaultCodec = None
+
+
+def defaultCodec() -> JSONCodec:
+	"""The codec shared by the roots not given one"""
+	global _defaultCodec
+	if _defaultCodec is None:
+		_defaultCodec = getCodec()
+	return _defaultCodec
@@ -0,0 +1,200 @@
+"""Tracking of GitHub rate limits and pacing of requests according to them.
+https://docs.github.com/en/rest/overview/rate-limits-for-the-rest-api
+https://docs.github.com/en/graphql/overview/rate-limits-and-node-limits-for-the-graphql-api
+"""
+
+__all__ = ("Budget", "RateLimitScheduler", "graphQLCost")
+
+import json
+import re
+import typing
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from functools import reduce
+from math import ceil
+from operator import mul
+from threading import Lock
+from time import time
+
+MUTATING_METHODS = frozenset(("POST", "PATCH", "PUT", "DELETE"))
+SECONDARY_LIMIT_MARKER = "secondary rate limit"
+DEFAULT_RESET_INTERVAL = 3600
+GQL_MUTATION_RX = re.compile(r"^(?:[\s,\ufeff]|#[^\n\r]*)*mutation\b")  # whitespace, commas and comments are ignored in GraphQL documents
+
+
+class Budget:
+	__slots__ = ("resource", "limit", "remaining", "reset", "used")
+
+	def __init__(self, resource: str, limit: int, remaining: int, reset: float, used: int = 0):
+		self.resource = resource
+		self.limit = limit
+		self.remaining = remaining
+		self.reset = reset
+		self.used = used
+
+	def timeToReset(self, now: typing.Optional[float] = None) -> float:
+		if now is None:
+			now = time()
+		return max(0.0, self.reset - now)
+
+	def __repr__(self):
+		return self.__class__.__name__ + "<" + ", ".join((self.resource, str(self.remaining) + "/" + str(self.limit), "reset=" + str(self.reset))) + ">"
+
+
+def graphQLCost(connections: typing.Iterable[typing.Sequence[int]]) -> int:
+	"""Estimates the cost of a GraphQL query the way GitHub does it. Each connection is described by the chain of `first`/`last` arguments from the outermost connection to it, i. e. `repositories(first: 100) {issues(first: 50)}` is `[(100,), (100, 50)]`."""
+	requests = sum(reduce(mul, chain[:-1], 1) for chain in connections)
+	return max(1, round(requests / 100))
+
+
+def parseRetryAfter(retryAfter: typing.Optional[str], now: float) -> typing.Optional[float]:
+	"""`Retry-After` is either a count of seconds or an HTTP date. `None` if it is absent or malformed."""
+	if retryAfter is None:
+		return None
+	retryAfter = retryAfter.strip()
+	if retryAfter.isdigit():
+		return float(retryAfter)
+	try:
+		return max(0.0, parsedate_to_datetime(retryAfter).timestamp() - now)
+	except (TypeError, ValueError, IndexError):
+		return None
+
+
+def isGraphQLMutation(data: bytes) -> bool:
+	"""`data` is a JSON-encoded GraphQL request. Documents of several operations are treated as mutations if the first one is."""
+	try:
+		query = json.loads(data)["query"]
+	except (ValueError, TypeError, KeyError):
+		return True
+	return GQL_MUTATION_RX.match(query) is not None
+
+
+class RateLimitScheduler:
+	"""Tracks per-resource (`core`, `graphql`, `search`, ...) budgets from response headers and computes how long a request has to wait.
+	* If a budget is exhausted, requests wait for its reset.
+	* If `pace` is enabled, requests are spread evenly over the time remaining till the reset, keeping `reserve` requests untouched.
+	* Mutating requests (GraphQL mutations, but not queries) are serialized (GitHub recommends it to avoid secondary limits) and spaced by `mutationInterval` seconds.
+	* Answers signalling exceeded primary or secondary limits are retried up to `maxRetries` times after the time the server asks for, or an exponential backoff starting from `secondaryBackoff` seconds.
+	"""
+
+	__slots__ = ("budgets", "lock", "mutationLock", "asyncMutationLock", "nextSlots", "nextMutation", "blockedUntil", "pace", "reserve", "mutationInterval", "secondaryBackoff", "maxRetries")
+
+	def __init__(self, pace: bool = False, reserve: int = 0, mutationInterval: float = 0.0, secondaryBackoff: float = 60.0, maxRetries: int = 3):
+		self.budgets = {}
+		self.lock = Lock()
+		self.mutationLock = Lock()
+		self.asyncMutationLock = None
+		self.nextSlots = {}
+		self.nextMutation = 0.0
+		self.blockedUntil = {}
+		self.pace = pace
+		self.reserve = reserve
+		self.mutationInterval = mutationInterval
+		self.secondaryBackoff = secondaryBackoff
+		self.maxRetries = maxRetries
+
+	@staticmethod
+	def resourceOf(uri: str) -> str:
+		if uri.endswith("/graphql"):
+			return "graphql"
+		if "/search/" in uri:
+			return "search"
+		return "core"
+
+	@staticmethod
+	def isMutating(method: str, uri: typing.Optional[str] = None, data: typing.Optional[bytes] = None) -> bool:
+		"""GraphQL queries are POSTed too, so a request to the GraphQL endpoint is mutating only if its document is a mutation"""
+		if method not in MUTATING_METHODS:
+			return False
+		if uri is not None and uri.endswith("/graphql") and data is not None:
+			return isGraphQLMutation(data)
+		return True
+
+	def budget(self, resource: str = "core") -> typing.Optional[Budget]:
+		"""`None` if no response of this resource has been seen yet"""
+		return self.budgets.get(resource)
+
+	def estimate(self, count: int, resource: str = "core", now: typing.Optional[float] = None) -> dict:
+		"""Estimates if `count` requests (or GraphQL points) fit into the current budget and how long at least it'd take to spend them"""
+		if now is None:
+			now = time()
+
+		b = self.budgets.get(resource)
+		if b is None:
+			return {"resource": resource, "remaining": None, "sufficient": None, "wait": None}
+
+		available = max(0, b.remaining - self.reserve)
+		if count <= available:
+			wait = 0.0
+		else:
+			periods = ceil((count - available) / max(1, b.limit - self.reserve))
+			wait = b.timeToReset(now) + (periods - 1) * DEFAULT_RESET_INTERVAL
+
+		return {"resource": resource, "remaining": b.remaining, "sufficient": count <= available, "wait": wait}
+
+	def reserveSlot(self, method: str, resource: str, now: typing.Optional[float] = None, mutating: typing.Optional[bool] = None) -> float:
+		"""Accounts a request about to be sent and returns the count of seconds it has to wait. `mutating` is determined by `method` if `None`."""
+		if now is None:
+			now = time()
+		if mutating is None:
+			mutating = self.isMutating(method)
+
+		with self.lock:
+			at = max(now, self.blockedUntil.get(resource, 0.0))
+
+			b = self.budgets.get(resource)
+			if b is not None:
+				if b.remaining <= self.reserve and b.reset > now:
+					at = max(at, b.reset + 1)
+				elif self.pace and b.reset > now:
+					interval = (b.reset - now) / max(1, b.remaining - self.reserve)
+					at = max(at, self.nextSlots.get(resource, 0.0))
+					self.nextSlots[resource] = at + interval
+				b.remaining = max(0, b.remaining - 1)
+
+			if mutating:
+				at = max(at, self.nextMutation)
+				self.nextMutation = at + self.mutationInterval
+
+		return at - now
+
+	def update(self, res: "httpx.Response", resource: str):
+		hdrz = res.headers
+		remaining = hdrz.get("X-RateLimit-Remaining")
+		if remaining is None:
+			return
+
+		resource = hdrz.get("X-RateLimit-Resource", resource)
+		b = Budget(resource, int(hdrz.get("X-RateLimit-Limit", 0)), int(remaining), float(hdrz.get("X-RateLimit-Reset", 0)), int(hdrz.get("X-RateLimit-Used", 0)))
+		with self.lock:
+			self.budgets[resource] = b
+
+	def updateGraphQL(self, rateLimit: typing.Mapping[str, typing.Any]):
+		"""Updates the graphql budget from `rateLimit {limit remaining used resetAt}` selected in a query"""
+		reset = datetime.fromisoformat(rateLimit["resetAt"].replace("Z", "+00:00")).timestamp()
+		b = Budget("graphql", rateLimit["limit"], rateLimit["remaining"], reset, rateLimit.get("used", 0))
+		with self.lock:
+			self.budgets["graphql"] = b
+
+	def retryDelay(self, res: "httpx.Response", resource: str, attempt: int, now: typing.Optional[float] = None) -> typing.Optional[float]:
+		"""Returns the count of seconds to wait before retrying a request answered with a rate-limit error, `None` if it must not be retried"""
+		if res.status_code not in (403, 429) or attempt >= self.maxRetries:
+			return None
+
+		if now is None:
+			now = time()
+
+		hdrz = res.headers
+		delay = parseRetryAfter(hdrz.get("Retry-After"), now)
+		if delay is None:
+			if hdrz.get("X-RateLimit-Remaining") == "0":
+				delay = max(0.0, float(hdrz.get("X-RateLimit-Reset", now)) - now) + 1
+			elif SECONDARY_LIMIT_MARKER in res.text.lower():
+				delay = self.secondaryBackoff * 2 ** attempt
+			else:
+				return None
+
+		with self.lock:
+			self.blockedUntil[resource] = max(self.blockedUntil.get(resource, 0.0), now + delay)
+
+		return delay
@@ -0,0 +1,120 @@
+"""Caches of GET responses revalidated with conditional requests. GitHub answers `If-None-Match` and `If-Modified-Since` with `304 Not Modified`, which doesn't count against the primary rate limit."""
+
+__all__ = ("CachedResponse", "MemoryResponseCache", "DiskResponseCache")
+
+import typing
+from collections import OrderedDict
+from hashlib import sha256
+from os import environ, getpid
+from pathlib import Path
+from threading import Lock, get_ident
+from urllib.parse import urlencode
+
+from .utils import json, makeResponse
+
+STORED_HEADERS = ("Content-Type", "Link", "ETag", "Last-Modified")
+
+
+class CachedResponse:
+	__slots__ = ("headers", "body")
+
+	def __init__(self, headers: typing.Mapping[str, str], body: bytes):
+		self.headers = headers
+		self.body = body
+
+	@classmethod
+	def fromResponse(cls, res: "httpx.Response") -> typing.Optional["CachedResponse"]:
+		"""Returns `None` if the response cannot be revalidated."""
+		hdrz = {k: res.headers[k] for k in STORED_HEADERS if k in res.headers}
+		if "ETag" not in hdrz and "Last-Modified" not in hdrz:
+			return None
+		return cls(hdrz, res.content)
+
+	def conditionalHeaders(self) -> dict:
+		res = {}
+		etag = self.headers.get("ETag")
+		if etag is not None:
+			res["If-None-Match"] = etag
+		lastModified = self.headers.get("Last-Modified")
+		if lastModified is not None:
+			res["If-Modified-Since"] = lastModified
+		return res
+
+	def toResponse(self, notModified: "httpx.Response") -> "httpx.Response":
+		"""Replays the cached body as a response to the request answered with `notModified`."""
+		return makeResponse(200, self.headers, self.body, notModified)
+
+
+class MemoryResponseCache:
+	"""LRU cache of responses in memory. Thread-safe."""
+
+	__slots__ = ("maxEntries", "entries", "lock")
+
+	def __init__(self, maxEntries: int = 1024):
+		self.maxEntries = maxEntries
+		self.entries = OrderedDict()
+		self.lock = Lock()
+
+	@staticmethod
+	def makeKey(method: str, uri: str, urlParams: typing.Optional[dict], hdrz: typing.Mapping[str, str]) -> str:
+		"""Responses depend on the media type and on the identity of the requester, so both are the part of a key. The token itself is not stored, only its hash."""
+		if urlParams:
+			uri += "?" + urlencode(sorted(urlParams.items()))
+		auth = hdrz.get("Authorization", "")
+		return sha256("\n".join((method, uri, hdrz.get("Accept", ""), sha256(auth.encode("utf-8")).hexdigest())).encode("utf-8")).hexdigest()
+
+	def get(self, key: str) -> typing.Optional[CachedResponse]:
+		with self.lock:
+			res = self.entries.get(key)
+			if res is not None:
+				self.entries.move_to_end(key)
+			return res
+
+	def put(self, key: str, entry: CachedResponse):
+		with self.lock:
+			self.entries[key] = entry
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.maxEntries:
+				self.entries.popitem(last=False)
+
+	def __len__(self) -> int:
+		return len(self.entries)
+
+
+class DiskResponseCache(MemoryResponseCache):
+	"""Keeps the responses in a dir in addition to the in-memory LRU, so they survive between processes, i. e. between steps of a job. Eviction only affects the in-memory layer."""
+
+	__slots__ = ("dir",)
+
+	def __init__(self, dir: Path, maxEntries: int = 1024):
+		super().__init__(maxEntries)
+		self.dir = Path(dir)
+		self.dir.mkdir(parents=True, exist_ok=True)
+
+	@classmethod
+	def forActionsJob(cls, maxEntries: int = 1024) -> "DiskResponseCache":
+		"""`RUNNER_TEMP` is cleaned after each job, so the cache is shared only between the steps of the job."""
+		return cls(Path(environ["RUNNER_TEMP"]) / "miniGHAPI_responses", maxEntries)
+
+	def _path(self, key: str) -> Path:
+		return self.dir / key
+
+	def get(self, key: str) -> typing.Optional[CachedResponse]:
+		res = super().get(key)
+		if res is None:
+			try:
+				raw = self._path(key).read_bytes()
+			except FileNotFoundError:
+				return None
+
+			hdrz, body = raw.split(b"\n", 1)
+			res = CachedResponse(json.loads(hdrz), body)
+			super().put(key, res)
+		return res
+
+	def put(self, key: str, entry: CachedResponse):
+		super().put(key, entry)
+		p = self._path(key)
+		tmp = p.with_name(key + "." + str(getpid()) + "." + str(get_ident()) + ".tmp")
+		tmp.write_bytes(json.dumps(entry.headers).encode("utf-8") + b"\n" + entry.body)
+		tmp.replace(p)
@@ -0,0 +1,57 @@
+__all__ = ("RetryPolicy",)
+
+import typing
+from random import uniform
+
+from .utils import IS_HTTPX, httpx
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+TRANSIENT_STATUSES = frozenset((500, 502, 503, 504))
+
+_errors = None
+
+
+def _getErrors() -> typing.Tuple[tuple, tuple]:
+	"""Transient errors and the ones happening before a request has been sent. Resolved on the first failure, since resolving them executes the HTTP backend."""
+	global _errors
+	if _errors is None:
+		if IS_HTTPX:
+			_errors = ((httpx.TransportError,), (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+		else:
+			_errors = ((httpx.ConnectionError, httpx.Timeout), (httpx.exceptions.ConnectTimeout,))
+	return _errors
+
+
+class RetryPolicy:
+	"""Retries transient failures with exponential backoff with full jitter.
+	Failed responses with `statuses` and transport errors (including timeouts) are only retried for idempotent requests: the ones with `methods` and the ranged writes (with `Content-Range`, i. e. chunks of caches uploaded with PATCH), which rewrite the same bytes. Errors happened before a request has been sent (i. e. failures to connect) are retried for any method.
+	"""
+
+	__slots__ = ("maxRetries", "backoffBase", "backoffMax", "statuses", "methods")
+
+	def __init__(self, maxRetries: int = 5, backoffBase: float = 0.5, backoffMax: float = 30.0, statuses: typing.Collection[int] = TRANSIENT_STATUSES, methods: typing.Collection[str] = IDEMPOTENT_METHODS):
+		self.maxRetries = maxRetries
+		self.backoffBase = backoffBase
+		self.backoffMax = backoffMax
+		self.statuses = statuses
+		self.methods = methods
+
+	def isIdempotent(self, method: str, hdrz: typing.Optional[typing.Mapping[str, str]] = None) -> bool:
+		return method in self.methods or (hdrz is not None and "Content-Range" in hdrz)
+
+	def shouldRetryError(self, method: str, ex: BaseException, attempt: int, hdrz: typing.Optional[typing.Mapping[str, str]] = None) -> bool:
+		transientErrors, notSentErrors = _getErrors()
+		if attempt >= self.maxRetries or not isinstance(ex, transientErrors):
+			return False
+		return self.isIdempotent(method, hdrz) or isinstance(ex, notSentErrors)
+
+	def shouldRetryResponse(self, method: str, res: "httpx.Response", attempt: int, hdrz: typing.Optional[typing.Mapping[str, str]] = None) -> bool:
+		return attempt < self.maxRetries and res.status_code in self.statuses and self.isIdempotent(method, hdrz)
+
+	def delay(self, attempt: int, res: typing.Optional["httpx.Response"] = None) -> float:
+		if res is not None:
+			retryAfter = res.headers.get("Retry-After")
+			if retryAfter is not None and retryAfter.isdigit():
+				return float(retryAfter)
+
+		return uniform(0, min(self.backoffMax, self.backoffBase * 2 ** attempt))
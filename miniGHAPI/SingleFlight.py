@@ -0,0 +1,85 @@
+"""Coalescing of concurrent identical requests: while a request is in flight, the identical ones don't hit the network, but wait for its result and share it."""
+
+__all__ = ("SingleFlight",)
+
+import typing
+from concurrent.futures import Future
+from threading import Lock
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD"))
+
+
+class SingleFlight:
+	__slots__ = ("lock", "inFlight", "coalesced")
+
+	def __init__(self):
+		self.lock = Lock()
+		self.inFlight = {}
+		self.coalesced = 0  # count of requests served by the ones in flight
+
+	@staticmethod
+	def makeKey(method: str, uri: str, hdrz: typing.Mapping[str, str], urlParams: typing.Optional[typing.Mapping[str, typing.Any]]) -> typing.Optional[tuple]:
+		"""`None` for the requests which must not be coalesced. All the headers are the part of the key, not only `Accept` and `Authorization`, since `Range` ones select different bodies."""
+		if method not in IDEMPOTENT_METHODS:
+			return None
+		return (method, uri, tuple(sorted(urlParams.items())) if urlParams else (), tuple(sorted(hdrz.items())))
+
+	def _join(self, key: tuple, futureFactory: typing.Callable[[], typing.Any]) -> typing.Tuple[typing.Any, bool]:
+		"""Returns the future of the request and whether the caller must do it"""
+		with self.lock:
+			fut = self.inFlight.get(key)
+			if fut is not None:
+				self.coalesced += 1
+				return fut, False
+			fut = futureFactory()
+			self.inFlight[key] = fut
+			return fut, True
+
+	def _leave(self, key: tuple):
+		with self.lock:
+			del self.inFlight[key]
+
+	def do(self, key: typing.Optional[tuple], func: typing.Callable[[], typing.Any]) -> typing.Any:
+		if key is None:
+			return func()
+
+		fut, isLeader = self._join(key, Future)
+		if not isLeader:
+			return fut.result()
+
+		try:
+			res = func()
+		except BaseException as ex:
+			fut.set_exception(ex)
+			raise
+		else:
+			fut.set_result(res)
+			return res
+		finally:
+			self._leave(key)
+
+	async def ado(self, key: typing.Optional[tuple], func: typing.Callable[[], typing.Awaitable[typing.Any]]) -> typing.Any:
+		"""asyncio counterpart of `do`"""
+		import asyncio  # already imported by the running loop, not importing it for the sync API
+
+		if key is None:
+			return await func()
+
+		fut, isLeader = self._join(key, asyncio.get_running_loop().create_future)
+		if not isLeader:
+			return await asyncio.shield(fut)  # a cancelled follower must not cancel the leader
+
+		try:
+			res = await func()
+		except asyncio.CancelledError:
+			fut.cancel()
+			raise
+		except BaseException as ex:
+			fut.set_exception(ex)
+			fut.exception()  # marks it retrieved, the followers may be absent
+			raise
+		else:
+			fut.set_result(res)
+			return res
+		finally:
+			self._leave(key)
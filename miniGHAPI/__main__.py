@@ -1,4 +1,5 @@
 import argparse
+import sys
 from pathlib import Path, PurePath
 
 
@@ -21,26 +22,53 @@ def uploadArtifact(args):
 			raise ValueError("You must provide container name when dealing with multiple files")
 
 	from .GHActionsEnv import getGHEnv
-	from .undocumented import PipelinesAPIRoot
+	from .undocumented import PipelinesAPIRoot, UploadProgress
 
 	env = getGHEnv()
 
-	pu = PipelinesAPIRoot(env["ACTIONS"]["RUNTIME_TOKEN"], "miniGHApi", env=env)
+	pu = PipelinesAPIRoot(env["ACTIONS"]["RUNTIME_TOKEN"], "miniGHApi", env=env, maxConnections=max(args.workers, 1) * 2)
 
-	def uploadSubTree(u, filePath, prefix):
-		if filePath.is_dir():
-			for el in filePath.iterdir():
-				uploadSubTree(u, el, prefix / el.name)
-		else:
-			u[prefix] = filePath.read_bytes()
+	lastReport = [0.0]
+
+	def reportProgress(progress: UploadProgress):
+		if progress.elapsed - lastReport[0] >= 1:
+			lastReport[0] = progress.elapsed
+			print(progress, file=sys.stderr)
+
+	progress = UploadProgress(reportProgress)
+	with pu.pipelines.getArtifactUploader(args.containerName, chunkSize=args.chunkSize, progress=progress, compress=args.gzip) as u:
+		u.uploadTrees(((filePath, name if name else PurePath(filePath.name)) for name, filePath in zip(args.name, args.file)), workers=args.workers)
+
+	print("Uploaded", progress, file=sys.stderr)
 
-	with pu.pipelines.getArtifactUploader(args.containerName) as u:
-		for name, filePath in zip(args.name, args.file):
-			uploadSubTree(u, filePath, name)
 
+def saveCache(args):
+	from .GHActionsEnv import getGHEnv
+	from .undocumented import ArtifactCacheAPIRoot
+
+	env = getGHEnv()
 
-def uploadCache(args):
-	pass
+	cr = ArtifactCacheAPIRoot(env["ACTIONS"]["RUNTIME_TOKEN"], "miniGHApi", env=env, maxConnections=max(args.workers, 1) * 2)
+	size = cr.cache.save(args.path, args.key, compression=args.compression, chunkSize=args.chunkSize, parallel=args.workers)
+	if size is None:
+		print("Cache entry for the key", args.key, "already exists, not saving", file=sys.stderr)
+	else:
+		print("Saved", size, "bytes under the key", args.key, file=sys.stderr)
+
+
+def restoreCache(args):
+	from .GHActionsEnv import getGHEnv
+	from .undocumented import ArtifactCacheAPIRoot
+
+	env = getGHEnv()
+
+	cr = ArtifactCacheAPIRoot(env["ACTIONS"]["RUNTIME_TOKEN"], "miniGHApi", env=env, maxConnections=max(args.workers, 1) * 2)
+	key = cr.cache.restore(args.path, args.key, args.restoreKey, chunkSize=args.chunkSize, parallel=args.workers)
+	if key is None:
+		print("No cache entry found for the key", args.key, file=sys.stderr)
+	else:
+		print("Restored the entry", key, file=sys.stderr)
+		print(key)
 
 
 def main():
@@ -50,12 +78,30 @@ def main():
 	artifact = subparsers.add_parser("artifact")
 	artifact.add_argument("--containerName", "-C", type=str, help="Name of the container")
 	artifact.add_argument("--name", type=str, help="Name of the file")
+	artifact.add_argument("--workers", "-j", type=int, default=4, help="Count of files uploaded concurrently")
+	artifact.add_argument("--chunkSize", type=int, default=8 * 1024 * 1024, help="Size of a chunk a file is uploaded by, in bytes")
+	artifact.add_argument("--gzip", "-z", action="store_true", help="Compress the files with gzip (unless they are already compressed)")
 	artifact.add_argument("file", type=str, nargs="+", help="Path to a file to upload")
 	artifact.set_defaults(func=uploadArtifact)
 
-	#cache = subparsers.add_parser("cache")
-	#cache.add_argument("dir", type=str, nargs="+", help="Path of file to upload")
-	#cache.set_defaults(func=uploadCache)
+	cache = subparsers.add_parser("cache")
+	cacheSubparsers = cache.add_subparsers()
+
+	cacheSave = cacheSubparsers.add_parser("save")
+	cacheSave.add_argument("--key", "-k", type=str, required=True, help="Key of the cache entry")
+	cacheSave.add_argument("--compression", type=str, choices=("zstd-without-long", "gzip"), default=None, help="Compression of the archive, zstd if `zstandard` is installed, gzip otherwise, by default")
+	cacheSave.add_argument("--workers", "-j", type=int, default=4, help="Count of chunks uploaded concurrently")
+	cacheSave.add_argument("--chunkSize", type=int, default=32 * 1024 * 1024, help="Size of a chunk the archive is uploaded by, in bytes")
+	cacheSave.add_argument("path", type=str, nargs="+", help="Path to a file or a dir to cache, relative to the workspace")
+	cacheSave.set_defaults(func=saveCache)
+
+	cacheRestore = cacheSubparsers.add_parser("restore")
+	cacheRestore.add_argument("--key", "-k", type=str, required=True, help="Key of the cache entry")
+	cacheRestore.add_argument("--restoreKey", "-r", type=str, action="append", default=[], help="Prefix of a key of an entry to restore if there is no entry for the key. Can be repeated, the first matching one wins.")
+	cacheRestore.add_argument("--workers", "-j", type=int, default=4, help="Count of chunks downloaded concurrently")
+	cacheRestore.add_argument("--chunkSize", type=int, default=32 * 1024 * 1024, help="Size of a range the archive is downloaded by, in bytes")
+	cacheRestore.add_argument("path", type=str, nargs="+", help="Paths the entry has been saved with")
+	cacheRestore.set_defaults(func=restoreCache)
 
 	args = parser.parse_args()
 	args.func(args)
@@ -1,15 +1,52 @@
-__all__ = ("dbIDAndType2NodeID", "nodeID2DBIDAndType")
+"""Offline conversion between database IDs and GraphQL global node IDs.
+Legacy IDs are base64 of `0<len(type)>:<type><dbID>`. New-format IDs are `<type prefix>_<unpadded urlsafe base64 of a msgpack array>`, the array is `[0, dbID]`, or `[0, scopeDbID, dbID]` for the objects scoped to a repository or to an owner (an org).
+The types which IDs are of other templates (i. e. `WorkflowRun`, `ProjectV2`) are not listed, legacy IDs are produced for them.
+"""
+
+__all__ = ("dbIDAndType2NodeID", "nodeID2DBIDAndType", "encodeNodeID", "decodeNodeID", "encodeNodeIDs", "decodeNodeIDs", "isRepoScoped", "scopeOf")
 
 import typing
-from base64 import b64decode, b64encode
+from base64 import b64decode, b64encode, urlsafe_b64decode, urlsafe_b64encode
+from struct import Struct
 
+NEW_FORMAT_PREFIXES = {
+	"Repository": "R",
+	"User": "U",
+	"Organization": "O",
+	"Bot": "BOT",
+	"Enterprise": "E",
+	"Team": "T",
+	"App": "A",
+	"Gist": "G",
+	"Workflow": "W",
+	"CheckSuite": "CS",
+	"CheckRun": "CR",
+	"Deployment": "DE",
+	"Environment": "EN",
+	"Issue": "I",
+	"PullRequest": "PR",
+	"IssueComment": "IC",
+	"Label": "LA",
+	"Milestone": "MI",
+	"Discussion": "D",
+	"DiscussionComment": "DC",
+	"Release": "RE",
+	"PullRequestReview": "PRR",
+	"PullRequestReviewComment": "PRRC",
+}
+REPO_SCOPED_TYPES = frozenset(("Issue", "PullRequest", "IssueComment", "Label", "Milestone", "Discussion", "DiscussionComment", "Release", "PullRequestReview", "PullRequestReviewComment", "Workflow", "CheckSuite", "CheckRun", "Deployment", "Environment"))
+OWNER_SCOPED_TYPES = frozenset(("Team",))
+SCOPED_TYPES = REPO_SCOPED_TYPES | OWNER_SCOPED_TYPES
+SCOPE_TYPES = {"repo": ("Repository",), "owner": ("Organization", "User")}  # the types of the objects the IDs are scoped to
+TYPES_BY_PREFIX = {v: k for k, v in NEW_FORMAT_PREFIXES.items()}
 
-def _dbIDAndType2NodeID(db_id: int, type_name: str) -> str:
-	return "0" + str(len(type_name)) + ":" + type_name + str(db_id)
+MSGPACK_FIXARRAY = 0x90
+MSGPACK_UINTS = ((0xFF, 0xCC, Struct(">B")), (0xFFFF, 0xCD, Struct(">H")), (0xFFFFFFFF, 0xCE, Struct(">I")), (0xFFFFFFFFFFFFFFFF, 0xCF, Struct(">Q")))
+MSGPACK_UINT_DECODERS = {tag: st for _, tag, st in MSGPACK_UINTS}
 
 
-def dbIDAndType2NodeID(db_id: int, type_name: str) -> str:
-	return b64encode(_dbIDAndType2NodeID(db_id, type_name).encode("ascii")).decode("ascii")
+def _dbIDAndType2NodeID(db_id: int, type_name: str) -> str:
+	return "0" + str(len(type_name)) + ":" + type_name + str(db_id)
 
 
 def _nodeID2DBIDAndType(node_id: str) -> typing.Tuple[int, str]:
@@ -25,5 +62,139 @@ def _nodeID2DBIDAndType(node_id: str) -> typing.Tuple[int, str]:
 	return int(rest[type_len:]), rest[:type_len]
 
 
+def isRepoScoped(type_name: str) -> bool:
+	return type_name in REPO_SCOPED_TYPES
+
+
+def scopeOf(type_name: str) -> typing.Optional[str]:
+	"""`repo`, `owner` or `None` for the types which new-format IDs are not scoped, see `SCOPE_TYPES`"""
+	if type_name in REPO_SCOPED_TYPES:
+		return "repo"
+	if type_name in OWNER_SCOPED_TYPES:
+		return "owner"
+	return None
+
+
+def _packUInt(res: bytearray, v: int):
+	if v < 0:
+		raise ValueError("IDs must be non-negative", v)
+	if v < 0x80:
+		res.append(v)
+		return
+	for maxV, tag, st in MSGPACK_UINTS:
+		if v <= maxV:
+			res.append(tag)
+			res += st.pack(v)
+			return
+	raise ValueError("ID is too large", v)
+
+
+def _packIDs(ids: typing.Sequence[int]) -> bytes:
+	res = bytearray((MSGPACK_FIXARRAY | (len(ids) + 1), 0))
+	for v in ids:
+		_packUInt(res, v)
+	return bytes(res)
+
+
+def _unpackIDs(raw: bytes) -> typing.List[int]:
+	if not raw or raw[0] & 0xF0 != MSGPACK_FIXARRAY:
+		raise ValueError("Not a msgpack array", raw)
+
+	count = raw[0] & 0x0F
+	res = []
+	i = 1
+	for _ in range(count):
+		tag = raw[i]
+		if tag < 0x80:
+			res.append(tag)
+			i += 1
+		else:
+			st = MSGPACK_UINT_DECODERS.get(tag)
+			if st is None:
+				raise ValueError("Unsupported msgpack element", tag)
+			res.append(st.unpack_from(raw, i + 1)[0])
+			i += 1 + st.size
+
+	if i != len(raw):
+		raise ValueError("Trailing bytes in node ID", raw)
+	if res[0] != 0:
+		raise ValueError("Unsupported node ID template", res[0])
+	return res[1:]
+
+
+def encodeNodeID(type_name: str, db_id: int, repo_db_id: typing.Optional[int] = None, legacy: bool = False) -> str:
+	"""New-format ID, legacy one for the types which prefixes are unknown. `repo_db_id` is required for the scoped types: it is the database ID of the repository, or of the owner for the types scoped to an owner."""
+	prefix = NEW_FORMAT_PREFIXES.get(type_name)
+	if legacy or prefix is None:
+		return b64encode(_dbIDAndType2NodeID(db_id, type_name).encode("ascii")).decode("ascii")
+
+	if type_name in SCOPED_TYPES:
+		if repo_db_id is None:
+			raise ValueError("Database ID of the " + scopeOf(type_name) + " is needed for the node ID of " + type_name)
+		ids = (repo_db_id, db_id)
+	else:
+		ids = (db_id,)
+
+	return prefix + "_" + urlsafe_b64encode(_packIDs(ids)).rstrip(b"=").decode("ascii")
+
+
+def decodeNodeID(node_id: str) -> typing.Tuple[str, int, typing.Optional[int]]:
+	"""Returns the type name, the database ID and the database ID of the repository or the owner (for scoped new-format IDs, `None` otherwise)"""
+	prefix, sep, payload = node_id.partition("_")
+	if not sep:
+		db_id, type_name = _nodeID2DBIDAndType(b64decode(node_id).decode("ascii"))
+		return type_name, db_id, None
+
+	type_name = TYPES_BY_PREFIX.get(prefix)
+	if type_name is None:
+		raise ValueError("Unknown node ID type prefix", prefix)
+
+	ids = _unpackIDs(urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+	if len(ids) == 1:
+		return type_name, ids[0], None
+	return type_name, ids[-1], ids[-2]
+
+
+def _packedUInt(v: int) -> bytes:
+	res = bytearray()
+	_packUInt(res, v)
+	return bytes(res)
+
+
+def encodeNodeIDs(type_name: str, db_ids: typing.Iterable[int], repo_db_ids: typing.Optional[typing.Union[int, typing.Iterable[int]]] = None) -> typing.List[str]:
+	"""Bulk `encodeNodeID` for the objects of the same type. `repo_db_ids` is either an iterable parallel to `db_ids` or a single `int` for all of them. The common part of the IDs is packed once."""
+	prefix = NEW_FORMAT_PREFIXES.get(type_name)
+	if prefix is None or (type_name in SCOPED_TYPES and not isinstance(repo_db_ids, int)):
+		if repo_db_ids is None or isinstance(repo_db_ids, int):
+			return [encodeNodeID(type_name, i, repo_db_ids) for i in db_ids]
+		return [encodeNodeID(type_name, i, r) for i, r in zip(db_ids, repo_db_ids)]
+
+	if type_name in SCOPED_TYPES:
+		head = bytes((MSGPACK_FIXARRAY | 3, 0)) + _packedUInt(repo_db_ids)
+	else:
+		head = bytes((MSGPACK_FIXARRAY | 2, 0))
+
+	prefix += "_"
+	uint32 = MSGPACK_UINT_DECODERS[0xCE]
+	uint32Head = head + b"\xce"
+	res = []
+	for i in db_ids:
+		if 0xFFFF < i <= 0xFFFFFFFF:
+			raw = uint32Head + uint32.pack(i)  # the most common case
+		else:
+			raw = head + _packedUInt(i)
+		res.append(prefix + urlsafe_b64encode(raw).rstrip(b"=").decode("ascii"))
+	return res
+
+
+def decodeNodeIDs(node_ids: typing.Iterable[str]) -> typing.List[typing.Tuple[str, int, typing.Optional[int]]]:
+	return [decodeNodeID(el) for el in node_ids]
+
+
+def dbIDAndType2NodeID(db_id: int, type_name: str, repo_db_id: typing.Optional[int] = None) -> str:
+	return encodeNodeID(type_name, db_id, repo_db_id)
+
+
 def nodeID2DBIDAndType(node_id: str) -> typing.Tuple[int, str]:
-	return _nodeID2DBIDAndType(b64decode(node_id).decode("ascii"))
+	type_name, db_id, _ = decodeNodeID(node_id)
+	return db_id, type_name
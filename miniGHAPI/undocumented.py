@@ -1,8 +1,68 @@
+import gzip
 import os
-from pathlib import PurePath
+import typing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from mmap import ACCESS_READ, mmap
+from pathlib import Path, PurePath
+from shutil import copyfileobj
+from tempfile import TemporaryFile
+from threading import BoundedSemaphore, Lock
+from time import monotonic
 
-from .Actions import *
 from .APICore import GHAPIBase, GHApiObj, UndocumentedAPIRoot
+from . import utils
+from .utils import orderedParallelMap
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+COMPRESSION_BLOCK_SIZE = 1024 * 1024
+DEFAULT_CACHE_CHUNK_SIZE = 32 * 1024 * 1024  # the same as toolkit uses
+
+ALREADY_COMPRESSED_SUFFIXES = frozenset((".gz", ".tgz", ".bz2", ".tbz", ".xz", ".txz", ".lz", ".lzma", ".zst", ".tzst", ".br", ".lz4", ".7z", ".zip", ".whl", ".jar", ".apk", ".nupkg", ".rar", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".mp3", ".mp4", ".mkv", ".webm", ".ogg", ".opus", ".flac", ".woff", ".woff2"))
+ALREADY_COMPRESSED_MAGICS = (b"\x1f\x8b", b"PK\x03\x04", b"BZh", b"\xfd7zXZ\x00", b"\x28\xb5\x2f\xfd", b"7z\xbc\xaf\x27\x1c", b"Rar!", b"\x89PNG", b"\xff\xd8\xff")
+
+UploadSource = typing.Union[PurePath, str, bytes, bytearray, memoryview, mmap, typing.BinaryIO]
+
+
+@contextmanager
+def mapUploadSource(source: UploadSource) -> typing.Iterator[memoryview]:
+	"""Gives a read-only view of the source without reading it into memory where possible: paths and files are memory-mapped. Streams which can be neither mapped nor addressed are spooled into a temporary file first."""
+
+	if isinstance(source, (str, PurePath)):
+		with open(source, "rb") as f:
+			with mapUploadSource(f) as v:
+				yield v
+		return
+
+	if isinstance(source, (bytes, bytearray, memoryview, mmap)):
+		with memoryview(source) as v:
+			yield v
+		return
+
+	getbuffer = getattr(source, "getbuffer", None)
+	if getbuffer is not None:
+		with getbuffer() as v:
+			yield v
+		return
+
+	try:
+		fileno = source.fileno()
+	except (AttributeError, OSError):
+		with TemporaryFile() as tmp:
+			copyfileobj(source, tmp)
+			tmp.flush()
+			with mapUploadSource(tmp) as v:
+				yield v
+		return
+
+	if os.fstat(fileno).st_size == 0:
+		yield memoryview(b"")
+		return
+
+	with mmap(fileno, 0, access=ACCESS_READ) as m:
+		with memoryview(m) as v:
+			yield v
 
 
 class RunIddableUndocumented(GHApiObj):
@@ -21,30 +81,81 @@ class RunIddableUndocumented(GHApiObj):
 		return self.__class__.PREFIX + str(self.runId) + "/"
 
 
-def getArtifactsCacheEndpoint(shittyId, key: str, version: str):
-	"""version looks like SHA256 hash"""
-	return ARTIFACTS_CACHE_API + shittyId + ARTIFACTS_CACHE_API + "?keys=" + key + "&version=" + version
-
-
 class PipelinesAPIRoot(UndocumentedAPIRoot):
 	__slots__ = ("resources", "pipelines")
 
 	SUBDOMAIN = "pipelines"
 	ENV_VAR = "RUNTIME_URL"
 
-	def __init__(self, token: str, userAgent: str = None, env: dict = None, someId: str = None):
-		super().__init__(token, userAgent, env, someId)
+	def __init__(self, token: str, userAgent: str = None, env: dict = None, someId: str = None, **kwargs):
+		super().__init__(token, userAgent, env, someId, **kwargs)
 		self.pipelines = PipelinesUndocumented(self)
 		self.resources = ResourcesUndocumented(self)
 
 
+def walkFiles(path: Path, prefix: PurePath) -> typing.Iterator[typing.Tuple[Path, PurePath]]:
+	"""Iteratively (without recursion) walks the tree, yielding paths of files with their names within an artifact"""
+	stack = [(path, prefix)]
+	while stack:
+		path, prefix = stack.pop()
+		if not path.is_dir():
+			yield path, prefix
+			continue
+
+		with os.scandir(path) as it:
+			for el in it:
+				elPath = Path(el.path)
+				if el.is_dir():
+					stack.append((elPath, prefix / el.name))
+				else:
+					yield elPath, prefix / el.name
+
+
+class UploadProgress:
+	"""Thread-safe aggregate of uploaded files and bytes. `callback` is called with the object after each file."""
+
+	__slots__ = ("files", "bytes", "started", "lock", "callback")
+
+	def __init__(self, callback: typing.Optional[typing.Callable[["UploadProgress"], None]] = None):
+		self.files = 0
+		self.bytes = 0
+		self.started = monotonic()
+		self.lock = Lock()
+		self.callback = callback
+
+	def add(self, size: int):
+		with self.lock:
+			self.files += 1
+			self.bytes += size
+		if self.callback is not None:
+			self.callback(self)
+
+	@property
+	def elapsed(self) -> float:
+		return monotonic() - self.started
+
+	@property
+	def throughput(self) -> float:
+		"""bytes per second"""
+		elapsed = self.elapsed
+		return self.bytes / elapsed if elapsed else 0.0
+
+	def __str__(self):
+		return str(self.files) + " files, " + str(self.bytes) + " bytes in " + format(self.elapsed, ".1f") + " s (" + format(self.throughput / 1024 / 1024, ".2f") + " MiB/s)"
+
+
 class ArtifactsUploader:
-	__slots__ = ("parent", "container", "name")
+	__slots__ = ("parent", "container", "name", "chunkSize", "progress", "compress")
 
-	def __init__(self, parent, name: str):
+	def __init__(self, parent, name: str, chunkSize: int = DEFAULT_CHUNK_SIZE, progress: typing.Optional[UploadProgress] = None, compress: bool = False):
 		self.parent = parent
 		self.name = name
 		self.container = None
+		self.chunkSize = chunkSize
+		self.compress = compress
+		if progress is None:
+			progress = UploadProgress()
+		self.progress = progress
 
 	def __enter__(self):
 		if self.container is None:
@@ -53,21 +164,41 @@ class ArtifactsUploader:
 
 		return self
 
+	def put(self, k: PurePath, v: UploadSource) -> dict:
+		f = self.container.file(k)
+		res = f.upload(v, chunkSize=self.chunkSize, compress=self.compress)
+		self.progress.add(f.size)
+		return res
+
 	def __setitem__(self, k, v):
-		res = self.container.putArtifact(k, v)
-		print("put res:", res)
+		self.put(k, v)
+
+	def uploadTrees(self, trees: typing.Iterable[typing.Tuple[Path, PurePath]], workers: int = 4):
+		"""Uploads files and dirs, streaming the files from disk. `trees` contains pairs of a path and its name within an artifact. Up to `workers` files are uploaded at once."""
+
+		files = (el for path, prefix in trees for el in walkFiles(path, prefix))
+
+		def uploadFile(pathAndName: typing.Tuple[Path, PurePath]) -> dict:
+			path, name = pathAndName
+			return self.put(name, path)
+
+		with ThreadPoolExecutor(max_workers=workers) as executor:
+			for _ in orderedParallelMap(executor, uploadFile, files, workers):
+				pass
+
+	def __exit__(self, excType, *args, **kwargs):
+		if excType is not None:
+			return  # an artifact appears in a pipeline only after patching, so a partial artifact stays invisible
 
-	def __exit__(self, *args, **kwargs):
 		# The following line is required in order for an artifact to appear within a pipeline!!!
-		res1 = self.parent.workflows.artifacts.patchArtifact({}, self.container.name)  # patched with "Size": len(fileContents) by default, but it takes no effect: it works both even if I removed it, and if I filled it with misinformation. ToDo: find out what else I can use here!
-		print("patch res:", res1)
+		self.parent.workflows.artifacts.patchArtifact({}, self.container.name)  # patched with "Size": len(fileContents) by default, but it takes no effect: it works both even if I removed it, and if I filled it with misinformation. ToDo: find out what else I can use here!
 
 
 class PipelinesUndocumented(GHApiObj):
 	__slots__ = ("workflows",)
 
-	def getArtifactUploader(self, name) -> ArtifactsUploader:
-		return ArtifactsUploader(self, name)
+	def getArtifactUploader(self, name, **kwargs) -> ArtifactsUploader:
+		return ArtifactsUploader(self, name, **kwargs)
 
 	@property
 	def prefix(self) -> str:
@@ -101,19 +232,37 @@ class ContainersUndocumented(GHApiObj):
 		return Container(self, iD, None)
 
 
+def isWorthCompressing(name: PurePath, v: memoryview) -> bool:
+	"""Compressing already compressed formats only wastes CPU. They are detected by the extension and by the magic."""
+	if PurePath(name).suffix.lower() in ALREADY_COMPRESSED_SUFFIXES:
+		return False
+
+	head = bytes(v[:8])
+	return not any(head.startswith(m) for m in ALREADY_COMPRESSED_MAGICS)
+
+
+def gzipInto(v: memoryview, dst: typing.BinaryIO):
+	"""Compresses block by block, so neither the source nor the result are in memory as a whole. `mtime` is fixed to make the output deterministic, so an interrupted upload can be resumed after recompression."""
+	with gzip.GzipFile(fileobj=dst, mode="wb", mtime=0) as z:
+		for start in range(0, len(v), COMPRESSION_BLOCK_SIZE):
+			z.write(v[start : start + COMPRESSION_BLOCK_SIZE])
+	dst.flush()
+
+
 class File:
-	__slots__ = ("parent", "name", "size")
+	__slots__ = ("parent", "name", "size", "acknowledged")
 
 	def __init__(self, parent, name: PurePath, size: int):
 		assert name is not None
 		self.name = name
 		self.parent = parent
 		self.size = size
+		self.acknowledged = 0  # the count of bytes from the beginning the server has confirmed receiving
 
 	def __getitem__(self, k):
 		raise NotImplementedError
 
-	def __setitem__(self, k: slice, v: bytes):
+	def _put(self, k: slice, v: bytes, headers: typing.Optional[typing.Mapping[str, str]] = None):
 		if k is not None:
 			if not isinstance(k, slice):
 				raise ValueError("Key must be a slice")
@@ -123,9 +272,52 @@ class File:
 		if self.size is None:
 			self.size = len(v)
 
-		return self.parent.req("", obj=v, method="PUT", urlParams={"itemPath": str(PurePath(self.parent.name) / self.name)}, contentType="application/octet-stream", contentRange=(k, self.size)).json()
+		return self.parent.req("", obj=v, method="PUT", urlParams={"itemPath": str(PurePath(self.parent.name) / self.name)}, contentType="application/octet-stream", contentRange=(k, self.size), headers=headers)
+
+	def __setitem__(self, k: slice, v: bytes):
+		return self.parent._json(self._put(k, v))
 		# {"containerId": 266701, "scopeIdentifier": "00000000-0000-0000-0000-000000000000", "path": "test.txt/test.txt", "itemType": "file", "status": "created", "fileLength": 5, "fileEncoding": 1, "fileType": 1, "dateCreated": <ISO date time string>, "dateLastModified": <ISO date time string>, "createdBy":  <guid>, "lastModifiedBy": <guid>, "fileId": 1207, "contentId": ""}
 
+	def upload(self, source: UploadSource, chunkSize: int = DEFAULT_CHUNK_SIZE, parallel: int = 1, compress: bool = False) -> typing.Optional[dict]:
+		"""Uploads the source in `chunkSize` chunks, up to `parallel` of them being in flight at once. Only one chunk per a worker is kept in memory.
+		If an upload has failed, calling this method again resumes it from the first chunk not acknowledged by the server. Returns the response to the last chunk.
+		If `compress` is set, the source is gzipped into a temporary file, like the official toolkit does, unless it is already compressed or compression doesn't make it smaller. `size` is the size of the data on the wire then."""
+
+		with mapUploadSource(source) as v:
+			if compress and isWorthCompressing(self.name, v):
+				with TemporaryFile() as tmp:
+					gzipInto(v, tmp)
+					if tmp.tell() < len(v):
+						with mapUploadSource(tmp) as compressed:
+							return self._uploadView(compressed, chunkSize, parallel, {"Content-Encoding": "gzip", "x-tfs-filelength": str(len(v))})
+
+			return self._uploadView(v, chunkSize, parallel, None)
+
+	def _uploadView(self, v: memoryview, chunkSize: int, parallel: int, headers: typing.Optional[typing.Mapping[str, str]]) -> typing.Optional[dict]:
+		if self.size is None:
+			self.size = len(v)
+		elif self.size != len(v):
+			raise ValueError("Size of the source doesn't match the size of the file", len(v), self.size)
+
+		if not self.size:
+			return self.parent._json(self._put(None, b"", headers))
+
+		def putChunk(start: int) -> typing.Tuple[int, dict]:
+			stop = min(start + chunkSize, self.size)
+			return stop, self.parent._json(self._put(slice(start, stop), bytes(v[start:stop]), headers))
+
+		starts = range(self.acknowledged, self.size, chunkSize)
+		res = None
+		if parallel > 1:
+			with ThreadPoolExecutor(max_workers=parallel) as executor:
+				for stop, res in orderedParallelMap(executor, putChunk, starts, parallel):
+					self.acknowledged = stop
+		else:
+			for start in starts:
+				self.acknowledged, res = putChunk(start)
+
+		return res
+
 
 class Container(GHApiObj):
 	__slots__ = ("id", "name", "expiration")
@@ -143,9 +335,9 @@ class Container(GHApiObj):
 	def file(self, name: PurePath, size: int = None):
 		return File(self, name, size)
 
-	def putArtifact(self, fileName: PurePath, fileContents: bytes) -> dict:
-		f = self.file(fileName)
-		f[None] = fileContents
+	def putArtifact(self, fileName: PurePath, fileContents: UploadSource, chunkSize: int = DEFAULT_CHUNK_SIZE, parallel: int = 1, compress: bool = False) -> dict:
+		"""`fileContents` can be `bytes`, a path, a file object, a `mmap` or a `memoryview`. It is uploaded in chunks, see `File.upload`."""
+		return self.file(fileName).upload(fileContents, chunkSize=chunkSize, parallel=parallel, compress=compress)
 
 
 class WorkflowsUndocumented(RunIddableUndocumented):
@@ -164,35 +356,159 @@ class ArtifactsUndocumented(GHApiObj):
 	def prefix(self) -> str:
 		return "artifacts"
 
-	def createContainer(self, containerName: str, days: int = None) -> "Container":
+	def _containerReqObj(self, containerName: str, days: int = None) -> dict:
 		reqObj = {"Type": "actions_storage", "Name": containerName}
 		if days is not None:
 			maxRetentionDays = int(self.env["GITHUB"]["RETENTION_DAYS"])
 			if days > maxRetentionDays:
 				raise ValueError("Retention for " + str(days) + " is not allowed for this repo")
 			reqObj["RetentionDays"] = days
+		return reqObj
 
-		res = self.req(path="", obj=reqObj, method="post").json()
+	def _containerFromResponse(self, res: dict, containerName: str) -> "Container":
 		c = self.root.resources.containers[res["containerId"]]
 		c.name = containerName
 		c.expiration = res["expiresOn"]
 		return c
 
+	def createContainer(self, containerName: str, days: int = None) -> "Container":
+		res = self._json(self.req(path="", obj=self._containerReqObj(containerName, days), method="post"))
+		return self._containerFromResponse(res, containerName)
+
 	def patchArtifact(self, dic: dict, containerName: str) -> dict:
-		return self.req("", obj=dic, method="PATCH", urlParams={"artifactName": containerName}).json()
+		return self._json(self.req("", obj=dic, method="PATCH", urlParams={"artifactName": containerName}))
+
 
+class CacheUndocumented(GHApiObj):
+	"""Entries of the cache used by `actions/cache`. An entry is identified by a key and a version, the version is derived from the cached paths and the compression, see `getCacheVersion`."""
+
+	__slots__ = ()
 
-# https://github.com/actions/toolkit/blob/main/packages/cache/src/cache.ts
+	@property
+	def prefix(self) -> str:
+		return "artifactcache/"
+
+	def lookup(self, keys: typing.Sequence[str], version: str) -> typing.Optional[dict]:
+		"""The first key is matched exactly, the rest ones by prefix. Returns `None` on a miss."""
+		res = self.req("cache", None, method="GET", urlParams={"keys": ",".join(keys), "version": version})
+		if res.status_code == 204:
+			return None
+		return self._json(res)
+		# {"scope": "refs/heads/master", "cacheKey": <key>, "cacheVersion": <version>, "creationTime": <ISO date time string>, "archiveLocation": <URL of the archive>}
+
+	def reserve(self, key: str, version: str, cacheSize: int = None) -> typing.Optional[int]:
+		"""Returns the id of the reserved entry, `None` if the entry already exists or is being saved by another job"""
+		reqObj = {"key": key, "version": version}
+		if cacheSize is not None:
+			reqObj["cacheSize"] = cacheSize
+
+		try:
+			res = self.req("caches", reqObj, method="POST")
+		except utils.HTTPStatusError as ex:
+			if ex.response.status_code == 409:
+				return None
+			raise
+		return self._json(res)["cacheId"]
+
+	def uploadChunk(self, cacheId: int, start: int, chunk: bytes):
+		self.req("caches/" + str(cacheId), chunk, method="PATCH", contentType="application/octet-stream", contentRange=range(start, start + len(chunk)))
+
+	def commit(self, cacheId: int, size: int):
+		self.req("caches/" + str(cacheId), {"size": size}, method="POST")
+
+	def save(self, paths: typing.Sequence[PurePath], key: str, workspace: Path = None, compression: str = None, chunkSize: int = DEFAULT_CACHE_CHUNK_SIZE, parallel: int = 4) -> typing.Optional[int]:
+		"""Archives `paths` (relative to `workspace`) and saves them under `key`. The archive is streamed: chunks are uploaded as soon as the compressor emits them, at most `parallel` of them being in memory at once, so nothing is written to disk. Returns the size of the archive, `None` if the entry already exists."""
+		from .CacheArchive import ChunkWriter, getCacheVersion, getDefaultCompression, writeCacheArchive  # archivers are not needed for the artifacts
+
+		if workspace is None:
+			workspace = self.env["GITHUB"]["WORKSPACE"]
+		if compression is None:
+			compression = getDefaultCompression()
+
+		paths = [str(p) for p in paths]
+		cacheId = self.reserve(key, getCacheVersion(paths, compression))
+		if cacheId is None:
+			return None
+
+		slots = BoundedSemaphore(parallel)
+		pending = deque()
+
+		def uploadChunk(start: int, chunk: bytes):
+			try:
+				self.uploadChunk(cacheId, start, chunk)
+			finally:
+				slots.release()
+
+		with ThreadPoolExecutor(max_workers=parallel) as executor:
+
+			def onChunk(start: int, chunk: bytes):
+				while pending and pending[0].done():
+					pending.popleft().result()  # fails early if a chunk has failed
+				slots.acquire()
+				pending.append(executor.submit(uploadChunk, start, chunk))
+
+			w = ChunkWriter(chunkSize, onChunk)
+			try:
+				writeCacheArchive(w, paths, workspace, compression)
+				w.close()
+				while pending:
+					pending.popleft().result()
+			finally:
+				for f in pending:
+					f.cancel()
+
+		self.commit(cacheId, w.size)
+		return w.size
+
+	def downloadChunks(self, archiveLocation: str, chunkSize: int = DEFAULT_CACHE_CHUNK_SIZE, parallel: int = 4) -> typing.Iterator[bytes]:
+		"""Downloads the archive with up to `parallel` concurrent range requests, yielding the chunks in order. At most `parallel` chunks are kept in memory.
+		`archiveLocation` is a presigned URL of a blob storage, so no auth headers are sent to it."""
+
+		def fetch(start: int) -> bytes:
+			return self.root._send("GET", archiveLocation, None, {"Range": "bytes=" + str(start) + "-" + str(start + chunkSize - 1)}, None).content
+
+		first = self.root._send("GET", archiveLocation, None, {"Range": "bytes=0-" + str(chunkSize - 1)}, None)
+		yield first.content
+		if first.status_code != 206:
+			return  # the server has ignored the range and sent the whole archive
+
+		total = int(first.headers["Content-Range"].rsplit("/", 1)[1])
+		with ThreadPoolExecutor(max_workers=parallel) as executor:
+			yield from orderedParallelMap(executor, fetch, range(chunkSize, total, chunkSize), parallel)
+
+	def restore(self, paths: typing.Sequence[PurePath], key: str, restoreKeys: typing.Sequence[str] = (), workspace: Path = None, chunkSize: int = DEFAULT_CACHE_CHUNK_SIZE, parallel: int = 4) -> typing.Optional[str]:
+		"""Looks the entry up by `key`, then by `restoreKeys` prefixes, and extracts it into `workspace` while it is being downloaded, so the archive is neither kept in memory nor written to disk. `paths` must be the same as the ones the entry has been saved with. Returns the key of the restored entry, `None` on a miss."""
+		from .CacheArchive import ChunkReader, extractCacheArchive, getAvailableCompressions, getCacheVersion
+
+		if workspace is None:
+			workspace = self.env["GITHUB"]["WORKSPACE"]
+
+		paths = [str(p) for p in paths]
+		keys = [key]
+		keys.extend(restoreKeys)
+		for compression in getAvailableCompressions():
+			entry = self.lookup(keys, getCacheVersion(paths, compression))
+			if entry is not None:
+				chunks = self.downloadChunks(entry["archiveLocation"], chunkSize, parallel)
+				try:
+					extractCacheArchive(ChunkReader(chunks), workspace, compression)
+				finally:
+					chunks.close()
+				return entry["cacheKey"]
+
+		return None
+
+
+# https://github.com/actions/toolkit/blob/main/packages/cache/src/internal/cacheHttpClient.ts
 class ArtifactCacheAPIRoot(UndocumentedAPIRoot):
 	__slots__ = ("cache",)
 
 	SUBDOMAIN = "artifactcache"
-	ENV_VAR = "RUNTIME_URL"
+	ENV_VAR = "CACHE_URL"
 
-	class CacheUndocumented(RunIddableUndocumented):
-		__slots__ = ()
-		PREFIX = "artifactcache/cache/"
+	API_VERSION_ARG_VALUE = UndocumentedAPIRoot.UNDOCUMENTED_API_VERSION + "-preview.1"
+	API_VERSION_ARG_NAME_VALUE_PAIR = UndocumentedAPIRoot.API_VERSION_ARG_NAME + "=" + API_VERSION_ARG_VALUE
 
-	def __init__(self, token: str, userAgent: str = None, env: dict = None, someId: str = None):
-		super().__init__(token, userAgent, env, someId)
+	def __init__(self, token: str, userAgent: str = None, env: dict = None, someId: str = None, **kwargs):
+		super().__init__(token, userAgent, env, someId, **kwargs)
 		self.cache = CacheUndocumented(self)
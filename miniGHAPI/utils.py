@@ -1,14 +1,105 @@
-try:
-	import ujson as json
-except ImportError:
-	import json
+__all__ = ("httpx", "IS_HTTPX", "json", "iterateSlice", "createClient", "createAsyncClient", "orderedParallelMap", "makeResponse", "streamRequest", "responseJSON", "responseRecords", "BODY_ARG")  # `HTTPStatusError` and `STREAM_INTERRUPTED_ERRORS` are resolved lazily by `__getattr__`, so they are accessed as `utils.HTTPStatusError`
 
-try:
-	import httpx
-except ImportError:
-	import requests as httpx
+import json
+import sys
+import types
+import typing
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from importlib.util import LazyLoader, find_spec, module_from_spec
 
-__all__ = ("httpx", "json", "iterateSlice")
+from .JSONCodec import JSONCodec, defaultCodec
+
+if typing.TYPE_CHECKING:
+	import concurrent.futures
+
+
+def lazyImport(name: str) -> typing.Optional[types.ModuleType]:
+	"""Imports a module deferring its execution till the first access to its attributes. `None` if it is not installed."""
+	res = sys.modules.get(name)
+	if res is not None:
+		return res
+
+	spec = find_spec(name)
+	if spec is None:
+		return None
+	spec.loader = LazyLoader(spec.loader)
+	res = module_from_spec(spec)
+	sys.modules[name] = res
+	spec.loader.exec_module(res)
+	return res
+
+
+# the HTTP backend is executed when the first client is created, not on import, so the CLI starts fast
+httpx = lazyImport("httpx")
+IS_HTTPX = httpx is not None
+if not IS_HTTPX:
+	httpx = lazyImport("requests")
+	if httpx is None:
+		raise ImportError("Either `httpx` or `requests` is required")
+
+BODY_ARG = "content" if IS_HTTPX else "data"  # `data` with bytes is deprecated in `httpx`
+
+
+def __getattr__(name: str) -> typing.Any:
+	"""Exception classes of the backend are resolved on the first access, since resolving them executes the backend"""
+	if name == "HTTPStatusError":
+		res = httpx.HTTPStatusError if IS_HTTPX else httpx.HTTPError  # both have `response`
+	elif name == "STREAM_INTERRUPTED_ERRORS":
+		res = (httpx.TransportError,) if IS_HTTPX else (httpx.ConnectionError, httpx.exceptions.ChunkedEncodingError, httpx.Timeout)
+	else:
+		raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
+	globals()[name] = res
+	return res
+
+
+def createClient(http2: bool = False, maxConnections: typing.Optional[int] = 100, maxKeepAlive: typing.Optional[int] = 20, keepAliveExpiry: typing.Optional[float] = 5.0, timeout: typing.Optional[float] = None):
+	"""Creates a pooled keep-alive client using the backend available. `http2` is only supported by `httpx` and needs `h2` to be installed. `timeout` (in seconds, `None` for none) limits each network operation (connecting, reading, writing), not a whole request."""
+
+	if IS_HTTPX:
+		limits = httpx.Limits(max_connections=maxConnections, max_keepalive_connections=maxKeepAlive, keepalive_expiry=keepAliveExpiry)
+		return httpx.Client(http2=http2, limits=limits, timeout=timeout)
+
+	if http2:
+		raise ValueError("HTTP/2 is only supported with `httpx`")
+
+	s = httpx.Session()
+	if maxConnections is not None:
+		adapter = httpx.adapters.HTTPAdapter(pool_connections=maxConnections, pool_maxsize=maxConnections)
+		s.mount("https://", adapter)
+		s.mount("http://", adapter)
+	if timeout is not None:
+		s.request = partial(s.request, timeout=timeout)  # sessions of `requests` have no default timeout
+	return s
+
+
+def createAsyncClient(http2: bool = False, maxConnections: typing.Optional[int] = 100, maxKeepAlive: typing.Optional[int] = 20, keepAliveExpiry: typing.Optional[float] = 5.0, timeout: typing.Optional[float] = None):
+	if not IS_HTTPX:
+		raise ImportError("asyncio API requires `httpx`")
+
+	limits = httpx.Limits(max_connections=maxConnections, max_keepalive_connections=maxKeepAlive, keepalive_expiry=keepAliveExpiry)
+	return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout)
+
+
+def responseJSON(res: "httpx.Response", codec: typing.Optional[JSONCodec] = None) -> typing.Any:
+	"""Decodes the body once per response object, so the callers sharing a coalesced response share the result. It must not be mutated."""
+	try:
+		return res._parsedJSON
+	except AttributeError:
+		v = (codec if codec is not None else defaultCodec()).loads(res.content)
+		res._parsedJSON = v
+		return v
+
+
+def responseRecords(res: "httpx.Response", codec: typing.Optional[JSONCodec], projection: tuple) -> list:
+	"""Decodes a page of a listing into records of `projection` once per response object, like `responseJSON`"""
+	try:
+		return res._parsedRecords
+	except AttributeError:
+		v = (codec if codec is not None else defaultCodec()).loadRecords(res.content, projection)
+		res._parsedRecords = v
+		return v
 
 
 def iterateSlice(slc, defaultStart: int = 0):
@@ -37,3 +128,51 @@ def iterateSlice(slc, defaultStart: int = 0):
 		while True:
 			yield i
 			i += step
+
+
+def makeResponse(status: int, headers: typing.Mapping[str, str], content: bytes, like: "httpx.Response") -> "httpx.Response":
+	"""Creates a response object of the backend used. `like` is a response the request and URL are taken from."""
+
+	if IS_HTTPX:
+		return httpx.Response(status, headers=headers, content=content, request=like.request)
+
+	res = httpx.Response()
+	res.status_code = status
+	res.headers = httpx.structures.CaseInsensitiveDict(headers)
+	res._content = content
+	res.url = like.url
+	res.request = like.request
+	res.encoding = like.encoding
+	return res
+
+
+def orderedParallelMap(executor: "concurrent.futures.Executor", func: typing.Callable, items: typing.Iterable, window: int) -> typing.Iterator[typing.Any]:
+	"""Like `executor.map`, but consumes `items` lazily keeping at most `window` tasks in flight. Results are yielded in the order of `items`. Tasks not yet started are cancelled if the generator is closed."""
+
+	pending = deque()
+	try:
+		for item in items:
+			pending.append(executor.submit(func, item))
+			if len(pending) >= window:
+				yield pending.popleft().result()
+
+		while pending:
+			yield pending.popleft().result()
+	finally:
+		for f in pending:
+			f.cancel()
+
+
+@contextmanager
+def streamRequest(client, url: str, headers: typing.Mapping[str, str], chunkSize: int) -> typing.Iterator[typing.Tuple["httpx.Response", typing.Iterator[bytes]]]:
+	"""GETs `url` following redirects without reading the body into memory. Yields the response and an iterator of chunks of its body. Both backends drop `Authorization` on redirects to other hosts."""
+
+	if IS_HTTPX:
+		with client.stream("GET", url, headers=headers, follow_redirects=True) as res:
+			res.raise_for_status()
+			yield res, res.iter_bytes(chunkSize)
+		return
+
+	with client.get(url, headers=headers, stream=True) as res:
+		res.raise_for_status()
+		yield res, res.iter_content(chunkSize)
@@ -0,0 +1,430 @@
+"""A local stand-in for the undocumented Actions services (the cache and the artifacts), replaying the protocol captured in `drafts/*.har`, and for the parts of GitHub REST and GraphQL APIs the benchmarks use. Listens on localhost in a background thread, keeps everything in memory."""
+
+import json
+import re
+import typing
+from collections.abc import Mapping
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlsplit
+
+thisDir = Path(__file__).parent
+draftsDir = thisDir.parent / "drafts"
+
+SOME_ID = "E4URfvsVX19r9dHrZIEEg4Trg62KRQ4tSS79OFlTb4URXLbOOm"
+SKIPPED_HEADERS = frozenset(("date", "connection", "content-length", "content-type", "location"))
+
+CACHE_RX = re.compile("^/[^/]+/_apis/artifactcache/(cache|caches(?:/(\\d+))?)$")
+ARCHIVE_RX = re.compile("^/archives/(\\d+)$")
+ARTIFACTS_RX = re.compile("^/[^/]+/_apis/pipelines/workflows/(\\d+)/artifacts$")
+CONTAINER_RX = re.compile("^/[^/]+/_apis/resources/Containers/(\\d+)$")
+OWNER_REPOS_RX = re.compile("^/(?:orgs|users)/([^/]+)/repos$")
+REPO_RX = re.compile("^/repos/([^/]+)/([^/]+)$")
+CONTENT_RANGE_RX = re.compile("^bytes (\\d+)-(\\d+)/(\\d+|\\*)$")
+RANGE_RX = re.compile("^bytes=(\\d+)-(\\d*)$")
+
+
+HAR_ID_PLACEHOLDER = "<some id of length 50>"
+HAR_CONTAINER_ID_PLACEHOLDER = "<containerId>"
+HAR_PIPELINES_BASE = "https://pipelines.actions.githubusercontent.com/"
+
+URL_FIELDS = ("archive", "assignees", "blobs", "branches", "collaborators", "comments", "commits", "compare", "contents", "contributors", "deployments", "downloads", "events", "forks", "git_commits", "git_refs", "git_tags", "hooks", "issue_comment", "issue_events", "issues", "keys", "labels", "languages", "merges", "milestones", "notifications", "pulls", "releases", "stargazers", "statuses", "subscribers", "subscription", "tags", "teams", "trees")
+OWNER_URL_FIELDS = ("avatar", "html", "followers", "following", "gists", "starred", "subscriptions", "organizations", "repos", "events", "received_events")
+REPO_NO_MARKER = 987654321
+REPO_ID_BASE = 100000000
+PER_PAGE = 30  # the default of GitHub
+GRAPHQL_PAGE_SIZE = 100
+
+
+def makeRepoInfo(i: int, owner: str = "someorg") -> dict:
+	"""Shaped like an item of `GET /orgs/{org}/repos` (~6 KiB of JSON)"""
+	name = "repo" + str(i)
+	base = "https://api.github.com/repos/" + owner + "/" + name
+	ownerInfo = {"login": owner, "id": 1, "node_id": "O_kgDOAAAAAQ", "gravatar_id": "", "url": "https://api.github.com/users/" + owner, "type": "Organization", "site_admin": False}
+	ownerInfo.update({k + "_url": "https://api.github.com/users/" + owner + "/" + k + "{/other_user}" for k in OWNER_URL_FIELDS})
+	res = {
+		"id": REPO_ID_BASE + i,
+		"node_id": "R_kgDOB" + str(i),
+		"name": name,
+		"full_name": owner + "/" + name,
+		"private": False,
+		"owner": ownerInfo,
+		"html_url": "https://github.com/" + owner + "/" + name,
+		"description": "Repository number " + str(i),
+		"fork": False,
+		"url": base,
+		"git_url": "git://github.com/" + owner + "/" + name + ".git",
+		"ssh_url": "git@github.com:" + owner + "/" + name + ".git",
+		"clone_url": "https://github.com/" + owner + "/" + name + ".git",
+		"svn_url": "https://github.com/" + owner + "/" + name,
+		"homepage": None,
+		"size": i % 10000,
+		"stargazers_count": i % 100,
+		"watchers_count": i % 100,
+		"language": "Python",
+		"has_issues": True,
+		"has_projects": True,
+		"has_downloads": True,
+		"has_wiki": True,
+		"has_pages": False,
+		"has_discussions": False,
+		"forks_count": i % 10,
+		"mirror_url": None,
+		"archived": False,
+		"disabled": False,
+		"open_issues_count": i % 7,
+		"license": {"key": "unlicense", "name": "The Unlicense", "spdx_id": "Unlicense", "url": "https://api.github.com/licenses/unlicense", "node_id": "MDc6TGljZW5zZTE1"},
+		"allow_forking": True,
+		"is_template": False,
+		"web_commit_signoff_required": False,
+		"topics": ["github", "python"],
+		"visibility": "public",
+		"forks": i % 10,
+		"open_issues": i % 7,
+		"watchers": i % 100,
+		"default_branch": "master",
+		"permissions": {"admin": False, "maintain": False, "push": False, "triage": False, "pull": True},
+		"created_at": "2020-01-01T00:00:00Z",
+		"updated_at": "2023-01-01T00:00:00Z",
+		"pushed_at": "2023-01-01T00:00:00Z",
+	}
+	res.update({k + "_url": base + "/" + k + "{/sha}" for k in URL_FIELDS})
+	return res
+
+
+class RepoListing:
+	"""Serializes pages of synthetic repos by substituting the numbers into a serialized template, so that the server doesn't dominate the measurements"""
+
+	__slots__ = ("owner", "count", "template", "idMarker")
+
+	def __init__(self, owner: str, count: int):
+		self.owner = owner
+		self.count = count
+		self.template = json.dumps(makeRepoInfo(REPO_NO_MARKER, owner))
+		self.idMarker = str(REPO_ID_BASE + REPO_NO_MARKER)
+
+	def item(self, i: int) -> str:
+		return self.template.replace(self.idMarker, str(REPO_ID_BASE + i)).replace(str(REPO_NO_MARKER), str(i))
+
+	def page(self, pageNo: int, perPage: int) -> bytes:
+		return ("[" + ",".join(self.item(i) for i in range((pageNo - 1) * perPage, min(pageNo * perPage, self.count))) + "]").encode("utf-8")
+
+	def lastPage(self, perPage: int) -> int:
+		return max(1, -(-self.count // perPage))
+
+
+class ArtifactContainer:
+	__slots__ = ("id", "name", "files", "size")
+
+	def __init__(self, iD: int, name: str):
+		self.id = iD
+		self.name = name
+		self.files = {}  # item path -> bytearray
+		self.size = None  # set on patching
+
+
+def loadHAR(name: str) -> list:
+	return json.loads((draftsDir / name).read_text())["log"]["entries"]
+
+
+def replayedHeaders(entry: dict) -> typing.List[typing.Tuple[str, str]]:
+	return [(h["name"], h["value"]) for h in entry["response"]["headers"] if h["name"].lower() not in SKIPPED_HEADERS]
+
+
+class CacheEntry:
+	__slots__ = ("id", "key", "version", "chunks", "size")
+
+	def __init__(self, iD: int, key: str, version: str):
+		self.id = iD
+		self.key = key
+		self.version = version
+		self.chunks = {}
+		self.size = None  # set on commit
+
+	def assemble(self) -> bytes:
+		res = bytearray()
+		for start in sorted(self.chunks):
+			if start != len(res):
+				raise ValueError("Gap in uploaded chunks", len(res), start)
+			res += self.chunks[start]
+		return bytes(res)
+
+
+class MockActionsServer:
+	__slots__ = ("server", "thread", "lock", "caches", "requests", "logRequests", "baseHeaders", "artifactEntries", "containers", "listings")
+
+	def __init__(self, logRequests: bool = True):
+		self.lock = Lock()
+		self.caches = []
+		self.requests = []
+		self.logRequests = logRequests
+		self.baseHeaders = replayedHeaders(loadHAR("download_cache.har")[0])
+		self.artifactEntries = loadHAR("upload_artifact_dump.har")  # create container, put file, patch artifact
+		self.containers = []
+		self.listings = {}
+		self.server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+		self.server.mock = self
+		self.server.daemon_threads = True
+		self.thread = None
+
+	@property
+	def url(self) -> str:
+		host, port = self.server.server_address[:2]
+		return "http://" + host + ":" + str(port)
+
+	def env(self, base: typing.Optional[dict] = None) -> dict:
+		"""`base` env (a minimal one if it is not given) with the services and the API pointed to this server"""
+		if base is None:
+			base = {"GITHUB": {"RUN_ID": "1", "RETENTION_DAYS": "90"}, "ACTIONS": {"RUNTIME_TOKEN": "token"}}
+		res = {k: (dict(v) if isinstance(v, Mapping) else v) for k, v in base.items()}
+		res["ACTIONS"]["CACHE_URL"] = self.url + "/" + SOME_ID + "/"
+		res["ACTIONS"]["RUNTIME_URL"] = self.url + "/" + SOME_ID + "/"
+		res["GITHUB"]["API_URL"] = self.url
+		return res
+
+	def setRepos(self, owner: str, count: int):
+		"""`owner` gets `count` synthetic repos, both in REST and GraphQL"""
+		with self.lock:
+			self.listings[owner] = RepoListing(owner, count)
+
+	def harResponse(self, index: int, containerId: int) -> dict:
+		"""The body of the response of the upload HAR entry with the placeholders substituted"""
+		text = self.artifactEntries[index]["response"]["content"]["text"]
+		text = text.replace(HAR_PIPELINES_BASE + HAR_ID_PLACEHOLDER + "/", self.url + "/" + SOME_ID + "/").replace(HAR_CONTAINER_ID_PLACEHOLDER, str(containerId))
+		return json.loads(text)
+
+	def __enter__(self):
+		self.thread = Thread(target=self.server.serve_forever, daemon=True)
+		self.thread.start()
+		return self
+
+	def __exit__(self, *args, **kwargs):
+		self.server.shutdown()
+		self.server.server_close()
+		self.thread.join()
+
+	def committedCaches(self) -> typing.List[CacheEntry]:
+		return [c for c in self.caches if c.size is not None]
+
+	def lookup(self, keys: typing.List[str], version: str) -> typing.Optional[CacheEntry]:
+		"""The first key is matched exactly, the rest ones (restore keys) by prefix, the newest entry wins"""
+		candidates = [c for c in reversed(self.committedCaches()) if c.version == version]
+		for i, key in enumerate(keys):
+			for c in candidates:
+				if c.key == key or (i and c.key.startswith(key)):
+					return c
+		return None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+	disable_nagle_algorithm = True  # headers and body are written separately, Nagle with delayed ACKs would add 40 ms to each response
+
+	def log_message(self, *args, **kwargs):
+		pass
+
+	@property
+	def mock(self) -> MockActionsServer:
+		return self.server.mock
+
+	def readBody(self) -> bytes:
+		return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+	def respond(self, status: int, body: typing.Union[bytes, dict, None] = None, headers: typing.Iterable[typing.Tuple[str, str]] = ()):
+		if isinstance(body, dict):
+			body = json.dumps(body).encode("utf-8")
+			headers = list(headers) + [("Content-Type", "application/json; charset=utf-8")]
+		elif body is None:
+			body = b""
+
+		self.send_response(status)
+		for k, v in self.mock.baseHeaders:
+			self.send_header(k, v)
+		for k, v in headers:
+			self.send_header(k, v)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def dispatch(self, method: str):
+		body = self.readBody()
+		u = urlsplit(self.path)
+		if self.mock.logRequests:
+			with self.mock.lock:
+				self.mock.requests.append((method, self.path, dict(self.headers), len(body)))
+
+		m = CACHE_RX.match(u.path)
+		if m:
+			return self.cacheEndpoint(method, m.group(1), m.group(2), parse_qs(u.query), body)
+
+		m = ARCHIVE_RX.match(u.path)
+		if m and method == "GET":
+			return self.archive(int(m.group(1)))
+
+		query = parse_qs(u.query)
+		m = ARTIFACTS_RX.match(u.path)
+		if m:
+			return self.artifacts(method, query, body)
+
+		m = CONTAINER_RX.match(u.path)
+		if m and method == "PUT":
+			return self.containerItem(int(m.group(1)), query["itemPath"][0], body)
+
+		m = OWNER_REPOS_RX.match(u.path)
+		if m and method in ("GET", "HEAD"):
+			return self.ownerRepos(method, m.group(1), query)
+
+		m = REPO_RX.match(u.path)
+		if m and method == "GET":
+			return self.respond(200, makeRepoInfo(int(m.group(2)[4:]) if m.group(2)[4:].isdigit() else 0, m.group(1)))
+
+		if u.path == "/graphql" and method == "POST":
+			return self.graphql(json.loads(body))
+
+		self.respond(404)
+
+	def artifacts(self, method: str, query: dict, body: bytes):
+		mock = self.mock
+		if method == "POST":
+			req = json.loads(body)
+			with mock.lock:
+				c = ArtifactContainer(len(mock.containers) + 1, req["Name"])
+				mock.containers.append(c)
+			return self.respond(201, mock.harResponse(0, c.id))
+
+		if method == "PATCH":
+			name = query["artifactName"][0]
+			with mock.lock:
+				c = next((c for c in mock.containers if c.name == name), None)
+				if c is None:
+					return self.respond(404)
+				c.size = sum(len(f) for f in c.files.values())
+			res = mock.harResponse(2, c.id)
+			res["size"] = c.size
+			return self.respond(200, res)
+
+		self.respond(405)
+
+	def containerItem(self, containerId: int, itemPath: str, body: bytes):
+		m = CONTENT_RANGE_RX.match(self.headers.get("Content-Range", ""))
+		if m is None or (body and int(m.group(2)) - int(m.group(1)) + 1 != len(body)):
+			return self.respond(400)
+
+		with self.mock.lock:
+			f = self.mock.containers[containerId - 1].files.setdefault(itemPath, bytearray())
+			start = int(m.group(1))
+			if start > len(f):
+				return self.respond(400)
+			f[start : start + len(body)] = body
+			size = len(f)
+
+		res = self.mock.harResponse(1, containerId)
+		res["path"] = itemPath
+		res["fileLength"] = size
+		self.respond(201, res)
+
+	def ownerRepos(self, method: str, owner: str, query: dict):
+		with self.mock.lock:
+			listing = self.mock.listings.get(owner)
+		if listing is None:
+			return self.respond(404)
+
+		perPage = int(query.get("per_page", (PER_PAGE,))[0])
+		pageNo = int(query.get("page", ("1",))[0])
+		lastPage = listing.lastPage(perPage)
+		base = self.mock.url + self.path.split("?", 1)[0] + "?per_page=" + str(perPage) + "&page="
+		links = ['<' + base + str(lastPage) + '>; rel="last"']
+		if pageNo < lastPage:
+			links.append('<' + base + str(pageNo + 1) + '>; rel="next"')
+		hdrz = [("Link", ", ".join(links)), ("Content-Type", "application/json; charset=utf-8")]
+		self.respond(200, b"" if method == "HEAD" else listing.page(pageNo, perPage), hdrz)
+
+	def graphql(self, req: dict):
+		"""Serves `organization(login: $login) {repositories(after: $cursor)}` connections, the rest of queries get `viewer`"""
+		variables = req.get("variables") or {}
+		rateLimit = {"cost": 1, "limit": 5000, "remaining": 4999, "used": 1, "resetAt": "2030-01-01T00:00:00Z"}
+		if "repositories" not in req["query"]:
+			return self.respond(200, {"data": {"viewer": {"login": "mock"}, "rateLimit": rateLimit}})
+
+		with self.mock.lock:
+			listing = self.mock.listings.get(variables.get("login"))
+		if listing is None:
+			return self.respond(200, {"data": {"organization": None}, "errors": [{"type": "NOT_FOUND", "path": ["organization"]}]})
+
+		start = int(variables["cursor"]) if variables.get("cursor") else 0
+		stop = min(start + GRAPHQL_PAGE_SIZE, listing.count)
+		nodes = [{"id": "R_kgDOB" + str(i), "databaseId": REPO_ID_BASE + i, "name": "repo" + str(i)} for i in range(start, stop)]
+		connection = {"nodes": nodes, "pageInfo": {"endCursor": str(stop), "hasNextPage": stop < listing.count}}
+		self.respond(200, {"data": {"organization": {"repositories": connection}, "rateLimit": rateLimit}})
+
+	def cacheEndpoint(self, method: str, endpoint: str, cacheId: typing.Optional[str], query: dict, body: bytes):
+		mock = self.mock
+		if endpoint == "cache" and method == "GET":
+			with mock.lock:
+				c = mock.lookup(query["keys"][0].split(","), query["version"][0])
+			if c is None:
+				return self.respond(204)
+			return self.respond(200, {"scope": "refs/heads/master", "cacheKey": c.key, "cacheVersion": c.version, "creationTime": "2021-10-11T16:56:52Z", "archiveLocation": mock.url + "/archives/" + str(c.id)})
+
+		if cacheId is None:
+			if method != "POST":
+				return self.respond(405)
+			req = json.loads(body)
+			with mock.lock:
+				if any(c.key == req["key"] and c.version == req["version"] for c in mock.caches):
+					return self.respond(409, {"message": "Cache already exists."})
+				c = CacheEntry(len(mock.caches) + 1, req["key"], req["version"])
+				mock.caches.append(c)
+			return self.respond(201, {"cacheId": c.id})
+
+		with mock.lock:
+			c = mock.caches[int(cacheId) - 1]
+
+		if method == "PATCH":
+			m = CONTENT_RANGE_RX.match(self.headers.get("Content-Range", ""))
+			if m is None or int(m.group(2)) - int(m.group(1)) + 1 != len(body) or c.size is not None:
+				return self.respond(400)
+			with mock.lock:
+				c.chunks[int(m.group(1))] = body
+			return self.respond(204)
+
+		if method == "POST":
+			size = json.loads(body)["size"]
+			with mock.lock:
+				if len(c.assemble()) != size:
+					return self.respond(400, {"message": "Size mismatch."})
+				c.size = size
+			return self.respond(204)
+
+		self.respond(405)
+
+	def archive(self, cacheId: int):
+		with self.mock.lock:
+			data = self.mock.caches[cacheId - 1].assemble()
+
+		m = RANGE_RX.match(self.headers.get("Range", ""))
+		if m is None:
+			return self.respond(200, data, [("Accept-Ranges", "bytes")])
+
+		start = int(m.group(1))
+		stop = int(m.group(2)) + 1 if m.group(2) else len(data)
+		stop = min(stop, len(data))
+		if start >= len(data):
+			return self.respond(416, None, [("Content-Range", "bytes */" + str(len(data)))])
+		self.respond(206, data[start:stop], [("Content-Range", "bytes " + str(start) + "-" + str(stop - 1) + "/" + str(len(data))), ("Accept-Ranges", "bytes")])
+
+	def do_GET(self):
+		self.dispatch("GET")
+
+	def do_POST(self):
+		self.dispatch("POST")
+
+	def do_PATCH(self):
+		self.dispatch("PATCH")
+
+	def do_PUT(self):
+		self.dispatch("PUT")
+
+	def do_HEAD(self):
+		self.dispatch("HEAD")
@@ -1,11 +1,28 @@
 #!/usr/bin/env python3
 import sys
-from pathlib import Path
+from pathlib import Path, PurePath
 import unittest
 from unittest.mock import patch, Mock
 import itertools
+import asyncio
 import secrets
+import time
+import tempfile
+import gzip
+import tarfile
+import io
+import zipfile
+import re
+import json
+import gc
+import os
+import subprocess
+import typing
+from datetime import datetime
 from functools import partial
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
 
 try:
 	thisDir = Path(__file__).parent
@@ -20,8 +37,26 @@ from collections import OrderedDict
 
 dict = OrderedDict
 
-from miniGHAPI.GHActionsEnv import getGHEnv
-from miniGHAPI.undocumented import PipelinesAPIRoot
+import httpx
+
+from miniGHAPI.GHActionsEnv import GHEnv, GHEvent, getEvent, getGHEnv, getGHEvent
+from miniGHAPI.GitHubAPI import COMPACT_INFO_PROJECTIONS, GHAPI, Repository, User
+from miniGHAPI.CompactInfo import CompactInfoPolicy, InfoRecord
+from miniGHAPI.IdentityMap import IdentityMap
+from miniGHAPI.IssueMirror import IssueMirror
+from miniGHAPI.Instrumentation import EndpointStats, urlTemplate
+from miniGHAPI.JSONCodec import CODECS, StdlibJSONCodec, getCodec
+from miniGHAPI import AsyncAPI
+from miniGHAPI.ResponseCache import DiskResponseCache, MemoryResponseCache
+from miniGHAPI.RateLimit import RateLimitScheduler, graphQLCost
+from miniGHAPI.Retry import RetryPolicy
+from miniGHAPI.undocumented import ArtifactCacheAPIRoot, PipelinesAPIRoot
+from miniGHAPI.CacheArchive import getCacheVersion
+from miniGHAPI.Download import iterZipMembers
+from miniGHAPI.Batch import resolveBatch
+from miniGHAPI.idConvert import decodeNodeID, decodeNodeIDs, encodeNodeID, encodeNodeIDs
+
+from mockServer import MockActionsServer
 
 mockedFilesDir = thisDir / "mockedFiles"
 
@@ -70,6 +105,10 @@ simulatedEnv = getGHEnv()
 if "GITHUB" not in simulatedEnv or "RUN_ID" not in simulatedEnv["GITHUB"]:
 	simulatedEnv = envMock
 
+def mockedClient(handler):
+	return httpx.Client(transport=httpx.MockTransport(handler))
+
+
 class Tests(unittest.TestCase):
 	@patch("miniGHAPI.GHActionsEnv.getGHEnv", return_value=simulatedEnv)
 	def testUploadArtifact(self, getGHEnv):
@@ -79,5 +118,1304 @@ class Tests(unittest.TestCase):
 			u["crap"] = secrets.token_bytes(8)
 
 
+class ClientTests(unittest.TestCase):
+	def testTimeout(self):
+		with GHAPI("token", timeout=3) as api:
+			self.assertEqual(api.client.timeout, httpx.Timeout(3))
+		with GHAPI("token") as api:
+			self.assertEqual(api.client.timeout, httpx.Timeout(None))
+
+	def testClientSharedByChildren(self):
+		seen = []
+
+		def handler(req):
+			seen.append(req.url.path)
+			return httpx.Response(200, json={"id": 1, "name": "b"})
+
+		with GHAPI("token", client=mockedClient(handler)) as api:
+			repo = api.repo("a", "b")
+			self.assertIs(repo.root.client, api.client)
+			repo.getInfo()
+			repo.getInfo(fresh=True)
+		self.assertEqual(seen, ["/repos/a/b", "/repos/a/b"])
+		self.assertFalse(api.client.is_closed)
+
+	def testOwnClientIsClosed(self):
+		with GHAPI("token") as api:
+			pass
+		self.assertTrue(api.client.is_closed)
+
+
+def paginatedHandler(pagesCount, seen):
+	def handler(req):
+		page = int(req.url.params.get("page", 1))
+		seen.append((req.method, page))
+		links = ['<https://api.github.com/x?page=' + str(pagesCount) + '>; rel="last"']
+		if page < pagesCount:
+			links.append('<https://api.github.com/x?page=' + str(page + 1) + '>; rel="next"')
+		return httpx.Response(200, headers={"Link": ", ".join(links)}, json=[page])
+
+	return handler
+
+
+def noLastLinkHandler(pagesCount, seen):
+	def handler(req):
+		page = int(req.url.params.get("page", 1))
+		seen.append((req.method, page))
+		hdrz = {"Link": '<https://api.github.com/x?page=' + str(page + 1) + '>; rel="next"'} if page < pagesCount else {}
+		return httpx.Response(200, headers=hdrz, json=[page])
+
+	return handler
+
+
+class PaginationTests(unittest.TestCase):
+	def testParallelPagesAreOrdered(self):
+		seen = []
+		api = GHAPI("token", client=mockedClient(paginatedHandler(7, seen)), paginationWorkers=3)
+		pages = [r.json()[0] for r in api.req("x", method="GET", pagination=slice(None, None))]
+		self.assertEqual(pages, list(range(1, 8)))
+		self.assertEqual(sorted(seen), [("GET", i) for i in range(1, 8)])
+
+	def testNegativeSliceStartsFromTheEnd(self):
+		seen = []
+		api = GHAPI("token", client=mockedClient(paginatedHandler(7, seen)))
+		pages = [r.json()[0] for r in api.req("x", method="GET", pagination=slice(-1, -3))]
+		self.assertEqual(pages, [7, 6])
+		self.assertEqual(seen, [("HEAD", 1), ("GET", 7), ("GET", 6)])
+
+
+	def testNegativeSliceWithoutLastLink(self):
+		seen = []
+		api = GHAPI("token", client=mockedClient(noLastLinkHandler(4, seen)))
+		pages = [r.json()[0] for r in api.req("x", method="GET", pagination=slice(-1, -3))]
+		self.assertEqual(pages, [4, 3])
+		self.assertEqual(seen, [("HEAD", 1), ("GET", 1), ("GET", 2), ("GET", 3), ("GET", 4)])
+
+
+def reposHandler(pagesCount, seen):
+	def handler(req):
+		page = int(req.url.params.get("page", 1))
+		seen.append(page)
+		hdrz = {"Link": '<https://api.github.com/x?page=' + str(page + 1) + '>; rel="next"'} if page < pagesCount else {}
+		return httpx.Response(200, headers=hdrz, json=[{"name": "r" + str(page) + "_" + str(i), "id": page * 1000 + i, "owner": {"login": "o"}} for i in range(3)])
+
+	return handler
+
+
+class LazyListingTests(unittest.TestCase):
+	def testEarlyTermination(self):
+		seen = []
+		org = GHAPI("token", client=mockedClient(reposHandler(10, seen))).org("o")
+		found = next(r for r in org.iterRepos() if r.dbID == 2001)
+		self.assertEqual(found.repo, "r2_1")
+		self.assertEqual(seen, [1, 2])
+		self.assertIsNone(org.repos)
+
+	def testPopulatesWhenExhausted(self):
+		seen = []
+		org = GHAPI("token", client=mockedClient(reposHandler(3, seen))).org("o")
+		self.assertEqual(len(list(org.iterRepos(populate=False))), 9)
+		self.assertIsNone(org.repos)
+		self.assertEqual(len(list(org.iterRepos())), 9)
+		self.assertEqual(sorted(org.repos)[:2], ["r1_0", "r1_1"])
+		self.assertIs(org.getRepos(), org.repos)
+		self.assertEqual(len(seen), 6)
+
+
+def repoInfoHandler(seen):
+	def handler(req):
+		seen.append(req.url.path)
+		info = {"name": "r1_0", "id": 1000, "owner": {"login": "o", "id": 7}}
+		if req.url.path.endswith("/repos"):
+			return httpx.Response(200, json=[info])
+		return httpx.Response(200, json=info)
+
+	return handler
+
+
+class IdentityMapTests(unittest.TestCase):
+	def testSameInstanceFromAllPaths(self):
+		seen = []
+		api = GHAPI("token", client=mockedClient(repoInfoHandler(seen)))
+		org = api.org("o")
+		listed = org.getRepos()["r1_0"]
+		self.assertIs(api.repo("O", "r1_0"), listed)
+		self.assertIs(api.user("o").repo("r1_0"), listed)
+		self.assertIs(listed.ownerObj(cls=type(org)), org)
+		self.assertIs(listed.issue(5), api.repo("o", "r1_0").issue(5))
+		self.assertEqual(listed.getInfo()["id"], 1000)
+		self.assertEqual(seen, ["/orgs/o/repos"])
+
+	def testFoundByDBID(self):
+		api = GHAPI("token", client=mockedClient(repoInfoHandler([])))
+		renamed = api.repo("o", "old")
+		renamed.dbID = 1000
+		self.assertIs(api.org("o")._repoFromInfo({"name": "new", "id": 1000, "owner": {"login": "o"}}), renamed)
+		self.assertIs(api.repo("o", "new"), renamed)
+
+	def testTTL(self):
+		seen = []
+		api = GHAPI("token", client=mockedClient(repoInfoHandler(seen)), identityMap=IdentityMap({Repository: 60}))
+		repo = api.repo("o", "r1_0")
+		repo.getInfo()
+		repo.getInfo()
+		self.assertEqual(len(seen), 1)
+		repo._infoAt -= 61
+		repo.getInfo()
+		self.assertEqual(len(seen), 2)
+		org = api.org("o")
+		org.getInfo()
+		org._infoAt -= 3600
+		org.getInfo()  # no TTL for orgs
+		self.assertEqual(len(seen), 3)
+
+	def testWeak(self):
+		api = GHAPI("token", client=mockedClient(repoInfoHandler([])))
+		api.repo("o", "r")
+		gc.collect()
+		self.assertEqual(len(api.identityMap), 0)
+
+
+class CompactGraphTests(unittest.TestCase):
+	def testLazyChildren(self):
+		api = GHAPI("token", client=mockedClient(repoInfoHandler([])))
+		repo = api.repo("o", "r")
+		with self.assertRaises(AttributeError):
+			repo._actions
+		actions = repo.actions
+		self.assertIs(repo.actions, actions)
+		self.assertIs(actions.artifacts, actions.artifacts)
+		self.assertEqual(actions.workflows.uri(), "https://api.github.com/repos/o/r/actions/workflows/")
+		user = api.user("u")
+		self.assertIs(user.keys.ssh.parent, user)
+
+	def testCompactInfo(self):
+		seen = []
+		api = GHAPI("token", client=mockedClient(repoInfoHandler(seen)), compactInfo=CompactInfoPolicy(COMPACT_INFO_PROJECTIONS))
+		repo = api.org("o").getRepos()["r1_0"]
+		self.assertIsInstance(repo.info, InfoRecord)
+		self.assertEqual(repo.info["owner"]["login"], "o")
+		self.assertNotIn("default_branch", repo.info)
+		self.assertEqual(repo.info.toDict(), {"id": 1000, "name": "r1_0", "owner": {"login": "o", "id": 7}})
+		owner = repo.ownerObj(cls=User)
+		self.assertEqual(owner.dbID, 7)
+		self.assertEqual(dict(owner.info), {"login": "o", "id": 7})
+		self.assertEqual(len(seen), 1)
+
+
+class JSONCodecTests(unittest.TestCase):
+	def availableCodecs(self):
+		for name in CODECS:
+			try:
+				yield getCodec(name)
+			except ImportError:
+				pass
+
+	def testCodecs(self):
+		doc = [{"id": 1, "name": "é/", "owner": {"login": "o", "id": 2, "url": "u"}, "extra": [1, {"a": None}]}, {"id": 2, "owner": None}]
+		projection = ("id", "name", ("owner", ("login", "id")))
+		for codec in self.availableCodecs():
+			with self.subTest(codec=codec):
+				data = codec.dumps(doc)
+				self.assertIsInstance(data, bytes)
+				self.assertEqual(json.loads(data), doc)
+				self.assertEqual(codec.loads(data), doc)
+				self.assertEqual(codec.loads(bytearray(data)), doc)
+				records = codec.loadRecords(data, projection)
+				self.assertEqual([r.toDict() for r in records], [{"id": 1, "name": "é/", "owner": {"login": "o", "id": 2}}, {"id": 2, "owner": None}])
+		with self.assertRaises(ImportError):
+			getCodec("nonexistent")
+
+	def testRootUsesCodec(self):
+		calls = []
+
+		class RecordingCodec(StdlibJSONCodec):
+			__slots__ = ()
+
+			def loads(self, data):
+				calls.append(("loads", type(data)))
+				return super().loads(data)
+
+			def dumps(self, obj):
+				calls.append(("dumps", None))
+				return super().dumps(obj)
+
+		bodies = []
+
+		def handler(req):
+			bodies.append(req.content)
+			if req.url.path == "/graphql":
+				return httpx.Response(200, json={"data": {"viewer": {"login": "u"}}})
+			return httpx.Response(200, json={"id": 5})
+
+		api = GHAPI("token", client=mockedClient(handler), jsonCodec=RecordingCodec())
+		self.assertEqual(api.repo("o", "r").req("check-runs", {"name": "x"}).status_code, 200)
+		self.assertEqual(api.gqlReq("query {viewer {login}}")["data"]["viewer"]["login"], "u")
+		self.assertEqual(api.repo("o", "r").getInfo()["id"], 5)
+		self.assertEqual(bodies[0], b'{"name":"x"}')
+		self.assertEqual(json.loads(bodies[1]), {"query": "query {viewer {login}}", "variables": {}})
+		self.assertEqual(calls, [("dumps", None), ("dumps", None), ("loads", bytes), ("loads", bytes)])
+
+	def testPathsAndRecordsOfEqualTuples(self):
+		for codec in self.availableCodecs():
+			with self.subTest(codec=codec):
+				self.assertEqual(codec.loadPath(b'{"id": {"name": 1}}', ("id", "name")), 1)
+				self.assertEqual([r.toDict() for r in codec.loadRecords(b'[{"id": 1, "name": "a"}]', ("id", "name"))], [{"id": 1, "name": "a"}])
+				self.assertEqual(codec.loadPath(b'{"id": {"name": 2}}', ("id", "name")), 2)
+
+	def testListingsWithEachCodec(self):
+		for codec in self.availableCodecs():
+			with self.subTest(codec=codec):
+				api = GHAPI("token", client=mockedClient(repoInfoHandler([])), compactInfo=CompactInfoPolicy(COMPACT_INFO_PROJECTIONS), jsonCodec=codec)
+				repos = api.org("o").getRepos()
+				self.assertEqual(repos["r1_0"].info.toDict(), {"id": 1000, "name": "r1_0", "owner": {"login": "o", "id": 7}})
+				self.assertIs(api.repo("o", "r1_0"), repos["r1_0"])
+
+	def testEvent(self):
+		event = {"action": "opened", "issue": {"number": 1, "title": "т"}}
+		with tempfile.TemporaryDirectory() as d:
+			p = Path(d) / "event.json"
+			p.write_text(json.dumps(event, ensure_ascii=False), encoding="utf-8")
+			for codec in self.availableCodecs():
+				with self.subTest(codec=codec):
+					self.assertEqual(GHEvent(p, codec).payload, event)
+
+
+class GHEnvTests(unittest.TestCase):
+	ENVIRON = {"GITHUB_REPOSITORY": "o/r", "GITHUB_WORKSPACE": "/w", "GITHUB_EVENT_PATH": "/e.json", "ACTIONS_RUNTIME_TOKEN": "t", "HOME": "/h", "PATH": "/bin"}
+	EVENT = {"action": "synchronize", "pull_request": {"head": {"sha": "abc", "repo": None}, "labels": [{"name": "a"}, {"name": "b"}]}, "commits": [{"id": str(i), "message": "m" * 100} for i in range(300)], "sender": "u"}
+
+	def testLazySections(self):
+		with patch.dict("os.environ", self.ENVIRON, clear=True):
+			env = GHEnv()
+			g = env["GITHUB"]
+			self.assertEqual(g.values, {})
+			self.assertEqual(g["WORKSPACE"], Path("/w"))
+			self.assertEqual(g["EVENT_PATH"], Path("/e.json"))
+			self.assertEqual(g["REPOSITORY"], "o/r")
+			self.assertIs(g["WORKSPACE"], g["WORKSPACE"])
+			self.assertIsNone(g.names)
+			self.assertEqual(sorted(g), ["EVENT_PATH", "REPOSITORY", "WORKSPACE"])
+			self.assertEqual(env["HOME"], "/h")
+			self.assertEqual(list(env), ["GITHUB", "ACTIONS", "INPUT", "HOME"])
+			self.assertNotIn("RUN_ID", g)
+			self.assertEqual(env["ACTIONS"].get("CACHE_URL", None), None)
+			with self.assertRaises(KeyError):
+				env["PATH"]
+			self.assertIs(getGHEnv(), getGHEnv())
+
+	def testModifiable(self):
+		with patch.dict("os.environ", self.ENVIRON, clear=True):
+			env = GHEnv()
+			g = env["GITHUB"]
+			g["RUN_ID"] = "5"
+			g["WORKSPACE"] = Path("/other")
+			del g["REPOSITORY"]
+			self.assertEqual(dict(g), {"WORKSPACE": Path("/other"), "EVENT_PATH": Path("/e.json"), "RUN_ID": "5"})
+			with self.assertRaises(KeyError):
+				g["REPOSITORY"]
+			env["HOME"] = "/h2"
+			env["GITHUB"] = {"API_URL": "https://example.com"}
+			self.assertEqual(env["HOME"], "/h2")
+			self.assertEqual(list(env), ["GITHUB", "ACTIONS", "INPUT", "HOME"])
+			self.assertEqual(os.environ["GITHUB_REPOSITORY"], "o/r")
+
+	def testSharedIsReadOnly(self):
+		with patch.dict("os.environ", self.ENVIRON, clear=True):
+			shared = getGHEnv(fresh=True)
+			self.assertEqual(shared["GITHUB"]["REPOSITORY"], "o/r")
+			with self.assertRaises(TypeError):
+				shared["GITHUB"]["REPOSITORY"] = "x/y"
+			with self.assertRaises(TypeError):
+				shared["HOME"] = "/h2"
+			own = shared.copy()
+			own["GITHUB"]["REPOSITORY"] = "x/y"
+			own["HOME"] = "/h2"
+			self.assertEqual(own["GITHUB"]["WORKSPACE"], Path("/w"))
+			self.assertEqual((shared["GITHUB"]["REPOSITORY"], shared["HOME"]), ("o/r", "/h"))
+			self.assertIs(getGHEnv(), shared)
+
+	def writeEvent(self, d):
+		p = Path(d) / "event.json"
+		p.write_text(json.dumps(self.EVENT), encoding="utf-8")
+		return p
+
+	def testPaths(self):
+		with tempfile.TemporaryDirectory() as d:
+			p = self.writeEvent(d)
+			for name in CODECS:
+				try:
+					codec = getCodec(name)
+				except ImportError:
+					continue
+				with self.subTest(codec=name):
+					e = GHEvent(p, codec)
+					self.assertEqual(e.get("pull_request.head.sha"), "abc")
+					self.assertEqual(e.get(("pull_request", "labels", 1, "name")), "b")
+					self.assertEqual(e.get("commits.299.id"), "299")
+					self.assertIsNone(e.get("pull_request.head.repo", 1))
+					self.assertEqual(e.get("pull_request.labels.5.name", 1), 1)
+					self.assertEqual(e.get("pull_request.head.repo.name", 1), 1)
+					self.assertEqual(e.get("sender.login", 1), 1)
+					self.assertEqual(e.get("missing", 1), 1)
+					with self.assertRaises(KeyError):
+						e["missing"]
+					self.assertIsNone(e._payload)
+					self.assertEqual(e.payload, self.EVENT)
+					self.assertEqual(e.get("commits.1.id"), "1")
+
+	def testSharedAcrossRoots(self):
+		with tempfile.TemporaryDirectory() as d:
+			p = self.writeEvent(d)
+			env = {"GITHUB": {"EVENT_PATH": p, "API_URL": "https://example.com"}}
+			a = GHAPI("token", client=mockedClient(None), env=env)
+			b = GHAPI("token", client=mockedClient(None), env=dict(env))
+			self.assertIs(a.event, b.event)
+			self.assertIs(a.event, getGHEvent(env))
+			self.assertEqual(a.event["pull_request.head.sha"], "abc")
+			self.assertIs(getEvent(env), b.event.payload)
+
+			other = StdlibJSONCodec()
+			self.assertIsNot(getGHEvent(env, other), a.event)
+			self.assertIs(getGHEvent(env, other).codec, other)
+			e = getGHEvent(env)
+			getGHEnv(fresh=True)
+			self.assertIsNot(getGHEvent(env), e)
+
+
+class FakeIssues:
+	"""A repo `o/r` with the issues, the comments and the events in memory, served like GitHub does: filtered by `since`, sorted, paginated"""
+
+	PER_PAGE = 2
+
+	def __init__(self):
+		self.clock = 0
+		self.issues = {}
+		self.comments = {}
+		self.events = []
+		self.labels = [{"name": "bug"}, {"name": "feature"}]
+		self.seen = []
+
+	def tick(self) -> str:
+		self.clock += 1
+		return "2024-01-01T00:00:" + str(self.clock).zfill(2) + "Z"
+
+	def putIssue(self, no: int, state: str = "open", labels=(), pull: bool = False):
+		t = self.tick()
+		issue = {"number": no, "id": 100 + no, "title": "i" + str(no), "state": state, "user": {"login": "u"}, "labels": [{"name": l} for l in labels], "created_at": t, "updated_at": t, "closed_at": None}
+		if pull:
+			issue["pull_request"] = {}
+		self.issues[no] = issue
+
+	def putComment(self, iD: int, no: int, body: str):
+		t = self.tick()
+		self.comments[iD] = {"id": iD, "issue_url": "https://api.github.com/repos/o/r/issues/" + str(no), "user": {"login": "u"}, "body": body, "created_at": t, "updated_at": t}
+		self.issues[no]["updated_at"] = t
+
+	def putEvent(self, no: int, event: str):
+		self.events.append({"id": len(self.events) + 1, "event": event, "actor": {"login": "u"}, "issue": {"number": no}, "created_at": self.tick()})
+
+	def page(self, req, items):
+		page = int(req.url.params.get("page", 1))
+		hdrz = {"Link": '<https://api.github.com/x?page=' + str(page + 1) + '>; rel="next"'} if page * self.PER_PAGE < len(items) else {}
+		return httpx.Response(200, headers=hdrz, json=items[(page - 1) * self.PER_PAGE:page * self.PER_PAGE])
+
+	def __call__(self, req):
+		path = req.url.path[len("/repos/o/r/"):]
+		params = req.url.params
+		self.seen.append((req.method, path, params.get("since"), int(params.get("page", 0))))
+		since = params.get("since", "")
+		if path == "issues":
+			return self.page(req, sorted((el for el in self.issues.values() if el["updated_at"] >= since), key=lambda el: el["updated_at"]))
+		if path == "issues/comments":
+			return self.page(req, sorted((el for el in self.comments.values() if el["updated_at"] >= since), key=lambda el: el["updated_at"]))
+		if path == "issues/events":
+			return self.page(req, self.events[::-1])
+		if path == "labels":
+			return self.page(req, self.labels)
+		no = int(path.split("/")[1])
+		if path.endswith("/comments"):
+			return self.page(req, [el for el in self.comments.values() if el["issue_url"].endswith("/" + str(no))])
+		if path.endswith("/events"):
+			return self.page(req, [el for el in self.events if el["issue"]["number"] == no])
+		return httpx.Response(200, json=self.issues[no])
+
+
+class IssueMirrorTests(unittest.TestCase):
+	def setUp(self):
+		self.gh = FakeIssues()
+		for no in range(1, 6):
+			self.gh.putIssue(no, labels=("bug",) if no % 2 else ())
+		self.gh.putIssue(6, pull=True)
+		self.gh.putComment(1, 1, "first")
+		self.gh.putEvent(1, "labeled")
+		self.repo = GHAPI("token", client=mockedClient(self.gh)).repo("o", "r")
+
+	def testListings(self):
+		self.assertEqual([el["number"] for el in self.repo.getIssues(sort="updated", direction="asc")], [2, 3, 4, 5, 6, 1])
+		self.assertEqual([el["number"] for el in self.repo.getIssues(since=datetime(2024, 1, 1, 0, 0, 6))], [6, 1])
+		self.assertEqual(self.gh.seen[-1], ("GET", "issues", "2024-01-01T00:00:06Z", 1))
+		self.assertEqual(len(self.repo.getIssues(pagination=slice(1, 2))), 2)
+		self.assertEqual([el["event"] for el in self.repo.issue(1).getEvents()], ["labeled"])
+		self.assertEqual(self.gh.seen[-1][0], "GET")
+
+	def testIncrementalSync(self):
+		with IssueMirror(self.repo) as m:
+			stats = m.sync()
+			self.assertEqual((stats.labels, stats.issues, stats.comments, stats.events), (2, 6, 1, 1))
+			self.assertEqual([el["number"] for el in m.issues()], [1, 2, 3, 4, 5])
+			self.assertEqual([el["number"] for el in m.issues(label="bug")], [1, 3, 5])
+			self.assertEqual([el["number"] for el in m.issues(pulls=True)], [6])
+			self.assertEqual([el["body"] for el in m.comments(1)], ["first"])
+			self.assertEqual([el["event"] for el in m.events(1)], ["labeled"])
+			self.assertEqual([el["name"] for el in m.labels()], ["bug", "feature"])
+
+			del self.gh.seen[:]
+			self.gh.putComment(2, 3, "second")
+			self.gh.putIssue(4, state="closed")
+			self.gh.putEvent(4, "closed")
+			stats = m.sync(labels=False)
+			self.assertEqual((stats.issues, stats.comments, stats.events), (3, 2, 1))  # the items at the watermark are refetched
+			self.assertEqual(self.gh.seen, [("GET", "issues", "2024-01-01T00:00:07Z", 1), ("GET", "issues", "2024-01-01T00:00:07Z", 2), ("GET", "issues/comments", "2024-01-01T00:00:07Z", 1), ("GET", "issues/events", None, 1)])
+			self.assertEqual([el["number"] for el in m.issues(state="closed")], [4])
+			self.assertEqual([el["body"] for el in m.comments(3)], ["second"])
+			self.assertEqual([el["event"] for el in m.events(4)], ["closed"])
+
+			del self.gh.seen[:]
+			stats = m.sync(labels=False)
+			self.assertEqual(len(self.gh.seen), 3)
+
+	def testPersistedAndRefreshed(self):
+		with tempfile.TemporaryDirectory() as d:
+			p = Path(d) / "mirror.sqlite"
+			with IssueMirror(self.repo, p) as m:
+				m.sync()
+			self.gh.putComment(2, 1, "second")
+			del self.gh.comments[1]
+			with IssueMirror(self.repo, p) as m:
+				self.assertEqual(m.issuesWatermark, "2024-01-01T00:00:07Z")
+				stats = m.refreshIssue(1)
+				self.assertEqual((stats.comments, stats.events), (1, 1))
+				self.assertEqual([el["body"] for el in m.comments(1)], ["second"])
+				self.assertEqual(m.issue(1)["updated_at"], "2024-01-01T00:00:09Z")
+				self.assertIsNone(m.issue(42))
+
+	def testRefreshDoesNotAdvanceWatermarks(self):
+		with IssueMirror(self.repo) as m:
+			m.sync()
+			self.gh.putIssue(2, state="closed")
+			self.gh.putEvent(2, "closed")
+			self.gh.putComment(2, 2, "second")
+			self.gh.putComment(3, 3, "third")
+			self.gh.putEvent(3, "labeled")
+			m.refreshIssue(3)
+			m.sync(labels=False)
+			self.assertEqual([el["number"] for el in m.issues(state="closed")], [2])
+			self.assertEqual([el["body"] for el in m.comments(2)], ["second"])
+			self.assertEqual([el["event"] for el in m.events(2)], ["closed"])
+
+	def testRefreshWithCompactInfo(self):
+		self.gh.putIssue(6, pull=True)
+		repo = GHAPI("token", client=mockedClient(self.gh), compactInfo=CompactInfoPolicy(COMPACT_INFO_PROJECTIONS)).repo("o", "r")
+		with IssueMirror(repo) as m:
+			m.refreshIssue(6)
+			self.assertEqual([el["number"] for el in m.issues(pulls=True)], [6])
+			self.assertIn("pull_request", m.issue(6))
+
+
+def slowHandler(seen, delay=0.2):
+	def handler(req):
+		seen.append((req.method, req.url.path, req.headers.get("Accept")))
+		time.sleep(delay)
+		return httpx.Response(200, json={"id": 1, "login": "o"})
+
+	return handler
+
+
+class SingleFlightTests(unittest.TestCase):
+	def testConcurrentGetInfo(self):
+		seen = []
+		api = GHAPI("token", client=mockedClient(slowHandler(seen)))
+		barrier = Barrier(8)
+
+		def getInfo(_):
+			barrier.wait()
+			return api.org("o").getInfo(fresh=True)
+
+		with ThreadPoolExecutor(8) as ex:
+			infos = list(ex.map(getInfo, range(8)))
+
+		self.assertEqual(len(seen), 1)
+		self.assertTrue(all(el is infos[0] for el in infos))
+		self.assertEqual(api.singleFlight.coalesced, 7)
+
+	def testDistinctRequestsAreNotCoalesced(self):
+		seen = []
+		api = GHAPI("token", client=mockedClient(slowHandler(seen, 0.1)))
+		barrier = Barrier(4)
+		calls = (
+			lambda: api.req("orgs/o", method="GET"),
+			lambda: api.req("orgs/o", method="GET", accept="application/json"),
+			lambda: api.req("orgs/o", {"a": 1}, method="POST"),
+			lambda: api.req("orgs/o", {"a": 1}, method="POST"),
+		)
+
+		def call(f):
+			barrier.wait()
+			return f()
+
+		with ThreadPoolExecutor(4) as ex:
+			list(ex.map(call, calls))
+
+		self.assertEqual(len(seen), 4)
+
+	def testAsync(self):
+		seen = []
+
+		async def handler(req):
+			seen.append(req.url.path)
+			await asyncio.sleep(0.1)
+			return httpx.Response(200, json={"id": 1, "login": "o"})
+
+		async def main():
+			async with AsyncAPI.AsyncGHAPI("token", client=httpx.AsyncClient(transport=httpx.MockTransport(handler))) as api:
+				return await asyncio.gather(*(AsyncAPI.getInfo(api.org("o"), fresh=True) for i in range(5)))
+
+		infos = asyncio.run(main())
+		self.assertEqual(seen, ["/orgs/o"])
+		self.assertTrue(all(el is infos[0] for el in infos))
+
+
+def etagHandler(seen):
+	def handler(req):
+		page = int(req.url.params.get("page", 1))
+		etag = '"' + str(page) + '"'
+		seen.append((page, req.headers.get("If-None-Match")))
+		if req.headers.get("If-None-Match") == etag:
+			return httpx.Response(304, headers={"ETag": etag})
+		hdrz = {"ETag": etag}
+		if page == 1:
+			hdrz["Link"] = '<https://api.github.com/x?page=2>; rel="next"'
+		return httpx.Response(200, headers=hdrz, json=[page])
+
+	return handler
+
+
+class ResponseCacheTests(unittest.TestCase):
+	def testNotModifiedPagesAreReplayed(self):
+		seen = []
+		api = GHAPI("token", client=mockedClient(etagHandler(seen)), responseCache=MemoryResponseCache())
+		for i in range(2):
+			pages = [r.json()[0] for r in api.req("x", method="GET", pagination=slice(None, None))]
+			self.assertEqual(pages, [1, 2])
+		self.assertEqual(seen, [(1, None), (2, None), (1, '"1"'), (2, '"2"')])
+
+	def testDiskCacheIsShared(self):
+		seen = []
+		with tempfile.TemporaryDirectory() as d:
+			for i in range(2):
+				api = GHAPI("token", client=mockedClient(etagHandler(seen)), responseCache=DiskResponseCache(d))
+				self.assertEqual(api.req("x", method="GET").json(), [1])
+		self.assertEqual(seen, [(1, None), (1, '"1"')])
+
+	def testAuthIdentityIsPartOfKey(self):
+		seen = []
+		cache = MemoryResponseCache()
+		client = mockedClient(etagHandler(seen))
+		GHAPI("token1", client=client, responseCache=cache).req("x", method="GET")
+		GHAPI("token2", client=client, responseCache=cache).req("x", method="GET")
+		self.assertEqual(seen, [(1, None), (1, None)])
+
+
+class RateLimitTests(unittest.TestCase):
+	def testBudgetAndSecondaryLimitRetry(self):
+		answers = [
+			httpx.Response(403, headers={"Retry-After": "0"}, text="You have exceeded a secondary rate limit"),
+			httpx.Response(200, headers={"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "4999", "X-RateLimit-Reset": "2000000000", "X-RateLimit-Resource": "core"}, json={}),
+		]
+		api = GHAPI("token", client=mockedClient(lambda req: answers.pop(0)))
+		api.req("x", {"a": 1}, method="POST")
+		self.assertEqual(answers, [])
+		b = api.rateLimiter.budget("core")
+		self.assertEqual((b.limit, b.remaining), (5000, 4999))
+		self.assertTrue(api.rateLimiter.estimate(4000)["sufficient"])
+		self.assertFalse(api.rateLimiter.estimate(6000, now=2000000000 - 10)["sufficient"])
+
+	def testExhaustedBudgetWaitsForReset(self):
+		s = RateLimitScheduler()
+		res = httpx.Response(200, headers={"X-RateLimit-Limit": "60", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1100"})
+		s.update(res, "core")
+		self.assertEqual(s.reserveSlot("GET", "core", now=1000), 101)
+
+	def testRetryAfterDate(self):
+		s = RateLimitScheduler(secondaryBackoff=7)
+		res = httpx.Response(429, headers={"Retry-After": "Thu, 01 Jan 1970 00:16:50 GMT"})
+		self.assertEqual(s.retryDelay(res, "core", 0, now=1000), 10)
+		res = httpx.Response(403, headers={"Retry-After": "soon"}, text="You have exceeded a secondary rate limit")
+		self.assertEqual(s.retryDelay(res, "core", 0, now=1000), 7)
+
+	def testGraphQLCost(self):
+		self.assertEqual(graphQLCost([(100,), (100, 50), (100, 50, 10)]), 51)
+
+	def testGraphQLQueriesAreNotMutations(self):
+		limiter = RateLimitScheduler(mutationInterval=100)
+		api = GHAPI("token", client=mockedClient(lambda req: httpx.Response(200, json={"data": {}})), rateLimiter=limiter)
+		api.gqlReq("query { viewer { login } }")
+		api.gqlReq("{ viewer { login } }")
+		self.assertEqual(limiter.nextMutation, 0.0)
+		api.gqlReq("# a comment\n mutation { addStar(input: {}) { clientMutationId } }")
+		self.assertGreater(limiter.nextMutation, 0.0)
+		self.assertFalse(limiter.isMutating("POST", api.GH_API_BASE + "graphql", json.dumps({"query": "query mutationLike { viewer { login } }"}).encode()))
+		self.assertTrue(limiter.isMutating("POST", api.GH_API_BASE + "repos"))
+
+
+def flakyHandler(failures, failingPage=2):
+	def handler(req):
+		page = int(req.url.params.get("page", 1))
+		if page == failingPage and failures:
+			failures.pop()
+			return httpx.Response(502)
+		return paginatedHandler(3, [])(req)
+
+	return handler
+
+
+class RetryTests(unittest.TestCase):
+	def testFailedPageIsRetried(self):
+		failures = [1, 1]
+		api = GHAPI("token", client=mockedClient(flakyHandler(failures)), retryPolicy=RetryPolicy(backoffBase=0))
+		pages = [r.json()[0] for r in api.req("x", method="GET", pagination=slice(None, None))]
+		self.assertEqual(pages, [1, 2, 3])
+		self.assertEqual(failures, [])
+
+	def testInterruptedPaginationCanBeResumed(self):
+		api = GHAPI("token", client=mockedClient(flakyHandler([1])), retryPolicy=RetryPolicy(maxRetries=0))
+		pages = []
+		with self.assertRaises(httpx.HTTPStatusError) as cm:
+			for r in api.req("x", method="GET", pagination=slice(None, None)):
+				pages.append(r.json()[0])
+		pages.extend(r.json()[0] for r in api.req("x", method="GET", pagination=cm.exception.resumePagination))
+		self.assertEqual(pages, [1, 2, 3])
+
+	def testNonIdempotentIsNotRetried(self):
+		failures = [1]
+		api = GHAPI("token", client=mockedClient(flakyHandler(failures, 1)), retryPolicy=RetryPolicy(backoffBase=0))
+		with self.assertRaises(httpx.HTTPStatusError):
+			api.req("x", {"a": 1}, method="POST")
+
+
+	def testRangedPatchIsRetried(self):
+		seen = []
+
+		def handler(req):
+			seen.append((req.method, req.headers["Content-Range"]))
+			return httpx.Response(503 if len(seen) == 1 else 204)
+
+		with ArtifactCacheAPIRoot("token", env=envMock, client=mockedClient(handler), retryPolicy=RetryPolicy(backoffBase=0)) as cr:
+			cr.cache.uploadChunk(1, 0, b"abc")
+		self.assertEqual(seen, [("PATCH", "bytes 0-2/*")] * 2)
+
+
+def containerHandler(received, failAt=None):
+	def handler(req):
+		if req.method == "PUT":
+			rng, total = req.headers["Content-Range"][len("bytes "):].split("/")
+			start, end = (int(el) for el in rng.split("-"))
+			if start == failAt:
+				return httpx.Response(500)
+			received[start] = (req.content, int(total))
+			return httpx.Response(201, json={"fileLength": int(total)})
+		if req.method == "POST":
+			return httpx.Response(201, json={"containerId": 1, "expiresOn": "never"})
+		return httpx.Response(200, json={})
+
+	return handler
+
+
+class UploadTests(unittest.TestCase):
+	def testChunkedUploadFromPath(self):
+		received = {}
+		payload = secrets.token_bytes(37)
+		pu = PipelinesAPIRoot("token", env=envMock, client=mockedClient(containerHandler(received)))
+		with tempfile.TemporaryDirectory() as d:
+			p = Path(d) / "f"
+			p.write_bytes(payload)
+			c = pu.resources.containers[1]
+			c.name = "c"
+			res = c.putArtifact("f", p, chunkSize=8, parallel=3)
+		self.assertEqual(res, {"fileLength": 37})
+		self.assertEqual(sorted(received), list(range(0, 37, 8)))
+		self.assertEqual(b"".join(received[k][0] for k in sorted(received)), payload)
+		self.assertEqual({el[1] for el in received.values()}, {37})
+
+	def testUploadResumesFromLastAcknowledgedChunk(self):
+		received = {}
+		payload = memoryview(secrets.token_bytes(20))
+		pu = PipelinesAPIRoot("token", env=envMock, client=mockedClient(containerHandler(received, failAt=8)), retryPolicy=RetryPolicy(maxRetries=0))
+		c = pu.resources.containers[1]
+		c.name = "c"
+		f = c.file("f")
+		with self.assertRaises(httpx.HTTPStatusError):
+			f.upload(payload, chunkSize=4)
+		self.assertEqual(f.acknowledged, 8)
+		received.clear()
+		pu.client = mockedClient(containerHandler(received))
+		f.upload(payload, chunkSize=4)
+		self.assertEqual(sorted(received), [8, 12, 16])
+
+
+def artifactHandler(files, patches, failName=None):
+	def handler(req):
+		if req.method == "PUT":
+			name = req.url.params["itemPath"]
+			if name == failName:
+				return httpx.Response(400)
+			files[name] = files.get(name, b"") + req.content
+			return httpx.Response(201, json={})
+		if req.method == "PATCH":
+			patches.append(req.url.params["artifactName"])
+			return httpx.Response(200, json={})
+		return httpx.Response(201, json={"containerId": 1, "expiresOn": "never"})
+
+	return handler
+
+
+class CompressionTests(unittest.TestCase):
+	def upload(self, name, payload):
+		received = []
+
+		def handler(req):
+			received.append((dict(req.headers), req.content))
+			return httpx.Response(201, json={})
+
+		pu = PipelinesAPIRoot("token", env=envMock, client=mockedClient(handler))
+		c = pu.resources.containers[1]
+		c.name = "c"
+		c.putArtifact(name, payload, chunkSize=16, compress=True)
+		return received
+
+	def testTextIsGzipped(self):
+		payload = b"log line\n" * 1000
+		received = self.upload("log.txt", payload)
+		self.assertEqual({h["content-encoding"] for h, b in received}, {"gzip"})
+		self.assertEqual({h["x-tfs-filelength"] for h, b in received}, {str(len(payload))})
+		self.assertEqual(gzip.decompress(b"".join(b for h, b in received)), payload)
+
+	def testCompressedIsSentAsIs(self):
+		payload = gzip.compress(b"a" * 100)
+		received = self.upload("data.bin", payload)
+		self.assertNotIn("content-encoding", received[0][0])
+		self.assertEqual(b"".join(b for h, b in received), payload)
+
+
+class TreeUploadTests(unittest.TestCase):
+	def makeTree(self, d):
+		(d / "a" / "b").mkdir(parents=True)
+		(d / "a" / "1.txt").write_bytes(b"1")
+		(d / "a" / "b" / "2.txt").write_bytes(b"22")
+		(d / "3.txt").write_bytes(b"333")
+
+	def testTreeIsUploadedAndPatchedOnce(self):
+		files, patches = {}, []
+		pu = PipelinesAPIRoot("token", env=envMock, client=mockedClient(artifactHandler(files, patches)))
+		with tempfile.TemporaryDirectory() as d:
+			d = Path(d)
+			self.makeTree(d)
+			with pu.pipelines.getArtifactUploader("art") as u:
+				u.uploadTrees([(d / "a", PurePath("x")), (d / "3.txt", PurePath("3.txt"))], workers=3)
+		self.assertEqual(files, {"art/x/1.txt": b"1", "art/x/b/2.txt": b"22", "art/3.txt": b"333"})
+		self.assertEqual(patches, ["art"])
+		self.assertEqual((u.progress.files, u.progress.bytes), (3, 6))
+
+	def testNotPatchedOnFailure(self):
+		files, patches = {}, []
+		pu = PipelinesAPIRoot("token", env=envMock, client=mockedClient(artifactHandler(files, patches, "art/x/b/2.txt")))
+		with tempfile.TemporaryDirectory() as d:
+			d = Path(d)
+			self.makeTree(d)
+			with self.assertRaises(httpx.HTTPStatusError):
+				with pu.pipelines.getArtifactUploader("art") as u:
+					u.uploadTrees([(d / "a", PurePath("x"))], workers=2)
+		self.assertEqual(patches, [])
+
+
+def makeWorkspace(root):
+	(root / "deps" / "sub").mkdir(parents=True)
+	(root / "deps" / "a.bin").write_bytes(secrets.token_bytes(70000))
+	(root / "deps" / "sub" / "b.txt").write_text("b" * 1000)
+	(root / "other.txt").write_text("other")
+
+
+class MockServerTests(unittest.TestCase):
+	def testUploadArtifact(self):
+		with MockActionsServer() as server:
+			pu = PipelinesAPIRoot("token", "miniGHApi", env=server.env())
+			payload = secrets.token_bytes(3000)
+			with pu.pipelines.getArtifactUploader("shit", chunkSize=1024) as u:
+				u["crap"] = payload
+			pu.close()
+		self.assertEqual([c.name for c in server.containers], ["shit"])
+		self.assertEqual(server.containers[0].files, {"shit/crap": payload})
+		self.assertEqual(server.containers[0].size, 3000)
+
+	def testRESTAndGraphQL(self):
+		with MockActionsServer() as server:
+			server.setRepos("o", 75)
+			with GHAPI("token", env=server.env()) as api:
+				repos = api.org("o").getRepos()
+				nodes = list(api.gqlIter("query($login: String!, $cursor: String) {organization(login: $login) {repositories(first: 100, after: $cursor) {nodes {databaseId} pageInfo {endCursor hasNextPage}}}}", ("organization", "repositories"), login="o"))
+		self.assertEqual(len(repos), 75)
+		self.assertEqual(repos["repo74"].dbID, 100000074)
+		self.assertEqual(repos["repo74"].info["owner"]["login"], "o")
+		self.assertEqual([n["databaseId"] for n in nodes], [r.dbID for r in repos.values()])
+
+
+class InstrumentationTests(unittest.TestCase):
+	def testEventsAndStats(self):
+		calls = []
+
+		def handler(req):
+			calls.append(req.url.path)
+			if len(calls) == 1:
+				return httpx.Response(502)
+			return httpx.Response(200, headers={"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "4998", "X-RateLimit-Resource": "core"}, json={"id": 1, "name": "r"})
+
+		events = []
+		stats = EndpointStats()
+		api = GHAPI("token", client=mockedClient(handler), retryPolicy=RetryPolicy(backoffBase=0), hooks=[events.append, stats])
+		out = io.StringIO()
+		with redirect_stdout(out):
+			api.repo("o", "r").getInfo()
+			api.repo("o", "r2").getInfo()
+		self.assertEqual(out.getvalue(), "")
+
+		self.assertEqual([(e.status, e.attempt) for e in events], [(502, 0), (200, 1), (200, 0)])
+		self.assertEqual(events[1].rateLimit["remaining"], "4998")
+		self.assertEqual(events[1].bytesIn, len(b'{"id":1,"name":"r"}'))
+		self.assertIsNotNone(events[1].latency)
+		summary = stats.summary()["GET api.github.com/repos/{owner}/{repo}"]
+		self.assertEqual((summary["count"], summary["retries"], summary["statuses"]), (3, 1, {502: 1, 200: 2}))
+		self.assertEqual(sum(summary["latencyHistogramMs"].values()), 3)
+		self.assertIn("3 requests", stats.format())
+
+	def testTimingsAndErrors(self):
+		events = []
+		with MockActionsServer() as server:
+			server.setRepos("o", 1)
+			with GHAPI("token", env=server.env(), hooks=[events.append]) as api:
+				api.gqlReq("query {viewer {login}}")
+				with self.assertRaises(httpx.HTTPStatusError):
+					api.req("nothing", method="GET")
+		self.assertEqual(events[0].bytesOut, len(api._gqlData("query {viewer {login}}", {})))
+		self.assertIsNotNone(events[0].connect)
+		self.assertIsNotNone(events[0].ttfb)
+		self.assertIsNotNone(events[0].body)
+		self.assertIsNone(events[1].connect)  # the connection is reused
+		self.assertEqual(events[1].status, 404)
+
+	def testURLTemplate(self):
+		self.assertEqual(urlTemplate("https://api.github.com/repos/o/r/issues/5/comments?page=2"), "api.github.com/repos/{owner}/{repo}/issues/{id}/comments")
+		self.assertEqual(urlTemplate("https://api.github.com/orgs/o/repos"), "api.github.com/orgs/{owner}/repos")
+
+
+class CacheTests(unittest.TestCase):
+	def testSave(self):
+		with tempfile.TemporaryDirectory() as d, MockActionsServer() as server:
+			ws = Path(d)
+			makeWorkspace(ws)
+			cr = ArtifactCacheAPIRoot("token", env=server.env(envMock))
+			with cr:
+				self.assertIsNone(cr.cache.lookup(["k"], getCacheVersion(["deps", "other.txt"], "gzip")))
+				size = cr.cache.save(["deps", "other.txt"], "k", workspace=ws, compression="gzip", chunkSize=16 * 1024, parallel=3)
+				self.assertIsNone(cr.cache.save(["deps", "other.txt"], "k", workspace=ws, compression="gzip"))
+				hit = cr.cache.lookup(["k"], getCacheVersion(["deps", "other.txt"], "gzip"))
+
+			entry, = server.committedCaches()
+			self.assertEqual(entry.size, size)
+			self.assertGreater(len(entry.chunks), 3)
+			self.assertEqual(hit["cacheKey"], "k")
+
+			self.assertTrue(all(h["Accept"] == "application/json;api-version=6.0-preview.1" for _, _, h, _ in server.requests))
+
+			with tarfile.open(fileobj=io.BytesIO(entry.assemble()), mode="r:gz") as tar:
+				self.assertEqual(sorted(tar.getnames()), ["deps", "deps/a.bin", "deps/sub", "deps/sub/b.txt", "other.txt"])
+				self.assertEqual(tar.extractfile("deps/a.bin").read(), (ws / "deps" / "a.bin").read_bytes())
+
+	def testRestore(self):
+		with tempfile.TemporaryDirectory() as src, tempfile.TemporaryDirectory() as dst, MockActionsServer() as server:
+			src, dst = Path(src), Path(dst)
+			makeWorkspace(src)
+			with ArtifactCacheAPIRoot("token", env=server.env(envMock)) as cr:
+				cr.cache.save(["deps"], "deps-linux-abc", workspace=src, compression="gzip")
+				self.assertIsNone(cr.cache.restore(["deps"], "deps-windows-abc", ["deps-windows-"], workspace=dst))
+				del server.requests[:]
+				key = cr.cache.restore(["deps"], "deps-linux-def", ["deps-windows-", "deps-linux-"], workspace=dst, chunkSize=8 * 1024, parallel=3)
+
+			self.assertEqual(key, "deps-linux-abc")
+			self.assertEqual((dst / "deps" / "a.bin").read_bytes(), (src / "deps" / "a.bin").read_bytes())
+			self.assertEqual((dst / "deps" / "sub" / "b.txt").read_text(), "b" * 1000)
+			self.assertFalse((dst / "other.txt").exists())
+
+			downloads = [h for m, p, h, _ in server.requests if p.startswith("/archives/")]
+			self.assertEqual(len(downloads), -(-server.committedCaches()[0].size // (8 * 1024)))
+			self.assertTrue(all("Range" in h and "Authorization" not in h for h in downloads))
+
+
+class UnseekableWriter(io.RawIOBase):
+	"""makes `zipfile` write data descriptors"""
+
+	def __init__(self, dst):
+		self.dst = dst
+
+	def writable(self):
+		return True
+
+	def write(self, b):
+		return self.dst.write(b)
+
+
+def makeZip(members, seekable=True):
+	buf = io.BytesIO()
+	with zipfile.ZipFile(buf if seekable else UnseekableWriter(buf), "w") as z:
+		for name, data, method in members:
+			z.writestr(zipfile.ZipInfo(name, (2021, 10, 11, 0, 0, 0)), data, compress_type=method)
+	return buf.getvalue()
+
+
+class DroppingStream(httpx.SyncByteStream):
+	def __init__(self, data, dropAfter):
+		self.data = data
+		self.dropAfter = dropAfter
+
+	def __iter__(self):
+		yield self.data[: self.dropAfter]
+		raise httpx.ReadError("connection dropped")
+
+
+def storageHandler(blob, seen, dropAfter=None):
+	def handler(req):
+		seen.append((req.url.host, req.headers.get("Range"), req.headers.get("Authorization")))
+		if req.url.host == "api.github.com":
+			return httpx.Response(302, headers={"Location": "https://storage.example/blob?sig=x"})
+
+		rng = req.headers.get("Range")
+		if rng is None:
+			if dropAfter is not None and len(seen) == 2:
+				return httpx.Response(200, headers={"Content-Length": str(len(blob))}, stream=DroppingStream(blob, dropAfter))
+			return httpx.Response(200, content=blob)
+
+		start = int(rng[len("bytes=") : -1])
+		return httpx.Response(206, headers={"Content-Range": "bytes " + str(start) + "-" + str(len(blob) - 1) + "/" + str(len(blob))}, content=blob[start:])
+
+	return handler
+
+
+class DownloadTests(unittest.TestCase):
+	def testResumedDownload(self):
+		blob = secrets.token_bytes(300000)
+		seen = []
+		reports = []
+		api = GHAPI("token", client=mockedClient(storageHandler(blob, seen, dropAfter=100000)), retryPolicy=RetryPolicy(backoffBase=0))
+		dst = io.BytesIO()
+		size = api.repo("o", "r").actions.artifacts[5].downloadTo(dst, chunkSize=50000, progress=lambda received, total: reports.append((received, total)))
+
+		self.assertEqual(size, len(blob))
+		self.assertEqual(dst.getvalue(), blob)
+		self.assertEqual([h for h, _, _ in seen], ["api.github.com", "storage.example", "api.github.com", "storage.example"])
+		self.assertEqual(seen[2][1], "bytes=100000-")
+		self.assertIsNone(seen[1][2])
+		self.assertEqual(reports[-1], (len(blob), len(blob)))
+
+	def testZipMembersStreaming(self):
+		big = secrets.token_bytes(200000) + b"a" * 3000000
+		members = [("a.txt", b"a" * 5000, zipfile.ZIP_DEFLATED), ("big.bin", big, zipfile.ZIP_DEFLATED), ("s.txt", b"stored", zipfile.ZIP_STORED), ("empty", b"", zipfile.ZIP_DEFLATED)]
+		for seekable in (True, False):
+			with self.subTest(seekable=seekable):
+				blob = makeZip(members, seekable)
+				chunks = [blob[i : i + 1000] for i in range(0, len(blob), 1000)]
+				got = [(info.filename, f.read()) for info, f in iterZipMembers(chunks)]
+				self.assertEqual(got, [(n, d) for n, d, _ in members])
+
+	def testZipMembersSkipped(self):
+		blob = makeZip([("a.txt", b"a" * 5000, zipfile.ZIP_DEFLATED), ("b.txt", b"b" * 5000, zipfile.ZIP_DEFLATED)], False)
+		names = [info.filename for info, f in iterZipMembers([blob])]
+		self.assertEqual(names, ["a.txt", "b.txt"])
+
+	def testZipMembersBadCRC(self):
+		blob = bytearray(makeZip([("a.txt", b"a" * 5000, zipfile.ZIP_STORED)]))
+		blob[100] ^= 1
+		with self.assertRaises(zipfile.BadZipFile):
+			for info, f in iterZipMembers([bytes(blob)]):
+				f.read()
+
+
+def issuesGraphQLHandler(queries, missing=()):
+	rx = re.compile('a(\\d+): repository\\(owner: "o", name: "r"\\) \\{issue\\(number: (\\d+)\\) \\{([^}]*)\\}\\}')
+
+	def handler(req):
+		q = json.loads(req.content)["query"]
+		queries.append(q)
+		data = {}
+		errors = []
+		for alias, no, fields in rx.findall(q):
+			no = int(no)
+			if no in missing:
+				data["a" + alias] = {"issue": None}
+				errors.append({"type": "NOT_FOUND", "path": ["a" + alias, "issue"]})
+				continue
+			data["a" + alias] = {"issue": {f: {"id": "I_" + str(no), "databaseId": 1000 + no, "title": "t" + str(no)}[f] for f in fields.split()}}
+		res = {"data": data}
+		if errors:
+			res["errors"] = errors
+		return httpx.Response(200, json=res)
+
+	return handler
+
+
+class BatchTests(unittest.TestCase):
+	def testResolveIssues(self):
+		queries = []
+		api = GHAPI("token", client=mockedClient(issuesGraphQLHandler(queries, missing={7})))
+		repo = api.repo("o", "r")
+		issues = [repo.issue(no) for no in range(1, 251)]
+		res = api.resolve(issues, ["title"])
+
+		self.assertEqual(len(queries), 3)
+		self.assertIsNone(res[6])
+		self.assertEqual(res[9], {"id": "I_10", "databaseId": 1010, "title": "t10"})
+		self.assertEqual(issues[249]._dbID, 1250)
+		self.assertIsNone(issues[6]._dbID)
+
+	def testDBIDOfIssue(self):
+		queries = []
+		api = GHAPI("token", client=mockedClient(issuesGraphQLHandler(queries)))
+		self.assertEqual(api.repo("o", "r").issue(3).dbID, 1003)
+		self.assertEqual(len(queries), 1)
+
+	def testDBIDOfMissingIssue(self):
+		api = GHAPI("token", client=mockedClient(issuesGraphQLHandler([], missing={3})))
+		with self.assertRaises(LookupError):
+			api.repo("o", "r").issue(3).dbID
+
+	def testSplitByNodes(self):
+		queries = []
+		api = GHAPI("token", client=mockedClient(issuesGraphQLHandler(queries)))
+		repo = api.repo("o", "r")
+		resolveBatch([repo.issue(no) for no in range(1, 11)], maxNodes=6)
+		self.assertEqual(len(queries), 4)
+
+
+def connectionHandler(count, requested, pageSize=100, innerCount=0):
+	def page(items, cursor):
+		start = int(cursor) if cursor else 0
+		stop = min(start + pageSize, len(items))
+		return {"nodes": items[start:stop], "pageInfo": {"endCursor": str(stop), "hasNextPage": stop < len(items)}}
+
+	def issues(repoNo):
+		return [{"number": i} for i in range(innerCount if repoNo == 0 else 1)]
+
+	def handler(req):
+		body = json.loads(req.content)
+		q, variables = body["query"], body["variables"]
+		requested.append((q, variables))
+		rateLimit = {"cost": 1, "limit": 5000, "remaining": 5000 - len(requested), "used": len(requested), "resetAt": "2030-01-01T00:00:00Z"}
+		if "node(id: $id)" in q:
+			return httpx.Response(200, json={"data": {"node": {"issues": page(issues(int(variables["id"][2:])), variables["cursor"])}, "rateLimit": rateLimit}})
+
+		repos = [{"id": "R_" + str(i), "name": "r" + str(i), "issues": page(issues(i), None)} for i in range(count)]
+		return httpx.Response(200, json={"data": {"viewer": {"repositories": page(repos, variables["cursor"])}, "rateLimit": rateLimit}})
+
+	return handler
+
+
+REPOS_QUERY = "query($cursor: String) {viewer {repositories(first: 100, after: $cursor) {nodes {id name issues(first: 100) {nodes {number} pageInfo {endCursor hasNextPage}}} pageInfo {endCursor hasNextPage}}}}"
+REPO_ISSUES_QUERY = "query($id: ID!, $cursor: String) {node(id: $id) {... on Repository {issues(first: 100, after: $cursor) {nodes {number} pageInfo {endCursor hasNextPage}}}}}"
+
+
+class ConnectionTests(unittest.TestCase):
+	def testPrefetchAndRateLimit(self):
+		requested = []
+		costs = []
+		api = GHAPI("token", client=mockedClient(connectionHandler(250, requested)))
+		it = api.gqlIter(REPOS_QUERY, ("viewer", "repositories"), onPage=lambda rl: costs.append(rl["cost"]))
+		first = next(it)
+		for _ in range(100):
+			if len(requested) == 2:
+				break
+			time.sleep(0.01)
+		self.assertEqual(len(requested), 2)  # the 2nd page has been requested before the 1st one is consumed
+		names = [first["name"]] + [n["name"] for n in it]
+
+		self.assertEqual(names, ["r" + str(i) for i in range(250)])
+		self.assertEqual(costs, [1, 1, 1])
+		self.assertIn("rateLimit", requested[0][0])
+		self.assertEqual(api.rateLimiter.budget("graphql").remaining, 4997)
+
+	def testNested(self):
+		requested = []
+		api = GHAPI("token", client=mockedClient(connectionHandler(3, requested, innerCount=250)))
+		repos = list(api.gqlIter(REPOS_QUERY, ("viewer", "repositories"), prefetch=False, nested={("issues",): (REPO_ISSUES_QUERY, ("node", "issues"))}))
+
+		self.assertEqual([n["number"] for n in repos[0]["issues"]["nodes"]], list(range(250)))
+		self.assertEqual(len(repos[1]["issues"]["nodes"]), 1)
+		self.assertEqual(len(requested), 3)
+
+	def testEarlyClose(self):
+		requested = []
+		api = GHAPI("token", client=mockedClient(connectionHandler(1000, requested)))
+		for n in api.gqlIter(REPOS_QUERY, ("viewer", "repositories"), prefetch=False):
+			break
+		self.assertEqual(len(requested), 1)
+
+	def testAsync(self):
+		requested = []
+
+		async def main():
+			async with AsyncAPI.AsyncGHAPI("token", client=httpx.AsyncClient(transport=httpx.MockTransport(connectionHandler(150, requested)))) as api:
+				return [n["name"] async for n in api.gqlIter(REPOS_QUERY, ("viewer", "repositories"))]
+
+		self.assertEqual(len(asyncio.run(main())), 150)
+		self.assertEqual(len(requested), 2)
+
+
+class NodeIDTests(unittest.TestCase):
+	def testNewFormat(self):
+		self.assertEqual(encodeNodeID("Repository", 430422624), "R_kgDOGae6YA")
+		self.assertEqual(decodeNodeID("R_kgDOGae6YA"), ("Repository", 430422624, None))
+		iD = encodeNodeID("Issue", 1006611466, 430422624)
+		self.assertTrue(iD.startswith("I_kwDO"))
+		self.assertEqual(decodeNodeID(iD), ("Issue", 1006611466, 430422624))
+		for v in (0, 5, 200, 60000, 2 ** 33):
+			self.assertEqual(decodeNodeID(encodeNodeID("User", v)), ("User", v, None))
+
+	def testLegacy(self):
+		self.assertEqual(decodeNodeID("MDEwOlJlcG9zaXRvcnkxMjM="), ("Repository", 123, None))
+		self.assertEqual(encodeNodeID("Repository", 123, legacy=True), "MDEwOlJlcG9zaXRvcnkxMjM=")
+		self.assertEqual(decodeNodeID(encodeNodeID("SomethingUnknown", 7)), ("SomethingUnknown", 7, None))
+
+	def testScopes(self):
+		self.assertEqual(decodeNodeID("MDg6V29ya2Zsb3cxNjEzMzU="), ("Workflow", 161335, None))  # from the REST docs
+		self.assertEqual(decodeNodeID("MDEwOkNoZWNrU3VpdGU0Mg=="), ("CheckSuite", 42, None))
+		iD = encodeNodeID("Workflow", 161335, 430422624)
+		self.assertTrue(iD.startswith("W_kwDOGae6YM4AAnY3"))  # GitHub issues these IDs scoped to the repo, not `W_kgDOAAJ2Nw`
+		self.assertEqual(decodeNodeID(iD), ("Workflow", 161335, 430422624))
+		for t in ("CheckSuite", "CheckRun", "Deployment", "Environment", "Team"):
+			with self.assertRaises(ValueError):
+				encodeNodeID(t, 1)
+			self.assertEqual(decodeNodeID(encodeNodeID(t, 5, 7)), (t, 5, 7))
+		for t in ("WorkflowRun", "ProjectV2"):  # other templates, legacy IDs are used
+			self.assertEqual(encodeNodeID(t, 30433642), encodeNodeID(t, 30433642, legacy=True))
+
+	def testScopedObjects(self):
+		repo = GHAPI("token", client=mockedClient(None)).repo("o", "r")
+		repo.dbID = 430422624
+		self.assertEqual(repo.actions.workflows[161335].nodeID, encodeNodeID("Workflow", 161335, 430422624))
+		self.assertEqual(repo.actions.runs[30433642].nodeID, "MDExOldvcmtmbG93UnVuMzA0MzM2NDI=")
+		self.assertEqual(repo.actions.artifacts[42].dbID, 42)  # no request
+		other = GHAPI("token", client=mockedClient(None)).repo("o", "r")
+		other.actions.workflows[1].nodeID = encodeNodeID("Workflow", 1, 5)
+		self.assertEqual(other.dbID, 5)
+
+	def testBulk(self):
+		dbIDs = [1, 300, 70000, 1006611466, 2 ** 40]
+		self.assertEqual(encodeNodeIDs("Issue", dbIDs, 42), [encodeNodeID("Issue", i, 42) for i in dbIDs])
+		self.assertEqual(encodeNodeIDs("Issue", dbIDs, range(5)), [encodeNodeID("Issue", i, r) for i, r in zip(dbIDs, range(5))])
+		self.assertEqual([el[1] for el in decodeNodeIDs(encodeNodeIDs("Repository", dbIDs))], dbIDs)
+
+	def testMoveWithoutLookups(self):
+		requested = []
+
+		def handler(req):
+			requested.append(json.loads(req.content))
+			return httpx.Response(200, json={"data": {"transferIssue": {"issue": {"id": "I_x"}}}})
+
+		api = GHAPI("token", client=mockedClient(handler))
+		src = api.repo("o", "a")
+		issue = src.issue(1)
+		issue.nodeID = encodeNodeID("Issue", 1000, 10)
+		dst = api.repo("o", "b")
+		dst.dbID = 20
+		issue.move(dst)
+
+		self.assertEqual(src.dbID, 10)
+		self.assertEqual(len(requested), 1)
+		self.assertEqual(requested[0]["variables"], {"ii": encodeNodeID("Issue", 1000, 10), "ri": encodeNodeID("Repository", 20)})
+
+
+IMPORT_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+HELP_IMPORT_BUDGET = 0.5  # seconds, generous, it takes a few ms
+HEAVY_MODULES = ("httpx._client", "requests.sessions", "asyncio.events", "tarfile", "msgspec.json", "orjson", "ujson", "miniGHAPI.Actions", "miniGHAPI.Download", "miniGHAPI.CacheArchive")
+
+
+class ImportTimeTests(unittest.TestCase):
+	"""Guards the cold start of the CLI: the network stack (executed lazily) and the modules not needed by a command must not be imported"""
+
+	def probe(self, code: str) -> dict:
+		res = subprocess.run([sys.executable, "-W", "ignore", "-c", IMPORT_PROBE.format(code=code)], cwd=str(thisDir.parent), capture_output=True, text=True, check=True)
+		return json.loads(res.stdout.splitlines()[-1])
+
+	def assertNotImported(self, name: str, code: str, allowed: typing.Collection[str] = ()):
+		res = self.probe(code)
+		self.assertEqual([m for m in HEAVY_MODULES if m in res["modules"] and m not in allowed], [], "Importing for " + name + " took " + format(res["seconds"] * 1000, ".1f") + " ms")
+		return res
+
+	def testHelp(self):
+		res = self.assertNotImported("--help", "import runpy\nsys.argv = ['miniGHAPI', '--help']\ntry:\n\trunpy.run_module('miniGHAPI', run_name='__main__')\nexcept SystemExit:\n\tpass")
+		self.assertNotIn("miniGHAPI.APICore", res["modules"])
+		self.assertNotIn("httpx", res["modules"])
+		self.assertLess(res["seconds"], HELP_IMPORT_BUDGET)
+
+	def testArtifactCommand(self):
+		self.assertNotImported("artifact", "from miniGHAPI.GHActionsEnv import getGHEnv\nfrom miniGHAPI.undocumented import PipelinesAPIRoot, UploadProgress")
+
+	def testLibrary(self):
+		self.assertNotImported("GitHubAPI", "import miniGHAPI.GitHubAPI", allowed=("miniGHAPI.Actions", "miniGHAPI.Download", "miniGHAPI.CacheArchive", "tarfile"))
+
+
+class AsyncTests(unittest.TestCase):
+	def testAsyncListingAndInfo(self):
+		def handler(req):
+			if req.url.path == "/orgs/o/repos":
+				page = int(req.url.params["page"])
+				hdrz = {"Link": '<https://api.github.com/orgs/o/repos?page=2>; rel="next"'} if page == 1 else {}
+				return httpx.Response(200, headers=hdrz, json=[{"name": "r" + str(page), "id": page, "owner": {"login": "o"}}])
+			return httpx.Response(200, json={"id": 42, "login": "o"})
+
+		async def main():
+			async with AsyncAPI.AsyncGHAPI("token", client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), maxConcurrency=2) as api:
+				org = api.org("o")
+				info, repos = await asyncio.gather(AsyncAPI.getInfo(org), AsyncAPI.getRepos(org))
+				return org, info, repos
+
+		org, info, repos = asyncio.run(main())
+		self.assertEqual(info["id"], 42)
+		self.assertEqual(org.dbID, 42)
+		self.assertEqual(sorted(repos), ["r1", "r2"])
+		self.assertEqual(repos["r2"].dbID, 2)
+
+	def testNegativeSlices(self):
+		async def pages(handler, pagination, workers=1):
+			async with AsyncAPI.AsyncGHAPI("token", client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), paginationWorkers=workers) as api:
+				return [r.json()[0] async for r in api.req("x", method="GET", pagination=pagination)]
+
+		seen = []
+		self.assertEqual(asyncio.run(pages(noLastLinkHandler(4, seen), slice(-1, -3))), [4, 3])
+		self.assertEqual(seen, [("HEAD", 1), ("GET", 1), ("GET", 2), ("GET", 3), ("GET", 4)])
+
+		seen = []
+		self.assertEqual(asyncio.run(pages(paginatedHandler(7, seen), slice(-1, -3))), [7, 6])
+		self.assertEqual(seen, [("HEAD", 1), ("GET", 7), ("GET", 6)])
+
+		seen = []
+		self.assertEqual(asyncio.run(pages(paginatedHandler(5, seen), slice(None, None), 3)), [1, 2, 3, 4, 5])
+
+
 if __name__ == "__main__":
 	unittest.main()